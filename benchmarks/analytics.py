@@ -0,0 +1,124 @@
+"""
+Analytics benchmark: time to compute stop visits, headways, bunching, dwell times and segment speeds over a synthetic day of the whole network
+(every bus of every route of `itranvias_api.queryitr.synthetic.SyntheticNetwork` moving along it, sampled at a fixed interval)
+
+Usage (with the package and numpy installed, e.g. `pip install -e .[fast]`):
+
+``` bash
+python benchmarks/analytics.py
+python benchmarks/analytics.py --buses-per-route 8 --interval 10
+```
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from itranvias_api.queryitr.analytics import (
+    RouteIndex,
+    bunching,
+    dwell_times,
+    headways,
+    segment_speeds,
+    stop_visits,
+)
+from itranvias_api.queryitr.info import _parse_general_info
+from itranvias_api.queryitr.synthetic import SyntheticNetwork
+
+
+def synthetic_day(
+    index: RouteIndex, buses_per_route: int, interval: float, seed: int = 0
+) -> dict[str, np.ndarray]:
+    """
+    Samples of buses going round their lines from 6:00 to 24:00 (every route one after another, so they turn around at the end of each),
+    each at its own (noisy) pace, stopping a while at every stop
+    """
+
+    rng = np.random.default_rng(seed)
+    times = np.arange(6 * 3600, 24 * 3600, interval, dtype=np.float64)
+
+    # The slots of a line are contiguous, its routes one after another
+    line_starts = np.flatnonzero(
+        np.r_[True, index.slot_line[1:] != index.slot_line[:-1]]
+    )
+    line_ends = np.r_[line_starts[1:], len(index.slot_stop)]
+
+    columns = {
+        name: []
+        for name in (
+            "timestamp",
+            "bus_id",
+            "line_id",
+            "route_id",
+            "last_stop",
+            "state",
+            "route_progress",
+        )
+    }
+    bus_id = 3000
+    for start, end in zip(line_starts, line_ends):
+        n_stops = end - start
+        n_routes = len(np.unique(index.slot_route[start:end]))
+        for k in range(buses_per_route * n_routes):
+            # Stops per second, around a stop every 90s, with some noise so the buses drift into bunches
+            pace = rng.normal(1 / 90, 1 / 900, len(times)).clip(1 / 300)
+            position = (
+                k * n_stops / (buses_per_route * n_routes) + np.cumsum(pace * interval)
+            ) % n_stops
+            stop_index = position.astype(np.int64)
+
+            columns["timestamp"].append(times)
+            columns["bus_id"].append(np.full(len(times), bus_id))
+            columns["line_id"].append(np.full(len(times), index.slot_line[start]))
+            columns["route_id"].append(index.slot_route[start + stop_index])
+            columns["last_stop"].append(index.slot_stop[start + stop_index])
+            columns["state"].append(np.where(position % 1 < 0.2, 0, 1))
+            columns["route_progress"].append(position / n_stops)
+            bus_id += 1
+
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def timed(name: str, operation):
+    start = time.perf_counter()
+    result = operation()
+    elapsed = time.perf_counter() - start
+    rows = len(next(iter(result.values())))
+    print(f"{name:<16} {elapsed * 1000:>9.1f} ms  -> {rows} rows")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--buses-per-route", type=int, default=6)
+    parser.add_argument("--interval", type=float, default=15)
+    args = parser.parse_args()
+
+    network = SyntheticNetwork()
+    index = RouteIndex.from_general_info(_parse_general_info(network.general_info()))
+    samples = synthetic_day(index, args.buses_per_route, args.interval)
+    print(
+        f"{len(samples['timestamp'])} samples of {len(np.unique(samples['bus_id']))} buses"
+    )
+
+    visits = timed("stop_visits", lambda: stop_visits(samples))
+    gaps = timed("headways", lambda: headways(visits))
+    timed("bunching", lambda: bunching(gaps))
+    timed("dwell_times", lambda: dwell_times(visits))
+    speeds = timed("segment_speeds", lambda: segment_speeds(visits, index))
+
+    # The synthetic stops are scattered at random, so the speeds are meaningless, only how many segments were measured.
+    # Every stop has a location, a segment without a distance is a bus turning around mistaken for one
+    turnarounds = np.count_nonzero(np.isnan(speeds["distance"]))
+    print(
+        f"median headway {np.median(gaps['headway']):.0f} s, "
+        f"{np.count_nonzero(speeds['trips'])} of {len(index.slot_stop)} segments measured, "
+        f"{turnarounds} across turnarounds"
+    )
+    if turnarounds:
+        raise SystemExit("Turnarounds were counted as segments")
+
+
+if __name__ == "__main__":
+    main()
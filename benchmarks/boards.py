@@ -0,0 +1,80 @@
+"""
+Benchmark of the line-level board planner (`itranvias_api.queryitr.boards`): the boards of a corridor of consecutive stops,
+one `func=0` request per stop vs the requests `plan_boards` picks, against a local stub upstream (`itranvias_api.queryitr.standin`)
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/boards.py
+python benchmarks/boards.py --stops 60 --exact 2 --upstream-latency 0.15
+```
+"""
+
+import argparse
+import time
+
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.queryitr_adapter import QueryItrAdapter
+from itranvias_api.queryitr.standin import StandInServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=40)
+    parser.add_argument(
+        "--exact", type=int, default=0, help="stops of the corridor needing exact times"
+    )
+    parser.add_argument("--upstream-latency", type=float, default=0.08)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with StandInServer(latency=args.upstream_latency) as server:
+        # Before anything imports the module-level adapter
+        api._queryitr_adapter = QueryItrAdapter(server.url)
+
+        from itranvias_api.queryitr.boards import get_stop_boards, plan_boards
+        from itranvias_api.queryitr.network import Network
+
+        network = Network.from_general_info(api.info.get_general_info())
+
+        # The longest route of the synthetic network, cut to the corridor's length
+        line_id, route_id, stops = max(
+            (
+                (line_id, route_id, stops)
+                for line_id, routes in server.network.routes.items()
+                for route_id, stops in routes.items()
+            ),
+            key=lambda route: len(route[2]),
+        )
+        corridor = list(dict.fromkeys(stops))[: args.stops]
+        exact = corridor[: args.exact]
+
+        plan = plan_boards(corridor, network, exact)
+        print(
+            f"Corridor of {len(corridor)} stops (line {line_id}, route {route_id}):"
+            f" {len(plan.lines)} lines + {len(plan.stops)} stops -> {plan.requests} requests"
+        )
+
+        requests = server.stats["requests"]
+        start = time.perf_counter()
+        stop_boards = dict(api.stops.get_many_stop_buses(corridor, args.concurrency))
+        elapsed = time.perf_counter() - start
+        print(
+            f"Per stop:      {len(stop_boards)} boards,"
+            f" {server.stats['requests'] - requests} upstream requests in {elapsed * 1000:.0f} ms"
+        )
+
+        requests = server.stats["requests"]
+        start = time.perf_counter()
+        boards = get_stop_boards(
+            corridor, network, exact, max_concurrency=args.concurrency
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"Line-level:    {len(boards)} boards ({len(boards.approximate)} approximate),"
+            f" {server.stats['requests'] - requests} upstream requests in {elapsed * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
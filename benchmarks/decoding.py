@@ -0,0 +1,74 @@
+"""
+Decoding benchmark: time to decode and parse a response of each endpoint, with each of the JSON decoders installed
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/decoding.py              # the fixtures of benchmarks/fixtures.py, no network needed
+python benchmarks/decoding.py --repeat 500
+```
+"""
+
+import argparse
+import json
+import time
+
+from fixtures import load_fixtures
+from parsing import CASES, FakeResponse
+
+from itranvias_api.queryitr import decoding
+from itranvias_api.queryitr.queryitr_adapter import QueryItrResponse
+
+
+def decoders() -> dict:
+    found = {"json": json.loads}
+    try:
+        import msgspec.json
+
+        found["msgspec"] = msgspec.json.Decoder().decode
+    except ImportError:
+        pass
+    try:
+        import orjson
+
+        found["orjson"] = orjson.loads
+    except ImportError:
+        pass
+    return found
+
+
+def per_call(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    available = decoders()
+
+    print(
+        f"{'endpoint':<26} {'size':>9}  "
+        + "  ".join(f"{name + ' decode/+parse (µs)':>28}" for name in available)
+    )
+    for name, (fixture, parse) in CASES.items():
+        body = fixtures[fixture]
+        response = FakeResponse(body)
+        timings = []
+        for loads in available.values():
+            decoding.set_json_loads(loads)
+            decode = per_call(lambda: decoding.json_loads(body), args.repeat)
+            full = per_call(lambda: parse(QueryItrResponse(response).data), args.repeat)
+            timings.append(f"{decode * 1e6:>12.1f} / {full * 1e6:>12.1f}")
+        print(f"{name:<26} {len(body) / 1024:>7.1f}kB  " + "  ".join(timings))
+
+    decoding.set_json_loads(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Fixtures for the offline benchmarks: bodies of `/queryitr_v3.php` responses, stored as JSON files in `benchmarks/fixtures/`
+
+They are committed, so every checkout benchmarks the same bytes. They were generated, deterministically, with the same shape and about the same size
+as the real ones (a full network `func=7` catalogue of 1100 stops and 24 lines, paths of ~1500 points...). With network access, real responses can be
+recorded instead. Either way, changing them changes their `fixtures_hash`, and baselines saved with the old ones can't be compared anymore:
+
+``` bash
+python benchmarks/fixtures.py            # regenerate the synthetic fixtures
+python benchmarks/fixtures.py --record   # record real responses (stop 523, line 1100)
+```
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+from itranvias_api.queryitr.synthetic import SyntheticNetwork
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+FIXTURES: dict[str, tuple[int, dict]] = {
+    "func0": (0, {"dato": 523}),
+    "func1": (1, {}),
+    "func2": (2, {"dato": 1100}),
+    "func7": (7, {"dato": "20160101T000000_gl_0_20160101T000000"}),
+    "func99_P": (99, {"dato": 1100, "mostrar": "P"}),
+    "func99_R": (99, {"dato": 1100, "mostrar": "R"}),
+    "func99_B": (99, {"dato": 1100, "mostrar": "B"}),
+}
+"""
+Name of each fixture -> `(func, params)` of the request it is the response of
+"""
+
+
+def synthetic_fixtures(seed: int = 0) -> dict[str, dict]:
+    """
+    Name of each fixture (see `FIXTURES`) -> its body, generated by `itranvias_api.queryitr.synthetic.SyntheticNetwork`
+    """
+
+    network = SyntheticNetwork(seed)
+    return {
+        name: network.response({"func": func} | params)
+        for name, (func, params) in FIXTURES.items()
+    }
+
+
+def load_fixtures() -> dict[str, bytes]:
+    """
+    Name of each fixture -> its body
+    """
+
+    missing = [
+        name for name in FIXTURES if not (FIXTURES_DIR / f"{name}.json").exists()
+    ]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing fixtures {missing} in {FIXTURES_DIR}, restore them from git or run benchmarks/fixtures.py"
+        )
+
+    return {name: (FIXTURES_DIR / f"{name}.json").read_bytes() for name in FIXTURES}
+
+
+def fixtures_hash(fixtures: dict[str, bytes]) -> str:
+    """
+    SHA-256 of the fixtures (names and bodies), saved with the baselines so results are only compared when measured on the same bytes
+    """
+
+    digest = hashlib.sha256()
+    for name in sorted(fixtures):
+        body = fixtures[name]
+        digest.update(f"{name}:{len(body)}:".encode())
+        digest.update(body)
+    return digest.hexdigest()
+
+
+def write_fixtures(fixtures: dict[str, dict | bytes]) -> None:
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for name, body in fixtures.items():
+        if isinstance(body, dict):
+            body = json.dumps(body, ensure_ascii=False).encode()
+        (FIXTURES_DIR / f"{name}.json").write_bytes(body)
+
+
+def record() -> dict[str, bytes]:
+    """
+    Gets the real response of every fixture
+    """
+
+    import itranvias_api.queryitr as api
+
+    adapter = api._queryitr_adapter
+    return {
+        name: adapter._get_session()
+        .get(adapter.url, params={"func": func} | params, timeout=adapter.timeout)
+        .content
+        for name, (func, params) in FIXTURES.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixtures = record() if args.record else synthetic_fixtures(args.seed)
+    write_fixtures(fixtures)
+    for name in fixtures:
+        size = (FIXTURES_DIR / f"{name}.json").stat().st_size
+        print(f"{name:<9} {size / 1024:8.1f} kB")
+    print(f"hash      {fixtures_hash(load_fixtures())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Fleet sweep benchmark: time to take a `fleet_snapshot` of the whole network with different concurrencies, and to look a bus up in it
+
+Usage (with the package installed, e.g. `pip install -e .`, needs network access):
+
+``` bash
+python benchmarks/fleet.py
+python benchmarks/fleet.py --positions --concurrency 1 8 16
+```
+"""
+
+import argparse
+import time
+
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.fleet import fleet_snapshot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--positions", action="store_true")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 16])
+    args = parser.parse_args()
+
+    line_ids = list(api.lines.get_all_lines())
+
+    for max_concurrency in args.concurrency:
+        snapshot = fleet_snapshot(line_ids, args.positions, max_concurrency)
+        print(
+            f"max_concurrency={max_concurrency:<3} {len(line_ids)} lines -> {len(snapshot)} buses"
+            f" in {snapshot.sweep_time:.2f} s ({len(snapshot.errors)} failed lines)"
+        )
+
+    bus_ids = list(snapshot) or [0]
+    repeat = 100_000
+    start = time.perf_counter()
+    for i in range(repeat):
+        snapshot.get(bus_ids[i % len(bus_ids)])
+    print(f"Lookup by bus id: {(time.perf_counter() - start) / repeat * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark of the caching gateway (`itranvias-cli serve`) against a local stub upstream (`itranvias_api.queryitr.standin`):
+many clients polling the same few stops and lines, revalidating with `If-None-Match` like a browser would.
+It reports the gateway's throughput and latency, and how many upstream requests the downstream ones cost
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/gateway.py
+python benchmarks/gateway.py --clients 64 --duration 10 --upstream-latency 0.15
+```
+"""
+
+import argparse
+import random
+import threading
+import time
+
+import requests
+
+from itranvias_api.queryitr.cache import ResponseCache
+from itranvias_api.queryitr.gateway import Gateway
+from itranvias_api.queryitr.metrics import Histogram
+from itranvias_api.queryitr.queryitr_adapter import QueryItrAdapter
+from itranvias_api.queryitr.standin import StandInServer
+
+PATHS: list[str] = [
+    *(f"/stops/{stop_id}" for stop_id in (1, 42, 99, 523, 600, 874)),
+    *(f"/lines/{line_id}" for line_id in (100, 1100, 2300)),
+    "/lines",
+    "/lines/1100/maps?show=PR",
+]
+"""
+What the clients poll, each request picks one at random
+"""
+
+
+def client(
+    base_url: str,
+    deadline: float,
+    latency: Histogram,
+    statuses: dict[int, int],
+    lock: threading.Lock,
+    seed: int,
+) -> None:
+    r = random.Random(seed)
+    session = requests.Session()
+    etags = {}
+
+    while time.perf_counter() < deadline:
+        path = r.choice(PATHS)
+        headers = {"If-None-Match": etags[path]} if path in etags else {}
+
+        start = time.perf_counter()
+        response = session.get(base_url + path, headers=headers)
+        response.content
+        elapsed = time.perf_counter() - start
+
+        if "ETag" in response.headers:
+            etags[path] = response.headers["ETag"]
+        with lock:
+            latency.observe(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument(
+        "--upstream-latency",
+        type=float,
+        default=0.1,
+        help="seconds each upstream response is delayed",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=None,
+        help="ttl of every response, the default ttls (5s for real-time data) otherwise",
+    )
+    args = parser.parse_args()
+
+    with StandInServer(latency=args.upstream_latency) as upstream:
+        cache = (
+            ResponseCache(ttl=lambda *_: args.ttl)
+            if args.ttl is not None
+            else ResponseCache()
+        )
+        adapter = QueryItrAdapter(upstream.url, cache=cache, pool_maxsize=args.clients)
+
+        with Gateway(adapter, port=0) as gateway:
+            latency = Histogram()
+            statuses = {}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + args.duration
+
+            threads = [
+                threading.Thread(
+                    target=client,
+                    args=(gateway.url, deadline, latency, statuses, lock, seed),
+                )
+                for seed in range(args.clients)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            stats = gateway.stats()
+
+    total = latency.count
+    print(
+        f"{args.clients} clients for {args.duration}s, upstream latency {args.upstream_latency * 1000:.0f} ms"
+    )
+    print(f"downstream requests  {total:>8}  ({total / args.duration:.0f} req/s)")
+    print(
+        f"  200 / 304 / other  {statuses.get(200, 0):>8} / {statuses.get(304, 0)} / {total - statuses.get(200, 0) - statuses.get(304, 0)}"
+    )
+    print(
+        "  latency (client)   "
+        f"mean {latency.sum / total * 1000:.1f} ms, p50 <= {latency.quantile(0.5) * 1000:g} ms, p99 <= {latency.quantile(0.99) * 1000:g} ms"
+    )
+    print(
+        f"upstream requests    {upstream.stats['requests']:>8}  ({total / max(upstream.stats['requests'], 1):.0f} downstream each)"
+    )
+    print(f"  coalesced          {stats['coalesced_requests']:>8}")
+    print(f"  encodings          {stats['encodings']:>8}")
+    print(f"cache                {stats['cache']}")
+
+
+if __name__ == "__main__":
+    main()
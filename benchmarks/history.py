@@ -0,0 +1,148 @@
+"""
+Fleet history benchmark: size on disk, write time, load time and query time of a synthetic day of fleet snapshots,
+stored as a columnar `itranvias_api.queryitr.history` versus pickled lists of `Bus`es
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/history.py
+python benchmarks/history.py --buses 150 --interval 15
+```
+"""
+
+import argparse
+import pickle
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from itranvias_api.queryitr.fleet import FleetSnapshot, FleetVehicle
+from itranvias_api.queryitr.geometry import _numpy
+from itranvias_api.queryitr.history import FleetHistory, FleetHistoryWriter
+from itranvias_api.queryitr.models import Bus, Location, Stop
+
+
+def synthetic_day(buses: int, interval: float, seed: int = 0) -> list[FleetSnapshot]:
+    """
+    A snapshot every `interval` seconds from 6:00 to 24:00, `buses` buses spread over 24 lines
+    """
+
+    r = random.Random(seed)
+    start = datetime(2024, 5, 21, 6)
+    lines = {
+        bus_id: 100 * (i % 24 + 1) for i, bus_id in enumerate(range(3000, 3000 + buses))
+    }
+    progress = {bus_id: r.random() for bus_id in lines}
+
+    snapshots = []
+    for k in range(int(18 * 3600 / interval)):
+        date = start + timedelta(seconds=k * interval)
+        snapshot = FleetSnapshot()
+        for bus_id, line_id in lines.items():
+            progress[bus_id] = (progress[bus_id] + r.random() * 0.01) % 1
+            snapshot[bus_id] = FleetVehicle(
+                bus_id=bus_id,
+                line_id=line_id,
+                route_id=r.choice((0, 1)),
+                last_stop=Stop(r.randint(1, 1100)),
+                state=r.choice((0, 1)),
+                route_progress=round(progress[bus_id], 3),
+                location=Location(43.33 + r.random() * 0.06, -8.46 + r.random() * 0.1),
+                request_date=date,
+            )
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def timed(operation) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = operation()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--buses", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=30)
+    args = parser.parse_args()
+
+    snapshots = synthetic_day(args.buses, args.interval)
+    rows = sum(map(len, snapshots))
+    print(f"{len(snapshots)} snapshots, {rows} rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+
+        # What we used to do: pickle the buses of every snapshot
+        pickle_path = directory / "day.pickle"
+
+        def _write_pickle():
+            with open(pickle_path, "wb") as f:
+                pickle.dump(
+                    [
+                        (
+                            snapshot.taken_at,
+                            [
+                                Bus(
+                                    id=v.bus_id,
+                                    state=v.state,
+                                    route_progress=v.route_progress,
+                                    last_stop=v.last_stop,
+                                    location=v.location,
+                                )
+                                for v in snapshot.values()
+                            ],
+                        )
+                        for snapshot in snapshots
+                    ],
+                    f,
+                )
+
+        def _load_pickle():
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+
+        def _write_history():
+            writer = FleetHistoryWriter(directory / "history")
+            for snapshot in snapshots:
+                writer.append_snapshot(snapshot)
+
+        history_size = lambda: sum(
+            f.stat().st_size for f in (directory / "history").iterdir()
+        )
+
+        _numpy()  # Imported before timing, it is slow to import
+
+        write_pickle, _ = timed(_write_pickle)
+        write_history, _ = timed(_write_history)
+        load_pickle, _ = timed(_load_pickle)
+        load_history, history = timed(lambda: FleetHistory(directory / "history"))
+
+        print(f"{'':<10} {'size MB':>9} {'write s':>9} {'load ms':>9}")
+        print(
+            f"{'pickle':<10} {pickle_path.stat().st_size / 1e6:>9.2f} {write_pickle:>9.2f} {load_pickle * 1000:>9.1f}"
+        )
+        print(
+            f"{'history':<10} {history_size() / 1e6:>9.2f} {write_history:>9.2f} {load_history * 1000:>9.1f}"
+        )
+
+        start, end = datetime(2024, 5, 21, 8), datetime(2024, 5, 21, 9)
+        for name, query in (
+            ("1h range", lambda: history.query(start, end)),
+            ("1h, 1 line", lambda: history.query(start, end, line_id=1100)),
+            ("day, 1 bus", lambda: history.query(bus_id=3007)),
+        ):
+            repeat = 20
+            elapsed, result = timed(lambda: [query() for _ in range(repeat)])
+            print(
+                f"query {name:<12} {elapsed / repeat * 1000:>8.2f} ms ({len(result[0]['bus_id'])} rows)"
+            )
+
+        del result
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Startup benchmark: measures how long importing the package takes, using `python -X importtime`
+
+Usage:
+
+``` bash
+python benchmarks/importtime.py [--runs 20] [--max-ms 50] [module ...]
+```
+
+It prints the median cumulative import time of each module (by default `itranvias_api`, `itranvias_api.queryitr` and
+`itranvias_api.queryitr.stops`) and, with `--max-ms`, exits with an error if any of them is slower than that.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    "itranvias_api",
+    "itranvias_api.queryitr",
+    "itranvias_api.queryitr.stops",
+]
+
+
+def import_time_us(module: str) -> int:
+    """
+    Imports `module` in a fresh interpreter and returns its cumulative import time (in microseconds)
+    """
+
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    for line in reversed(output.splitlines()):
+        _, _, cumulative, name = (
+            part.strip() for part in line.replace(":", "|").split("|")
+        )
+        if name == module:
+            return int(cumulative)
+
+    raise RuntimeError(f"{module} doesn't appear in the importtime output")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    too_slow = False
+    for module in args.modules:
+        times_ms = [import_time_us(module) / 1000 for _ in range(args.runs)]
+        median_ms = statistics.median(times_ms)
+        print(f"{module:<40} median {median_ms:7.2f} ms   min {min(times_ms):7.2f} ms")
+
+        if args.max_ms is not None and median_ms > args.max_ms:
+            too_slow = True
+
+    if too_slow:
+        sys.exit(f"Some imports took more than {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
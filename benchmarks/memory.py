@@ -0,0 +1,106 @@
+"""
+Memory benchmark: bytes per `Bus` / `Stop` of the models, compared with equivalent `__dict__` based classes (what the models were before using `__slots__`)
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/memory.py             # full get_general_info + all-lines fleet sweep (needs network access)
+python benchmarks/memory.py --synthetic # made up network of 1000 stops and 600 buses, no network needed
+```
+"""
+
+import argparse
+import random
+import tracemalloc
+
+from itranvias_api.queryitr import models
+
+
+def dict_based(cls: type) -> type:
+    """
+    Same class (same `__init__`) but storing its attributes in a per-instance `__dict__`
+    """
+
+    return type(f"Dict{cls.__name__}", (), {"__init__": cls.__init__})
+
+
+def bytes_per_object(cls: type, kwargs_list: list[dict]) -> float:
+    """
+    Builds one `cls` for each kwargs and returns the average traced memory per instance
+    """
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(**kwargs) for kwargs in kwargs_list]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list holding them isn't part of the objects
+    list_size = objects.__sizeof__()
+    return (after - before - list_size) / len(objects)
+
+
+def sweep() -> tuple[list[models.Stop], list[models.Bus]]:
+    """
+    Gets every stop from `get_general_info` and every bus from `get_line_buses` of every line
+    """
+
+    import itranvias_api.queryitr as api
+
+    stops = list(api.info.get_general_info()["stops"].values())
+    buses = []
+    for line_id, routes in api.lines.get_many_line_buses(api.lines.get_all_lines()):
+        if isinstance(routes, Exception):
+            print(f"Line {line_id} failed: {routes}")
+            continue
+        for route in routes.values():
+            for stop_buses in route.buses.values():
+                buses.extend(stop_buses)
+
+    return stops, buses
+
+
+def synthetic(n_stops: int = 1000, n_buses: int = 600) -> tuple[list, list]:
+    stops = [
+        models.Stop(
+            id=stop_id,
+            name=f"Stop {stop_id}",
+            lat=43.3 + random.random() / 20,
+            long=-8.4 - random.random() / 20,
+            connections=[models.Line(id=100 * random.randint(1, 30))],
+        )
+        for stop_id in range(n_stops)
+    ]
+    buses = [
+        models.Bus(
+            id=3000 + bus_id,
+            state=random.choice((0, 1)),
+            route_progress=random.random(),
+            last_stop=models.Stop(id=random.randrange(n_stops)),
+        )
+        for bus_id in range(n_buses)
+    ]
+    return stops, buses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    stops, buses = synthetic() if args.synthetic else sweep()
+
+    for cls, objects in ((models.Stop, stops), (models.Bus, buses)):
+        kwargs_list = [
+            {field: getattr(obj, field) for field in cls.__slots__} for obj in objects
+        ]
+        slots = bytes_per_object(cls, kwargs_list)
+        legacy = bytes_per_object(dict_based(cls), kwargs_list)
+        print(
+            f"{cls.__name__:<5} x{len(objects):<6} {legacy:7.1f} B with __dict__ -> {slots:7.1f} B with __slots__"
+            f" ({100 * (1 - slots / legacy):.0f}% less)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Journey planner benchmark: time to build the `Network`, to plan a journey and to precompute all the pairs
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/network.py             # lines from get_general_info (needs network access)
+python benchmarks/network.py --synthetic # made up network of 30 lines over 1000 stops, no network needed
+```
+"""
+
+import argparse
+import random
+import time
+
+from itranvias_api.queryitr.models import Line, Route, Stop
+from itranvias_api.queryitr.network import Network
+
+
+def synthetic_lines(n_lines: int = 30, n_stops: int = 1000) -> dict[int, Line]:
+    lines = {}
+    for i in range(1, n_lines + 1):
+        stop_ids = random.sample(range(n_stops), random.randint(20, 45))
+        lines[100 * i] = Line(
+            id=100 * i,
+            routes={
+                0: Route(id=0, stops=[Stop(id=stop_id) for stop_id in stop_ids]),
+                1: Route(id=1, stops=[Stop(id=stop_id) for stop_id in stop_ids[::-1]]),
+            },
+        )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        lines = synthetic_lines()
+    else:
+        import itranvias_api.queryitr as api
+
+        lines = api.info.get_general_info()["lines"]
+
+    start = time.perf_counter()
+    network = Network(lines)
+    print(
+        f"Built a network of {len(network.stop_ids)} stops and {len(network.routes)} routes"
+        f" in {(time.perf_counter() - start) * 1e3:.2f} ms"
+    )
+
+    served = [
+        stop_id
+        for stop_id in network.stop_ids
+        if network.stop_routes[network.stop_index[stop_id]]
+    ]
+    pairs = [tuple(random.sample(served, 2)) for _ in range(args.queries)]
+
+    for minimize in ("transfers", "stops"):
+        found = 0
+        start = time.perf_counter()
+        for origin, destination in pairs:
+            found += network.plan(origin, destination, minimize=minimize) is not None
+        elapsed = time.perf_counter() - start
+        print(
+            f"plan(minimize={minimize!r}): {elapsed / len(pairs) * 1e6:7.1f} µs per journey"
+            f" ({found}/{len(pairs)} reachable)"
+        )
+
+    start = time.perf_counter()
+    table = network.all_pairs(served)
+    print(
+        f"all_pairs: {sum(map(len, table.values()))} journeys in {time.perf_counter() - start:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
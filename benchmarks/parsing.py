@@ -0,0 +1,190 @@
+"""
+Offline parsing benchmark suite: ops/s and peak memory of decoding a recorded response and building its models, for every endpoint.
+No network is needed, the responses are the fixtures of `benchmarks/fixtures.py`.
+A baseline is only compared if it was saved with the same fixtures (see `fixtures_hash`). `baseline.json` is the committed one
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/parsing.py                              # run and print the results
+python benchmarks/parsing.py --save benchmarks/baseline.json     # also save them as a baseline
+python benchmarks/parsing.py --compare benchmarks/baseline.json  # compare with a baseline, fails if something regressed more than --threshold
+python benchmarks/parsing.py --only get_general_info      # run only some cases
+```
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from fixtures import fixtures_hash, load_fixtures
+
+from itranvias_api.queryitr.info import _parse_general_info
+from itranvias_api.queryitr.lines import (
+    _parse_all_lines,
+    _parse_line_buses,
+    _parse_line_maps,
+)
+from itranvias_api.queryitr.queryitr_adapter import QueryItrResponse
+from itranvias_api.queryitr.stops import _parse_stop_buses
+
+
+class FakeResponse:
+    """
+    The only part of a `requests.Response` used by `QueryItrResponse`
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+CASES: dict[str, tuple[str, Callable[[dict], object]]] = {
+    "get_stop_buses": ("func0", _parse_stop_buses),
+    "get_all_lines": ("func1", _parse_all_lines),
+    "get_line_buses": ("func2", _parse_line_buses),
+    "get_general_info": ("func7", _parse_general_info),
+    "get_line_maps[P]": ("func99_P", _parse_line_maps),
+    "get_line_maps[R]": ("func99_R", _parse_line_maps),
+    "get_line_maps[R, compact]": (
+        "func99_R",
+        lambda data: _parse_line_maps(data, compact_paths=True),
+    ),
+    "get_line_maps[B]": ("func99_B", _parse_line_maps),
+}
+"""
+Name of each case -> `(fixture, parser)`. An operation is decoding the fixture into a `QueryItrResponse` and parsing its data, what a call costs without the network
+"""
+
+
+def ops_per_second(
+    operation: Callable[[], object], rounds: int, min_time: float
+) -> float:
+    """
+    Best of `rounds` rounds, each running `operation` for at least `min_time` seconds
+    """
+
+    best = 0
+    for _ in range(rounds):
+        count = 0
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < min_time:
+            operation()
+            count += 1
+        best = max(best, count / elapsed)
+    return best
+
+
+def peak_memory(operation: Callable[[], object]) -> int:
+    """
+    Peak memory (in bytes) allocated while running `operation` once, its result included
+    """
+
+    tracemalloc.start()
+    result = operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def run(names: list[str], rounds: int, min_time: float) -> dict[str, dict]:
+    fixtures = load_fixtures()
+    results = {}
+
+    for name in names:
+        fixture, parser = CASES[name]
+        response = FakeResponse(fixtures[fixture])
+
+        def operation():
+            return parser(QueryItrResponse(response).data)
+
+        results[name] = {
+            "ops": ops_per_second(operation, rounds, min_time),
+            "peak_kb": peak_memory(operation) / 1024,
+            "size_kb": len(fixtures[fixture]) / 1024,
+        }
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Prints the results next to the baseline
+
+    :return: The regressions (cases where ops/s dropped or the peak memory grew more than `threshold`)
+    """
+
+    regressions = []
+    print(f"{'case':<26} {'ops/s':>10} {'vs base':>8} {'peak kB':>10} {'vs base':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(
+                f"{name:<26} {result['ops']:>10.1f} {'-':>8} {result['peak_kb']:>10.1f} {'-':>8}"
+            )
+            continue
+
+        speed = result["ops"] / base["ops"] - 1
+        memory = result["peak_kb"] / base["peak_kb"] - 1
+        print(
+            f"{name:<26} {result['ops']:>10.1f} {speed:>+8.1%} {result['peak_kb']:>10.1f} {memory:>+8.1%}"
+        )
+        if speed < -threshold:
+            regressions.append(f"{name}: {-speed:.0%} fewer ops/s")
+        if memory > threshold:
+            regressions.append(f"{name}: {memory:.0%} more peak memory")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--save", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="compare with a saved baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="fraction of slowdown/memory growth considered a regression (default 0.2)",
+    )
+    args = parser.parse_args()
+
+    fixtures = fixtures_hash(load_fixtures())
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        if saved.get("fixtures") != fixtures:
+            sys.exit(
+                f"{args.compare} was saved with other fixtures (hash {saved.get('fixtures')}, now {fixtures}),"
+                " the results aren't comparable. Save a new baseline"
+            )
+        baseline = saved["results"]
+
+    results = run(args.only, args.rounds, args.min_time)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"fixtures": fixtures, "results": results}, f, indent=2)
+            f.write("\n")
+
+    if regressions:
+        print(
+            "\nRegressions:\n"
+            + "\n".join(f"- {regression}" for regression in regressions)
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
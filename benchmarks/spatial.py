@@ -0,0 +1,98 @@
+"""
+Spatial index benchmark: queries per second of `StopIndex` on the full network, compared with a linear haversine scan
+
+Usage (with the package installed, e.g. `pip install -e .`):
+
+``` bash
+python benchmarks/spatial.py             # stops from get_general_info (needs network access)
+python benchmarks/spatial.py --synthetic # made up network of 1200 stops around A Coruña, no network needed
+```
+"""
+
+import argparse
+import random
+import time
+
+from itranvias_api.queryitr.geometry import haversine
+from itranvias_api.queryitr.models import Line, Stop
+from itranvias_api.queryitr.spatial import StopIndex
+
+
+def synthetic_stops(n_stops: int = 1200) -> list[Stop]:
+    return [
+        Stop(
+            id=stop_id,
+            lat=43.33 + random.random() * 0.06,
+            long=-8.46 + random.random() * 0.1,
+            connections=[Line(id=100 * random.randint(1, 30))],
+        )
+        for stop_id in range(n_stops)
+    ]
+
+
+def rate(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return repeat / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        stops = synthetic_stops()
+    else:
+        import itranvias_api.queryitr as api
+
+        stops = list(api.info.get_general_info()["stops"].values())
+
+    start = time.perf_counter()
+    index = StopIndex(stops)
+    print(f"Indexed {len(index)} stops in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    lats = [stop.location.lat for stop in index.stops]
+    longs = [stop.location.long for stop in index.stops]
+    points = [
+        (random.uniform(min(lats), max(lats)), random.uniform(min(longs), max(longs)))
+        for _ in range(args.queries)
+    ]
+    queries = iter(points * 1000)
+
+    def linear_scan():
+        lat, long = next(queries)
+        return sorted(
+            haversine(lat, long, stop.location.lat, stop.location.long)
+            for stop in index.stops
+        )[:5]
+
+    def one(method, argument):
+        def query():
+            lat, long = next(queries)
+            return method(lat, long, argument)
+
+        return query
+
+    n = args.queries
+    results = {
+        "linear scan, nearest k=5": rate(linear_scan, max(n // 10, 1)),
+        "nearest k=5": rate(one(index.nearest, 5), n),
+        "within 300 m": rate(one(index.within, 300), n),
+        "nearest_many k=5": n / (timed(index.nearest_many, points, 5)),
+        "within_many 300 m": n / (timed(index.within_many, points, 300)),
+    }
+    for name, qps in results.items():
+        print(f"{name:<28} {qps:12,.0f} queries/s")
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,18 @@
 .. include:: ../README.md
 """
 
-# QueryItr endpoints
-from . import queryitr
+import importlib
 
 __all__ = ["queryitr"]
+
+
+def __getattr__(name: str):
+    # QueryItr endpoints, imported when first used
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -4,17 +4,73 @@ hi
 """
 
 import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
 import itranvias_api.queryitr as api
+from itranvias_api.queryitr.store import StaticDataStore
+
+STATIC_DATA_MAX_AGE = timedelta(days=1)
+"""
+How old the cached static data can be before it is refreshed
+"""
+
+_static_data: StaticDataStore = None
+_force_static_data_refresh: bool = False
+
+
+def static_data_path() -> Path:
+    """
+    Where the static data is cached, following the XDG base directory spec
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "itranvias_api" / "static_data.sqlite"
+
+
+def get_static_data() -> StaticDataStore:
+    """
+    Opens the cached static data the first time it is needed, refreshing it if it has expired (or a refresh was forced)
+    """
+
+    global _static_data
+
+    if _static_data is None:
+        path = static_data_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store = StaticDataStore(path)
+
+        last_refresh = store.last_refresh
+        if (
+            _force_static_data_refresh
+            or last_refresh is None
+            or datetime.now() - last_refresh > STATIC_DATA_MAX_AGE
+        ):
+            try:
+                store.refresh()
+            except Exception as e:
+                if last_refresh is None:
+                    raise
+                print(
+                    f"Couldn't refresh the static data, using the cached one: {e}",
+                    file=sys.stderr,
+                )
+
+        _static_data = store
 
-STATIC_DATA = api.info.get_general_info()
+    return _static_data
 
 
 def line_id_to_name(line_id: int) -> str:
-    return STATIC_DATA["lines"][line_id].name
+    line = get_static_data().get_line(line_id)
+    return line.name if line else str(line_id)
 
 
 def stop_id_to_name(stop_id: int) -> str:
-    return STATIC_DATA["stops"][stop_id].name
+    stop = get_static_data().get_stop(stop_id)
+    return stop.name if stop else "?"
 
 
 def display_next_buses(buses_data: dict) -> None:
@@ -50,10 +106,38 @@ def display_route_stops_and_buses(route: api.models.Route) -> None:
             print(buses_str)
 
 
+def serve(
+    host: str, port: int, upstream: str, cache_size: int, push_interval: float
+) -> None:
+    from itranvias_api.queryitr.cache import ResponseCache
+    from itranvias_api.queryitr.gateway import Gateway
+    from itranvias_api.queryitr.metrics import Metrics
+
+    adapter = api._queryitr_adapter
+    if upstream:
+        adapter.url = upstream
+    adapter.cache = ResponseCache(max_size=cache_size, serve_stale=True)
+    adapter.metrics = Metrics()
+
+    gateway = Gateway(adapter, host, port, push_interval)
+    print(f"Serving on {gateway.url} (upstream {adapter.url})")
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.server_close()
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Get real-time bus information for the city of A Coruña."
     )
+    parser.add_argument(
+        "--refresh-static-data",
+        action="store_true",
+        help="Refresh the cached lines and stops info, even if it hasn't expired.",
+    )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # Subcommand for querying by stop
@@ -73,16 +157,59 @@ def main() -> None:
         help="The route id of the line to query (usually 0 outbound/ida, 1 return/vuelta).",
     )
 
+    # Subcommand for the caching gateway
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Serve stops, lines, info and maps as local JSON endpoints, through a shared cache.",
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on."
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8000, help="Port to listen on."
+    )
+    serve_parser.add_argument(
+        "--upstream",
+        help="Url of the queryitr_v3.php to use, e.g. a local stand-in (python -m itranvias_api.queryitr.standin).",
+    )
+    serve_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=4096,
+        help="Maximum number of upstream responses cached.",
+    )
+    serve_parser.add_argument(
+        "--push-interval",
+        type=float,
+        default=15,
+        help="Seconds between polls of the stops and lines subscribed to through /events.",
+    )
+
     args = parser.parse_args()
 
+    global _force_static_data_refresh
+    _force_static_data_refresh = args.refresh_static_data
+
     if args.command == "stop":
         next_buses = api.stops.get_stop_buses(args.stop_id)
         display_next_buses(next_buses)
     elif args.command == "line":
+        static_route = get_static_data().get_route(args.line_id, args.route_id)
+        if static_route is None:
+            print(
+                f"It looks like line {line_id_to_name(args.line_id)} has no route {args.route_id}"
+            )
+            return
+
         routes = api.lines.get_line_buses(args.line_id)
-        route = routes[args.route_id]
-        route.stops = STATIC_DATA["lines"][args.line_id].routes[0].stops
+        # A route without buses giving service may be missing
+        route = routes.get(args.route_id) or api.models.Route(
+            id=args.route_id, buses={}
+        )
+        route.stops = static_route.stops
         display_route_stops_and_buses(route)
+    elif args.command == "serve":
+        serve(args.host, args.port, args.upstream, args.cache_size, args.push_interval)
 
 
 if __name__ == "__main__":
@@ -22,15 +22,58 @@ else:
 ```
 """
 
-from .queryitr_adapter import QueryItrAdapter as _QueryItrAdapter
-from .known_servers import ITRANVIAS_WEB as _QUERYITR_URL
+import importlib
 
-_queryitr_adapter = _QueryItrAdapter(_QUERYITR_URL)
+__all__ = ["lines", "stops", "info", "models"]
 
-from . import lines
-from . import stops
-from . import info
-from . import models
+_SUBMODULES: frozenset[str] = frozenset(
+    [
+        "lines",
+        "stops",
+        "info",
+        "models",
+        "store",
+        "cache",
+        "geometry",
+        "spatial",
+        "network",
+        "decoding",
+        "subscriptions",
+        "fleet",
+        "scheduler",
+        "resilience",
+        "metrics",
+        "transport",
+        "synthetic",
+        "standin",
+        "gateway",
+        "push",
+        "history",
+        "analytics",
+        "boards",
+        "aio",
+    ]
+)
+"""
+Every submodule, imported on first access as an attribute. Only the public core is in `__all__`,
+so `import *` doesn't import them all (nor fail without the optional dependencies of some, like `aio`)
+"""
 
 
-__all__ = ["lines", "stops", "info", "models"]
+def __getattr__(name: str):
+    # Submodules (and the HTTP stack under them) are only imported when first used
+    if name == "_queryitr_adapter":
+        from .queryitr_adapter import QueryItrAdapter
+        from .known_servers import ITRANVIAS_WEB
+
+        # setdefault so that concurrent first uses end up sharing the same adapter
+        return globals().setdefault(name, QueryItrAdapter(ITRANVIAS_WEB))
+
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,36 @@
+"""
+# Introduction
+
+Asyncio flavour of `itranvias_api.queryitr`. It mirrors `stops`, `lines` and `info` with coroutines, sharing the response parsing with the blocking API,
+so many queries can run concurrently on a single event loop.
+
+It needs [aiohttp](https://docs.aiohttp.org), which can be installed with `pip install itranvias_api[async]`.
+
+# Quick example
+
+``` python
+import asyncio
+import itranvias_api.queryitr.aio as api
+
+
+async def main():
+    boards = await asyncio.gather(*(api.stops.get_stop_buses(stop_id) for stop_id in (523, 524, 525)))
+    print(boards)
+
+
+asyncio.run(main())
+```
+"""
+
+from ..async_queryitr_adapter import AsyncQueryItrAdapter as _AsyncQueryItrAdapter
+from ..known_servers import ITRANVIAS_WEB as _QUERYITR_URL
+
+_queryitr_adapter = _AsyncQueryItrAdapter(_QUERYITR_URL)
+
+from . import lines
+from . import stops
+from . import info
+from . import subscriptions
+
+
+__all__ = ["lines", "stops", "info", "subscriptions"]
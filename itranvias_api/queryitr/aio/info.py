@@ -0,0 +1,23 @@
+from . import _queryitr_adapter
+from ..info import _general_info_dato, _parse_general_info
+
+from datetime import datetime
+
+
+async def get_general_info(
+    last_request_date: datetime = datetime(2016, 1, 1),
+    last_message_id: int = 0,
+    last_message_date: datetime = datetime(2016, 1, 1),
+    language: str = "en",
+    fix_route_id: bool = True,
+) -> dict:
+    """
+    Async version of `itranvias_api.queryitr.info.get_general_info`
+    """
+
+    dato = _general_info_dato(
+        last_request_date, last_message_id, last_message_date, language
+    )
+    response = await _queryitr_adapter.get(func=7, dato=dato)
+
+    return _queryitr_adapter.build(7, _parse_general_info, response.data, fix_route_id)
@@ -0,0 +1,72 @@
+from . import _queryitr_adapter
+from ..models import Line, Route
+from ..lines import _parse_all_lines, _parse_line_buses, _parse_line_maps
+from ..concurrency import async_fan_out
+
+from typing import AsyncIterator, Iterable
+
+
+async def get_all_lines() -> dict[int, Line]:
+    """
+    Async version of `itranvias_api.queryitr.lines.get_all_lines`
+    """
+
+    response = await _queryitr_adapter.get(func=1)
+
+    return _queryitr_adapter.build(1, _parse_all_lines, response.data)
+
+
+async def get_line_buses(line_id: int) -> dict[int, Route]:
+    """
+    Async version of `itranvias_api.queryitr.lines.get_line_buses`
+    """
+
+    response = await _queryitr_adapter.get(func=2, dato=line_id)
+
+    return _queryitr_adapter.build(2, _parse_line_buses, response.data)
+
+
+def get_many_line_buses(
+    line_ids: Iterable[int], max_concurrency: int = 64
+) -> AsyncIterator[tuple[int, dict[int, Route] | Exception]]:
+    """
+    Async version of `itranvias_api.queryitr.lines.get_many_line_buses`, use it with `async for`
+    """
+
+    return async_fan_out(get_line_buses, line_ids, max_concurrency)
+
+
+async def get_line_maps(
+    line_id: int, show: str = "PRB", compact_paths: bool = False
+) -> dict[int, Route]:
+    """
+    Async version of `itranvias_api.queryitr.lines.get_line_maps`
+    """
+
+    response = await _queryitr_adapter.get(func=99, dato=line_id, mostrar=show)
+
+    return _queryitr_adapter.build(99, _parse_line_maps, response.data, compact_paths)
+
+
+async def get_line_stop_map(line_id: int) -> dict[int, Route]:
+    """
+    Calls `get_line_maps` but only gets the stops map
+    """
+
+    return await get_line_maps(line_id=line_id, show="P")
+
+
+async def get_line_paths(line_id: int, compact_paths: bool = False) -> dict[int, Route]:
+    """
+    Calls `get_line_maps` but only gets the paths map
+    """
+
+    return await get_line_maps(line_id=line_id, show="R", compact_paths=compact_paths)
+
+
+async def get_line_bus_map(line_id: int) -> dict[int, Route]:
+    """
+    Calls `get_line_maps` but only gets the buses map
+    """
+
+    return await get_line_maps(line_id=line_id, show="B")
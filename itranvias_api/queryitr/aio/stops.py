@@ -0,0 +1,26 @@
+from . import _queryitr_adapter
+from ..models import Bus
+from ..stops import _parse_stop_buses
+from ..concurrency import async_fan_out
+
+from typing import AsyncIterator, Iterable
+
+
+async def get_stop_buses(stop_id: int) -> dict[int, list[Bus]]:
+    """
+    Async version of `itranvias_api.queryitr.stops.get_stop_buses`
+    """
+
+    response = await _queryitr_adapter.get(func=0, dato=stop_id)
+
+    return _queryitr_adapter.build(0, _parse_stop_buses, response.data)
+
+
+def get_many_stop_buses(
+    stop_ids: Iterable[int], max_concurrency: int = 64
+) -> AsyncIterator[tuple[int, dict[int, list[Bus]] | Exception]]:
+    """
+    Async version of `itranvias_api.queryitr.stops.get_many_stop_buses`, use it with `async for`
+    """
+
+    return async_fan_out(get_stop_buses, stop_ids, max_concurrency)
@@ -0,0 +1,72 @@
+from ..subscriptions import ChangeEvent, _Hub, _keys
+from ..concurrency import async_fan_out
+
+import asyncio
+from typing import AsyncIterator, Iterable
+
+
+class AsyncSubscriptionHub(_Hub):
+    """
+    Async version of `itranvias_api.queryitr.subscriptions.SubscriptionHub`, polls from a task on the running event loop
+    """
+
+    def __init__(self, interval: float = 15, max_concurrency: int = 64):
+        """
+        :param interval: Seconds between polls of the targets
+
+        :param max_concurrency: Maximum number of requests running at the same time in a poll
+        """
+
+        super().__init__(interval, max_concurrency)
+        self._task: asyncio.Task = None
+
+    async def subscribe(
+        self, stops: Iterable[int] = (), lines: Iterable[int] = ()
+    ) -> AsyncIterator[ChangeEvent]:
+        """
+        Async version of `itranvias_api.queryitr.subscriptions.SubscriptionHub.subscribe`, use it with `async for`
+        """
+
+        keys = _keys(stops, lines)
+        subscriber = asyncio.Queue()
+        self._add(keys, subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll_loop())
+        try:
+            while True:
+                yield await subscriber.get()
+        finally:
+            self._remove(keys, subscriber)
+
+    async def _poll_loop(self) -> None:
+        from . import lines, stops
+
+        async def _fetch(key: tuple[str, int]) -> dict:
+            target, target_id = key
+            if target == "stop":
+                return await stops.get_stop_buses(target_id)
+            return await lines.get_line_buses(target_id)
+
+        while keys := self._active_keys():
+            async for key, result in async_fan_out(_fetch, keys, self.max_concurrency):
+                self._update(key, result)
+
+            await asyncio.sleep(self.interval)
+
+
+_default_hub: AsyncSubscriptionHub = None
+
+
+def subscribe(
+    stops: Iterable[int] = (), lines: Iterable[int] = ()
+) -> AsyncIterator[ChangeEvent]:
+    """
+    Async version of `itranvias_api.queryitr.subscriptions.subscribe`, use it with `async for`
+    """
+
+    global _default_hub
+
+    if _default_hub is None:
+        _default_hub = AsyncSubscriptionHub()
+
+    return _default_hub.subscribe(stops, lines)
@@ -0,0 +1,382 @@
+"""
+Service analytics over recorded bus states (see `itranvias_api.queryitr.history`): headways, bus bunching, dwell times and segment speeds.
+Everything is vectorized with [NumPy](https://numpy.org) (`pip install itranvias_api[fast]`), so a day of the whole network (millions of samples) takes seconds
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.analytics import RouteIndex, stop_visits, headways, bunching, dwell_times, segment_speeds
+from itranvias_api.queryitr.history import FleetHistory
+
+index = RouteIndex.from_general_info(api.info.get_general_info())
+
+with FleetHistory("history/") as history:
+    visits = stop_visits(history.query())
+
+gaps = headways(visits)
+bunched = bunching(gaps)
+print(f"{len(bunched['bus_id'])} bunching events out of {len(gaps['headway'])} headways")
+
+dwells = dwell_times(visits)
+speeds = segment_speeds(visits, index)
+```
+
+The inputs and outputs are dicts of equally long columns (like `itranvias_api.queryitr.history.FleetHistory.query`).
+All the times are derived from the samples, so their resolution is the sampling interval: a bus is considered to reach a stop
+when it is first seen with it as its `last_stop`
+"""
+
+from .geometry import _numpy, haversine
+from .models import Line, Stop
+
+
+def _np():
+    np = _numpy()
+    if np is None:
+        raise ImportError(
+            "NumPy is needed for the analytics, install it with `pip install itranvias_api[fast]`"
+        )
+    return np
+
+
+def _pack(line_id, route_id, stop_id=0):
+    # line_id | route_id (12 bits) | stop_id (20 bits)
+    np = _np()
+    return (
+        (np.asarray(line_id, dtype=np.int64) << 32)
+        | (np.asarray(route_id, dtype=np.int64) << 20)
+        | np.asarray(stop_id, dtype=np.int64)
+    )
+
+
+def _runs(*keys) -> "numpy.ndarray":
+    """
+    Start index of each run of equal consecutive values of `keys` (all the same length)
+    """
+
+    np = _np()
+    change = np.zeros(len(keys[0]), dtype=bool)
+    if len(change):
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+class RouteIndex:
+    """
+    The stops of every route in order, and the distances between them, as flat arrays.
+    Every stop of every route is a "slot", consecutive stops of a route have consecutive slots
+    """
+
+    def __init__(self, lines: dict[int, Line], stops: dict[int, Stop] = None):
+        """
+        :param lines: The lines (with their routes and their stops), like the `lines` of `itranvias_api.queryitr.info.get_general_info`
+
+        :param stops: The stops (with their locations), like the `stops` of `itranvias_api.queryitr.info.get_general_info`. Needed for the distances
+        """
+
+        np = _np()
+        stops = stops or {}
+
+        slot_line, slot_route, slot_stop, next_distance = [], [], [], []
+        for line in lines.values():
+            for route in line.routes.values():
+                ids = [stop.id for stop in route.stops]
+                for position, stop_id in enumerate(ids):
+                    slot_line.append(line.id)
+                    slot_route.append(route.id)
+                    slot_stop.append(stop_id)
+
+                    here = stops.get(stop_id)
+                    there = (
+                        stops.get(ids[position + 1])
+                        if position + 1 < len(ids)
+                        else None
+                    )
+                    if (
+                        here is not None
+                        and there is not None
+                        and here.location is not None
+                        and there.location is not None
+                    ):
+                        next_distance.append(
+                            haversine(
+                                here.location.lat,
+                                here.location.long,
+                                there.location.lat,
+                                there.location.long,
+                            )
+                        )
+                    else:
+                        next_distance.append(np.nan)
+
+        self.slot_line: "numpy.ndarray" = np.array(slot_line, dtype=np.int32)
+        """
+        Slot -> line id
+        """
+
+        self.slot_route: "numpy.ndarray" = np.array(slot_route, dtype=np.int16)
+        """
+        Slot -> route id
+        """
+
+        self.slot_stop: "numpy.ndarray" = np.array(slot_stop, dtype=np.int32)
+        """
+        Slot -> stop id
+        """
+
+        self.next_distance: "numpy.ndarray" = np.array(next_distance, dtype=np.float64)
+        """
+        Slot -> straight line distance (in meters) to the next stop of the route, `NaN` for the last one (or without locations)
+        """
+
+        keys = _pack(self.slot_line, self.slot_route, self.slot_stop)
+        # Stable, so a stop a route goes through twice maps to its first slot
+        self._order: "numpy.ndarray" = np.argsort(keys, kind="stable")
+        self._keys: "numpy.ndarray" = keys[self._order]
+
+    @classmethod
+    def from_general_info(cls, general_info: dict) -> "RouteIndex":
+        """
+        Builds the index from the output of `itranvias_api.queryitr.info.get_general_info`
+        """
+
+        return cls(general_info["lines"], general_info["stops"])
+
+    def slots(self, line_id, route_id, stop_id) -> "numpy.ndarray":
+        """
+        Slot of each `(line_id, route_id, stop_id)` (arrays, or single values), `-1` where the stop isn't in the route
+        """
+
+        np = _np()
+        keys = _pack(line_id, route_id, stop_id)
+        found = np.searchsorted(self._keys, keys, side="left")
+        found = np.minimum(found, max(len(self._keys) - 1, 0))
+        if not len(self._keys):
+            return np.full(keys.shape, -1, dtype=np.int64)
+        return np.where(self._keys[found] == keys, self._order[found], -1)
+
+
+def stop_visits(samples: dict) -> dict[str, "numpy.ndarray"]:
+    """
+    Turns the samples of buses into visits to stops: a visit starts when a bus is first seen with a stop as its `last_stop`
+
+    :param samples: Columns `timestamp`, `bus_id`, `line_id`, `route_id`, `last_stop` and `state`, like `itranvias_api.queryitr.history.FleetHistory.query`.
+    They don't need to be sorted
+
+    :return: The visits, sorted by bus and time, with columns:
+    - `bus_id`, `line_id`, `route_id` and `stop_id`
+    - `arrival`: When the bus was first seen at the stop (as its last stop)
+    - `departure`: When the bus was first seen at its next stop, or last seen at this one if it has no next visit
+    - `dwell`: Seconds between the first and the last sample with the bus stopped (`state` 0) at the stop, `NaN` if it was never seen stopped.
+    Samples with an unknown state (`-1`, see `itranvias_api.queryitr.history.COLUMNS`) or any other one never count as stopped
+    """
+
+    np = _np()
+
+    stop = np.asarray(samples["last_stop"])
+    valid = np.flatnonzero(stop >= 0)
+    timestamp = np.asarray(samples["timestamp"])[valid]
+    bus = np.asarray(samples["bus_id"])[valid]
+
+    order = valid[np.lexsort((timestamp, bus))]
+    timestamp = np.asarray(samples["timestamp"], dtype=np.float64)[order]
+    bus = np.asarray(samples["bus_id"])[order]
+    line = np.asarray(samples["line_id"])[order]
+    route = np.asarray(samples["route_id"])[order]
+    stop = stop[order]
+    state = np.asarray(samples["state"])[order]
+
+    starts = _runs(bus, line, route, stop)
+    if not len(starts):
+        empty = np.empty(0)
+        return {
+            "bus_id": empty.astype(np.int32),
+            "line_id": empty.astype(np.int32),
+            "route_id": empty.astype(np.int16),
+            "stop_id": empty.astype(np.int32),
+            "arrival": empty,
+            "departure": empty,
+            "dwell": empty,
+        }
+
+    ends = np.append(starts[1:], len(timestamp))
+    arrival = timestamp[starts]
+    visit_bus = bus[starts]
+
+    has_next = np.append(visit_bus[1:] == visit_bus[:-1], False)
+    departure = np.where(has_next, np.append(arrival[1:], np.nan), timestamp[ends - 1])
+
+    stopped = np.where(state == 0, timestamp, np.nan)
+    with np.errstate(invalid="ignore"):
+        dwell = np.fmax.reduceat(stopped, starts) - np.fmin.reduceat(stopped, starts)
+
+    return {
+        "bus_id": visit_bus,
+        "line_id": line[starts],
+        "route_id": route[starts],
+        "stop_id": stop[starts],
+        "arrival": arrival,
+        "departure": departure,
+        "dwell": dwell,
+    }
+
+
+def headways(visits: dict) -> dict[str, "numpy.ndarray"]:
+    """
+    Time between consecutive buses of the same route reaching each stop
+
+    :param visits: The output of `stop_visits`
+
+    :return: A row per pair of consecutive visits to a stop of a route, sorted by line, route, stop and time, with columns
+    `line_id`, `route_id`, `stop_id`, `bus_id` (the later bus), `previous_bus_id`, `arrival` (of the later bus) and `headway` (in seconds)
+    """
+
+    np = _np()
+
+    line, route, stop, arrival = (
+        np.asarray(visits[name])
+        for name in ("line_id", "route_id", "stop_id", "arrival")
+    )
+    order = np.lexsort((arrival, stop, route, line))
+    line, route, stop, arrival = line[order], route[order], stop[order], arrival[order]
+    bus = np.asarray(visits["bus_id"])[order]
+
+    same = (line[1:] == line[:-1]) & (route[1:] == route[:-1]) & (stop[1:] == stop[:-1])
+    later = np.flatnonzero(same) + 1
+
+    return {
+        "line_id": line[later],
+        "route_id": route[later],
+        "stop_id": stop[later],
+        "bus_id": bus[later],
+        "previous_bus_id": bus[later - 1],
+        "arrival": arrival[later],
+        "headway": arrival[later] - arrival[later - 1],
+    }
+
+
+def bunching(
+    headways: dict, ratio: float = 0.25, min_headway: float = None
+) -> dict[str, "numpy.ndarray"]:
+    """
+    Bus bunching events: headways much shorter than usual for their route
+
+    :param headways: The output of `headways`
+
+    :param ratio: A headway is bunched when it is shorter than this fraction of the median headway of its route
+
+    :param min_headway: Seconds, a headway is bunched when it is shorter than this instead (if given)
+
+    :return: The bunched rows of `headways`, with an extra `median_headway` column (of their route)
+    """
+
+    np = _np()
+
+    headway = np.asarray(headways["headway"])
+    group = _pack(headways["line_id"], headways["route_id"])
+
+    # Median of each route: sort by route and headway, and take the middle of each run
+    order = np.lexsort((headway, group))
+    starts = _runs(group[order])
+    counts = np.diff(np.append(starts, len(order)))
+    lower = headway[order][starts + (counts - 1) // 2]
+    upper = headway[order][starts + counts // 2]
+    medians = np.empty(len(order))
+    medians[order] = np.repeat((lower + upper) / 2, counts)
+
+    threshold = (
+        np.full(len(headway), min_headway)
+        if min_headway is not None
+        else ratio * medians
+    )
+    bunched = np.flatnonzero(headway < threshold)
+
+    result = {name: np.asarray(column)[bunched] for name, column in headways.items()}
+    result["median_headway"] = medians[bunched]
+    return result
+
+
+def dwell_times(visits: dict) -> dict[str, "numpy.ndarray"]:
+    """
+    Dwell time at each stop, over the visits where the bus was seen stopped
+
+    :param visits: The output of `stop_visits`
+
+    :return: A row per stop, sorted by stop id, with columns `stop_id`, `visits` (the ones with a dwell time), `mean_dwell` and `max_dwell` (in seconds)
+    """
+
+    np = _np()
+
+    dwell = np.asarray(visits["dwell"])
+    measured = ~np.isnan(dwell)
+    stop_ids, inverse = np.unique(
+        np.asarray(visits["stop_id"])[measured], return_inverse=True
+    )
+    dwell = dwell[measured]
+
+    counts = np.bincount(inverse, minlength=len(stop_ids))
+    totals = np.bincount(inverse, weights=dwell, minlength=len(stop_ids))
+    maxima = np.zeros(len(stop_ids))
+    np.maximum.at(maxima, inverse, dwell)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = totals / counts
+
+    return {
+        "stop_id": stop_ids,
+        "visits": counts,
+        "mean_dwell": mean,
+        "max_dwell": maxima,
+    }
+
+
+def segment_speeds(visits: dict, index: RouteIndex) -> dict[str, "numpy.ndarray"]:
+    """
+    Average speed between each pair of consecutive stops of every route, from the buses seen at one and then at the next one.
+    The time is from arrival to arrival, so it includes the dwell at the first stop. Buses seen skipping a stop (passing two between samples) aren't counted
+
+    :param visits: The output of `stop_visits`
+
+    :param index: The routes, for the order of their stops and the distances between them
+
+    :return: A row per segment with at least one trip, sorted by slot (see `RouteIndex`), with columns `line_id`, `route_id`, `from_stop`, `to_stop`,
+    `trips`, `distance` (straight line, in meters) and `speed` (total distance over total time, in m/s)
+    """
+
+    np = _np()
+
+    bus = np.asarray(visits["bus_id"])
+    arrival = np.asarray(visits["arrival"])
+    slots = index.slots(visits["line_id"], visits["route_id"], visits["stop_id"])
+
+    # Visits are sorted by bus and time, so consecutive rows of the same bus are its consecutive stops.
+    # The last slot of a route is followed by the first of the next one, a bus turning around isn't a segment
+    consecutive = (
+        (bus[1:] == bus[:-1])
+        & (slots[:-1] >= 0)
+        & (slots[1:] == slots[:-1] + 1)
+        & (index.slot_line[slots[:-1]] == index.slot_line[slots[1:]])
+        & (index.slot_route[slots[:-1]] == index.slot_route[slots[1:]])
+        & (arrival[1:] > arrival[:-1])
+    )
+    first = np.flatnonzero(consecutive)
+    segment = slots[first]
+    times = arrival[first + 1] - arrival[first]
+
+    size = len(index.next_distance)
+    trips = np.bincount(segment, minlength=size)
+    total_time = np.bincount(segment, weights=times, minlength=size)
+
+    seen = np.flatnonzero(trips)
+    distance = index.next_distance[seen]
+
+    return {
+        "line_id": index.slot_line[seen],
+        "route_id": index.slot_route[seen],
+        "from_stop": index.slot_stop[seen],
+        "to_stop": index.slot_stop[seen + 1],
+        "trips": trips[seen],
+        "distance": distance,
+        "speed": distance * trips[seen] / total_time[seen],
+    }
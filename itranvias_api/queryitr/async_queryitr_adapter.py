@@ -0,0 +1,384 @@
+import aiohttp
+import asyncio
+import copy
+import logging
+import time
+from typing import Callable, TypeVar
+
+from .queryitr_adapter import QueryItrAdapter, QueryItrResponse, QueryItrError
+from .cache import ResponseCache, request_key
+from .concurrency import AsyncSingleFlight
+from .decoding import json_loads
+from .resilience import CircuitBreaker, RetryPolicy, is_transient
+from .metrics import MetricsHook, timed_build
+
+V = TypeVar("V")
+
+
+class AsyncQueryItrAdapter:
+    """
+    An asyncio version of `itranvias_api.queryitr.queryitr_adapter.QueryItrAdapter`, built on [aiohttp](https://docs.aiohttp.org).
+
+    It returns the same `QueryItrResponse`s and raises the same `QueryItrError`s, so the response parsing is shared with the blocking API
+    """
+
+    def __init__(
+        self,
+        url: str,
+        logger: logging.Logger = None,
+        bypass_rate_limit: bool = False,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        timeout: float = 30,
+        accept_encoding: str = "gzip, deflate",
+        cache: ResponseCache = None,
+        coalesce_requests: bool = True,
+        retry: RetryPolicy = None,
+        circuit_breaker: CircuitBreaker = None,
+        stale_on_error: bool = False,
+        metrics: MetricsHook = None,
+    ):
+        self.url: str = url
+        """
+        Url where `/queryitr_v3.php` is, e.g. `https://itranvias.com/queryitr_v3.php`. The known ones are in known_servers.py
+        """
+
+        self._logger: logging.Logger = logger or logging.getLogger(__name__)
+        """
+        If your app has a logger, pass it in here. It will try to automatically get it when possible
+        """
+
+        self.bypass_rate_limit: bool = bypass_rate_limit
+        """
+        Wether this adapter should bypass the API's rate limit or not, see `QueryItrAdapter.bypass_rate_limit`
+        """
+
+        self.limit: int = limit
+        """
+        Maximum number of simultaneous connections (`0` for no limit)
+        """
+
+        self.limit_per_host: int = limit_per_host
+        """
+        Maximum number of simultaneous connections to the same host (`0` for no limit)
+        """
+
+        self.timeout: float = timeout
+        """
+        Total timeout (in seconds) for each request
+        """
+
+        self.accept_encoding: str = accept_encoding
+        """
+        Value of the `Accept-Encoding` header sent with every request
+        """
+
+        self.cache: ResponseCache = cache
+        """
+        Optional `itranvias_api.queryitr.cache.ResponseCache` for the responses. Disabled (`None`) by default
+        """
+
+        self.coalesce_requests: bool = coalesce_requests
+        """
+        Wether concurrent calls asking for the same `(func, dato, extra_params)` should share a single request (and its response)
+        """
+
+        self._single_flight: AsyncSingleFlight = AsyncSingleFlight()
+
+        self.retry: RetryPolicy = retry
+        """
+        Optional retry policy, see `QueryItrAdapter.retry`
+        """
+
+        self.circuit_breaker: CircuitBreaker = circuit_breaker
+        """
+        Optional circuit breaker, see `QueryItrAdapter.circuit_breaker`
+        """
+
+        self.stale_on_error: bool = stale_on_error
+        """
+        Wether to return the last cached response when a request fails, see `QueryItrAdapter.stale_on_error`
+        """
+
+        self.metrics: MetricsHook = metrics
+        """
+        Optional metrics hook, see `QueryItrAdapter.metrics`
+        """
+
+        self._session: aiohttp.ClientSession = None
+        self._session_loop: asyncio.AbstractEventLoop = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the session for the running event loop, creating it if needed. aiohttp sessions are bound to the loop they were created in
+        """
+
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            self._discard_session()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit, limit_per_host=self.limit_per_host
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept-Encoding": self.accept_encoding},
+            )
+            self._session_loop = loop
+
+        return self._session
+
+    def _discard_session(self) -> None:
+        """
+        Closes the session of a previous event loop (e.g. of an earlier `asyncio.run`), which can't be awaited from the running one
+        """
+
+        session, loop = self._session, self._session_loop
+        self._session = self._session_loop = None
+        if session is None or session.closed:
+            return
+
+        if loop is not None and loop.is_running():
+            # Still running in another thread, close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+
+        # The loop is gone, nothing can be awaited in it anymore: detach the connector and close it synchronously
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            connector._close()
+
+    async def close(self) -> None:
+        """
+        Close the session (and its pooled connections) of this adapter. It can still be used afterwards, a new one will be created as needed
+        """
+
+        if self._session is None:
+            return
+
+        if self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+            self._session = self._session_loop = None
+        else:
+            self._discard_session()
+
+    async def __aenter__(self) -> "AsyncQueryItrAdapter":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def get(
+        self,
+        func: int,
+        dato=None,
+        timeout: float = None,
+        **extra_params,
+    ) -> QueryItrResponse:
+        """
+        Actually calls `/queryitr_v3.php`
+
+        :param func: The number of the function to call the endpoint with. `0` is for example the stop info
+        :param dato: The main parameter of a function, any other **extra parameters can be passed as keyword arguments**
+        :param timeout: Total timeout (in seconds) for this call instead of the adapter's `timeout`
+        """
+
+        key = request_key(func, dato, extra_params)
+        cached = self.cache is not None and bool(self.cache.ttl_for(key))
+
+        if cached:
+            response = self.cache.get(key)
+            if response is not None:
+                return response
+
+        try:
+            response = await self._fetch(key, func, dato, extra_params, timeout)
+        except BaseException as e:
+            if cached:
+                self.cache.release(key)
+            stale = self._stale_response(key, e)
+            if stale is None:
+                raise
+            return stale
+
+        if cached:
+            self.cache.put(key, response)
+        return response
+
+    def build(self, func: int, parser: Callable[..., V], *args) -> V:
+        """
+        See `QueryItrAdapter.build`
+        """
+
+        return timed_build(self.metrics, func, parser, *args)
+
+    async def _fetch(
+        self, key: tuple, func: int, dato, extra_params: dict, timeout: float = None
+    ) -> QueryItrResponse:
+        """
+        Calls `_call`, sharing the call with any concurrent one for the same `key` if `coalesce_requests` is enabled
+        """
+
+        if self.coalesce_requests:
+            return await self._single_flight.do(
+                key, self._call, func, dato, extra_params, timeout
+            )
+
+        return await self._call(func, dato, extra_params, timeout)
+
+    async def _call(
+        self, func: int, dato, extra_params: dict, timeout: float = None
+    ) -> QueryItrResponse:
+        """
+        Calls `_request` through the `circuit_breaker`, retrying according to `retry`
+        """
+
+        delays = self.retry.delays() if self.retry is not None else iter(())
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+
+            try:
+                response = await self._request(func, dato, extra_params, timeout)
+            except Exception as e:
+                transient = isinstance(e, aiohttp.ClientError) or is_transient(e)
+                if self.circuit_breaker is not None:
+                    if transient:
+                        self.circuit_breaker.record_failure()
+                    else:  # The server answered, it is healthy
+                        self.circuit_breaker.record_success()
+
+                delay = next(delays, None) if transient else None
+                if delay is None:
+                    raise
+
+                self._logger.warning(
+                    "Retrying func=%s, dato=%s in %.2fs after: %s", func, dato, delay, e
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return response
+
+    def _stale_response(
+        self, key: tuple, error: BaseException
+    ) -> QueryItrResponse | None:
+        """
+        The last cached response for `key` marked as `stale`, see `QueryItrAdapter.stale_on_error`
+        """
+
+        if (
+            not self.stale_on_error
+            or self.cache is None
+            or not isinstance(error, Exception)
+        ):
+            return None
+
+        response = self.cache.get_stale(key)
+        if response is None:
+            return None
+
+        self._logger.warning("Serving a stale response for %s after: %s", key, error)
+        if self.metrics is not None:
+            self.metrics.count(key[0], "stale")
+        response = copy.copy(response)
+        response.stale = True
+        return response
+
+    async def _request(
+        self, func: int, dato, extra_params: dict, timeout: float = None
+    ) -> QueryItrResponse:
+        """
+        Sends the request to `/queryitr_v3.php`, see `get`
+        """
+
+        if self.bypass_rate_limit:
+            # The server accepts this header from anyone, not just the proxy (found & already reported by @delthia)
+            headers = {"X-Forwarded-For": QueryItrAdapter._random_private_ip()}
+        else:
+            headers = {}
+
+        # Unlike requests, aiohttp doesn't skip `None` values
+        ep_params = {
+            key: str(value)
+            for key, value in ({"func": func, "dato": dato} | extra_params).items()
+            if value is not None
+        }
+
+        # Passing `timeout=None` to aiohttp would disable the session's timeout
+        timeout_kwargs = (
+            {"timeout": aiohttp.ClientTimeout(total=timeout)}
+            if timeout is not None
+            else {}
+        )
+
+        metrics = self.metrics
+
+        self._logger.debug("method=GET, url=%s, params=%s", self.url, ep_params)
+        start = time.perf_counter()
+        try:
+            async with self._get_session().get(
+                self.url, headers=headers, params=ep_params, **timeout_kwargs
+            ) as response:
+                headers_time = time.perf_counter()
+                body = await response.read()
+        except Exception:
+            if metrics is not None:
+                metrics.count(func, "requests")
+                metrics.count(func, "errors")
+            raise
+
+        downloaded_time = time.perf_counter()
+        try:
+            full_data = json_loads(body)
+        except ValueError:  # When we hit rate limit for example
+            full_data = {}
+        app_response = QueryItrResponse(response, full_data)
+        decoded_time = time.perf_counter()
+
+        # A rate limited request gets a 200 without JSON
+        is_success = 299 >= response.status >= 200 and bool(full_data)
+
+        if metrics is not None:
+            metrics.count(func, "requests")
+            metrics.count(
+                func,
+                "bytes",
+                app_response.size if app_response.size is not None else len(body),
+            )
+            metrics.observe(func, "request", headers_time - start)
+            metrics.observe(func, "download", downloaded_time - headers_time)
+            metrics.observe(func, "decode", decoded_time - downloaded_time)
+            if not is_success:
+                metrics.count(func, "errors")
+            if response.status == 429 or (
+                299 >= response.status >= 200 and not full_data
+            ):
+                metrics.count(func, "rate_limited")
+
+        log_args = (
+            self.url,
+            ep_params,
+            is_success,
+            response.status,
+            response.reason,
+        )
+
+        if is_success:
+            self._logger.debug(
+                "method=GET, url=%s, params=%s, success=%s, status_code=%s, message=%s",
+                *log_args,
+            )
+            return app_response
+
+        self._logger.error(
+            "method=GET, url=%s, params=%s, success=%s, status_code=%s, message=%s",
+            *log_args,
+        )
+        raise QueryItrError(response, full_data)
@@ -0,0 +1,297 @@
+"""
+Stop boards for many stops at once, planned at the line level.
+
+A stop board (`itranvias_api.queryitr.stops.get_stop_buses`, `func=0`) costs a request per stop, but a single `func=2` request
+(`itranvias_api.queryitr.lines.get_line_buses`) tells where every bus of a line is, which is enough to estimate when they will get to each stop of the line.
+Given the stops wanted, `plan_boards` picks the fewest requests: the lines whose buses go through them, and a `func=0` request only for the stops
+where that doesn't pay off, that no line goes through, or that need the exact times
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.boards import get_stop_boards
+from itranvias_api.queryitr.network import Network
+
+network = Network.from_general_info(api.info.get_general_info())
+
+corridor = [523, 524, 525, 526, 42]
+boards = get_stop_boards(corridor, network, exact=[523])
+print(f"{len(corridor)} stops in {boards.requests} requests")
+for line_id, buses in boards[42].items():
+    print(line_id, [bus.time for bus in buses], "~" if 42 in boards.approximate else "")
+```
+
+The estimates count the stops between each bus and the stop, at `seconds_per_stop` each, so they are rougher than the real ones
+(which are also missing the `distance`), and a bus only shows up in the boards of the stops it hasn't gone through yet in its current route
+"""
+
+import math
+from typing import Iterable, NamedTuple
+
+from .models import Bus, Route, Stop
+from .network import Network
+
+
+class BoardPlan(NamedTuple):
+    """
+    The requests needed for the boards of a set of stops, see `plan_boards`
+    """
+
+    lines: list[int]
+    """
+    Ids of the lines to request (`func=2`)
+    """
+
+    stops: list[int]
+    """
+    Ids of the stops to request (`func=0`), whose boards will be exact
+    """
+
+    derived: list[int]
+    """
+    Ids of the stops whose (approximate) boards are derived from the `lines`
+    """
+
+    @property
+    def requests(self) -> int:
+        """
+        Number of requests of the plan
+        """
+
+        return len(self.lines) + len(self.stops)
+
+
+class StopBoards(dict[int, dict[int, list[Bus]]]):
+    """
+    The boards of many stops, a dict with keys the stop ids, each one like the output of `itranvias_api.queryitr.stops.get_stop_buses`
+    """
+
+    __slots__ = ("approximate", "requests", "errors")
+
+    def __init__(self):
+        super().__init__()
+
+        self.approximate: set[int] = set()
+        """
+        Ids of the stops whose board was derived from their lines' buses, instead of requested
+        """
+
+        self.requests: int = 0
+        """
+        Number of requests made
+        """
+
+        self.errors: dict[int, Exception] = {}
+        """
+        Stops whose board couldn't be fetched, with the exception raised. They are missing from the boards
+        """
+
+    def __repr__(self) -> str:
+        return (
+            f"StopBoards ({len(self)} stops, {len(self.approximate)} approximate, "
+            f"{self.requests} requests, {len(self.errors)} failed stops)"
+        )
+
+
+def plan_boards(
+    stop_ids: Iterable[int], network: Network, exact: Iterable[int] = ()
+) -> BoardPlan:
+    """
+    Picks the fewest requests to get the boards of some stops.
+
+    The board of a stop can only be derived if every line going through it is requested, so the lines are chosen greedily:
+    each step adds the lines of a stop if that saves more `func=0` requests (of all the stops they complete) than the requests it adds
+
+    :param stop_ids: Ids of the stops wanted
+
+    :param network: The network, to know which lines go through each stop
+
+    :param exact: Ids of the stops that need the exact times, they are always requested
+
+    :return: The `BoardPlan`
+    """
+
+    stop_ids = list(dict.fromkeys(stop_ids))
+    exact = set(exact)
+
+    needs = {
+        stop_id: frozenset(network.stop_lines.get(stop_id, ()))
+        for stop_id in stop_ids
+        if stop_id not in exact
+    }
+    pending = {stop_id for stop_id, lines in needs.items() if lines}
+    chosen = set()
+
+    while pending:
+        best_gain, best_lines = 0, None
+        for lines in {needs[stop_id] - chosen for stop_id in pending}:
+            covered = chosen | lines
+            gain = sum(needs[stop_id] <= covered for stop_id in pending) - len(lines)
+            # On a tie the stops are requested, their boards are exact for the same price
+            if gain > best_gain:
+                best_gain, best_lines = gain, lines
+
+        if best_lines is None:
+            break
+
+        chosen |= best_lines
+        pending = {stop_id for stop_id in pending if not needs[stop_id] <= chosen}
+
+    derived = [
+        stop_id
+        for stop_id in stop_ids
+        if stop_id in needs and needs[stop_id] and needs[stop_id] <= chosen
+    ]
+    derived_set = set(derived)
+
+    return BoardPlan(
+        lines=sorted(chosen),
+        stops=[stop_id for stop_id in stop_ids if stop_id not in derived_set],
+        derived=derived,
+    )
+
+
+def get_stop_boards(
+    stop_ids: Iterable[int],
+    network: Network,
+    exact: Iterable[int] = (),
+    seconds_per_stop: float = 75,
+    max_concurrency: int = 8,
+) -> StopBoards:
+    """
+    Fetch the boards of many stops with the requests `plan_boards` picks (in parallel).
+    If a line can't be fetched the stops derived from it are requested instead
+
+    :param stop_ids: Ids of the stops to consult
+
+    :param network: The network, to know which lines go through each stop and in what order
+
+    :param exact: Ids of the stops that need the exact times (with `distance`)
+
+    :param seconds_per_stop: Average time a bus takes from a stop to the next one (dwell included), for the estimates
+
+    :param max_concurrency: Maximum number of requests running at the same time
+
+    :return: The `StopBoards`, with every stop that could be fetched
+    """
+
+    from .lines import get_many_line_buses
+    from .stops import get_many_stop_buses
+
+    plan = plan_boards(stop_ids, network, exact)
+    boards = StopBoards()
+    fallback = []
+
+    line_buses = {}
+    for line_id, routes in get_many_line_buses(plan.lines, max_concurrency):
+        boards.requests += 1
+        line_buses[line_id] = routes
+
+    for stop_id in plan.derived:
+        lines = network.stop_lines[stop_id]
+        if any(isinstance(line_buses[line_id], Exception) for line_id in lines):
+            fallback.append(stop_id)
+            continue
+
+        boards[stop_id] = derive_board(
+            stop_id,
+            {line_id: line_buses[line_id] for line_id in lines},
+            network,
+            seconds_per_stop,
+        )
+        boards.approximate.add(stop_id)
+
+    for stop_id, buses in get_many_stop_buses(plan.stops + fallback, max_concurrency):
+        boards.requests += 1
+        if isinstance(buses, Exception):
+            boards.errors[stop_id] = buses
+        else:
+            boards[stop_id] = buses
+
+    return boards
+
+
+def derive_board(
+    stop_id: int,
+    line_buses: dict[int, dict[int, Route]],
+    network: Network,
+    seconds_per_stop: float = 75,
+) -> dict[int, list[Bus]]:
+    """
+    Estimates the board of a stop from where the buses of its lines are
+
+    :param stop_id: Id of the stop
+
+    :param line_buses: Line id -> what `itranvias_api.queryitr.lines.get_line_buses` returns for it, for the lines going through the stop
+
+    :param network: The network, for the order of the stops of each route
+
+    :param seconds_per_stop: Average time a bus takes from a stop to the next one (dwell included)
+
+    :return: Like `itranvias_api.queryitr.stops.get_stop_buses`: line id -> its buses coming to the stop (soonest first), with an estimated `time`
+    and their `state`, `last_stop` and `route_progress`, but no `distance`
+    """
+
+    stop = network.stop_index[stop_id]
+    # (line id, bus id) -> (seconds, bus), a route can go through the stop more than once
+    coming = {}
+
+    for route, position in network.stop_routes[stop]:
+        line_id, route_id = network.routes[route]
+        if route_id not in line_buses.get(line_id, {}):
+            continue
+
+        stops = network.route_stops[route]
+        for last_stop_id, buses in line_buses[line_id][route_id].buses.items():
+            stops_away = _stops_behind(
+                stops, position, network.stop_index.get(last_stop_id)
+            )
+            if stops_away is None:
+                continue
+
+            for bus in buses:
+                seconds = _eta(stops_away, bus.state, seconds_per_stop)
+                if (
+                    seconds is None
+                    or coming.get((line_id, bus.id), (math.inf,))[0] <= seconds
+                ):
+                    continue
+
+                coming[line_id, bus.id] = (
+                    seconds,
+                    Bus(
+                        id=bus.id,
+                        time=_minutes(seconds),
+                        route_progress=bus.route_progress,
+                        state=bus.state,
+                        last_stop=Stop(last_stop_id),
+                    ),
+                )
+
+    board = {}
+    for (line_id, _), (_, bus) in sorted(coming.items(), key=lambda item: item[1][0]):
+        board.setdefault(line_id, []).append(bus)
+
+    return board
+
+
+def _stops_behind(stops, position: int, stop: int | None) -> int | None:
+    # How many stops before `position` the route last went through `stop`
+    for i in range(position, -1, -1):
+        if stops[i] == stop:
+            return position - i
+    return None
+
+
+def _eta(stops_away: int, state: int, seconds_per_stop: float) -> float | None:
+    if state == 0:  # At its last stop
+        return stops_away * seconds_per_stop
+    if state == 1:  # Moving, halfway to the next one on average
+        if not stops_away:  # Already left this stop
+            return None
+        return (stops_away - 0.5) * seconds_per_stop
+    # Outside its normal itinerary, no way to know
+    return None
+
+
+def _minutes(seconds: float) -> str:
+    return "<1" if seconds < 60 else str(math.floor(seconds / 60))
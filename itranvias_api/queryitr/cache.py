@@ -0,0 +1,210 @@
+"""
+In-memory response cache used by `itranvias_api.queryitr.queryitr_adapter.QueryItrAdapter`
+
+It is disabled by default, to enable it for the module-level functions (`stops.get_stop_buses`, ...):
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.cache import ResponseCache
+
+api._queryitr_adapter.cache = ResponseCache(max_size=2048, serve_stale=True)
+```
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+DEFAULT_TTLS: dict[int, float] = {
+    0: 5,  # Stop real-time info
+    1: 6 * 3600,  # All lines
+    2: 5,  # Line real-time info
+    7: 6 * 3600,  # General/"static" info
+}
+"""
+Default time to live (in seconds) of the responses for each `func`. `func=99` depends on the maps asked for, see `default_ttl`
+"""
+
+
+def request_key(func: int, dato=None, extra_params: dict = None) -> tuple:
+    """
+    Builds the key identifying a request, as a hashable `(func, dato, extra_params)` tuple
+    """
+
+    return (func, dato, tuple(sorted((extra_params or {}).items())))
+
+
+def default_ttl(func: int, dato=None, extra_params: dict = None) -> float | None:
+    """
+    Time to live (in seconds) of a response, `None` when it shouldn't be cached.
+    Maps (`func=99`) are cached for hours unless they include the buses (`B`), which are real-time
+    """
+
+    if func == 99:
+        show = (extra_params or {}).get("mostrar", "")
+        return DEFAULT_TTLS[0] if "B" in show else DEFAULT_TTLS[7]
+
+    return DEFAULT_TTLS.get(func)
+
+
+class ResponseCache:
+    """
+    A thread-safe TTL + LRU cache of responses, keyed by `request_key`
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Callable[[int, Any, dict], float | None] = default_ttl,
+        serve_stale: bool = False,
+        max_stale: float = 60,
+    ):
+        self.max_size: int = max_size
+        """
+        Maximum number of responses kept, the least recently used are evicted first
+        """
+
+        self.ttl: Callable[[int, Any, dict], float | None] = ttl
+        """
+        Function receiving `(func, dato, extra_params)` and returning the time to live (in seconds) of that response, or `None` to not cache it
+        """
+
+        self.serve_stale: bool = serve_stale
+        """
+        Wether to serve expired responses while another caller is already refreshing them, instead of waiting for the refresh
+        """
+
+        self.max_stale: float = max_stale
+        """
+        Maximum time (in seconds) past its expiry that a response can be served stale
+        """
+
+        self.hits: int = 0
+        """
+        Number of lookups served a fresh response
+        """
+
+        self.stale_hits: int = 0
+        """
+        Number of lookups served a stale response (see `serve_stale`)
+        """
+
+        self.misses: int = 0
+        """
+        Number of lookups that had to go to the server
+        """
+
+        self.evictions: int = 0
+        """
+        Number of responses evicted to keep the cache under `max_size`
+        """
+
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        """
+        `key -> (expiry, response)`, ordered from least to most recently used
+        """
+
+        self._refreshing: set[Hashable] = set()
+        """
+        Keys of stale entries which are being refreshed by some caller
+        """
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def ttl_for(self, key: tuple) -> float | None:
+        """
+        Time to live of the response for `key` (a `request_key`)
+        """
+
+        func, dato, extra_params = key
+        return self.ttl(func, dato, dict(extra_params))
+
+    def get(self, key: tuple) -> Any:
+        """
+        Looks up the response for `key`
+
+        :return: The cached response, or `None` if the caller must fetch it (and then `put` it or `release` the key).
+        With `serve_stale`, only the first caller of an expired entry gets `None`, the rest get the stale response until it is refreshed
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expiry, response = entry
+                if now < expiry:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+
+                if self.serve_stale and now < expiry + self.max_stale:
+                    if key in self._refreshing:
+                        self.stale_hits += 1
+                        return response
+                    self._refreshing.add(key)
+
+            self.misses += 1
+            return None
+
+    def get_stale(self, key: tuple) -> Any:
+        """
+        Looks up the response for `key` even if it has expired (and without counting it as a lookup), used as a fallback when a request fails
+
+        :return: The last response stored for `key`, or `None`
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else None
+
+    def put(self, key: tuple, response: Any) -> None:
+        """
+        Stores the `response` for `key` (if its ttl allows it), evicting the least recently used ones if needed
+        """
+
+        ttl = self.ttl_for(key)
+        with self._lock:
+            self._refreshing.discard(key)
+            if not ttl:
+                return
+
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def release(self, key: tuple) -> None:
+        """
+        Tells the cache that the refresh of `key` failed, so another caller can try it
+        """
+
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        """
+        Removes all the cached responses (the counters are kept)
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._refreshing.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        :return: A dict with the `size` of the cache and its `hits`, `stale_hits`, `misses` and `evictions` counters
+        """
+
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,175 @@
+"""
+Helpers to run many queries concurrently
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    # asyncio is slow to import, so it is only imported by the async helpers that need it
+    import asyncio
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def fan_out(
+    function: Callable[[K], V], items: Iterable[K], max_concurrency: int = 8
+) -> Iterator[tuple[K, V | Exception]]:
+    """
+    Calls `function` with each of the `items` in a pool of threads
+
+    :param function: The function to call, it receives a single item
+
+    :param items: The items to call `function` with
+
+    :param max_concurrency: Maximum number of calls running at the same time
+
+    :return: An iterator of `(item, result)` tuples, in completion order. If a call raised, `result` is the exception instead, so one failure doesn't abort the whole batch
+    """
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        futures = {executor.submit(function, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        # Don't wait for (or start) the remaining calls if the consumer stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_fan_out(
+    function: Callable[[K], Awaitable[V]],
+    items: Iterable[K],
+    max_concurrency: int = 8,
+) -> AsyncIterator[tuple[K, V | Exception]]:
+    """
+    Async version of `fan_out`, awaits `function` with each of the `items` on the running event loop
+
+    :param function: The coroutine function to call, it receives a single item
+
+    :param items: The items to call `function` with
+
+    :param max_concurrency: Maximum number of calls running at the same time
+
+    :return: An async iterator of `(item, result)` tuples, in completion order. If a call raised, `result` is the exception instead
+    """
+
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(item: K) -> tuple[K, V | Exception]:
+        async with semaphore:
+            try:
+                return item, await function(item)
+            except Exception as e:
+                return item, e
+
+    tasks = [asyncio.ensure_future(_run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls: while a call for a key is running, other threads asking for the same key wait for it and get its result (or exception)
+    instead of making their own
+    """
+
+    def __init__(self):
+        self.coalesced: int = 0
+        """
+        Number of calls that were served by another, already running, call
+        """
+
+        self._calls: dict[Hashable, Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[..., V], *args) -> V:
+        """
+        Calls `function(*args)`, unless a call for `key` is already running, in which case it waits for that one
+
+        :param key: The key identifying the call, calls with equal keys must be interchangeable
+
+        :param function: The function to call
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
+
+
+class AsyncSingleFlight:
+    """
+    Async version of `SingleFlight`, coalesces concurrent calls on an event loop
+    """
+
+    def __init__(self):
+        self.coalesced: int = 0
+        """
+        Number of calls that were served by another, already running, call
+        """
+
+        self._calls: dict[Hashable, "asyncio.Task"] = {}
+
+    async def do(
+        self, key: Hashable, function: Callable[..., Awaitable[V]], *args
+    ) -> V:
+        """
+        Awaits `function(*args)`, unless a call for `key` is already running, in which case it waits for that one
+
+        :param key: The key identifying the call, calls with equal keys must be interchangeable
+
+        :param function: The coroutine function to call
+        """
+
+        import asyncio
+
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # So a cancelled caller doesn't cancel the call for everybody else
+        return await asyncio.shield(task)
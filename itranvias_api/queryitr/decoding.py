@@ -0,0 +1,69 @@
+"""
+JSON decoding of the responses, straight from the raw bytes of the body.
+
+The fastest available decoder is used: [orjson](https://github.com/ijl/orjson), then [msgspec](https://jcristharif.com/msgspec/),
+then the standard library `json` module. Install one of them with `pip install itranvias_api[fast]`, or use your own with `set_json_loads`
+"""
+
+import json
+from typing import Any, Callable
+
+_json_loads: Callable[[bytes], Any] = None
+
+
+def _default_json_loads() -> Callable[[bytes], Any]:
+    """
+    Picks the fastest decoder installed. It is done on first use so the decoders are only imported when needed
+    """
+
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        return orjson.loads  # orjson.JSONDecodeError is a ValueError
+
+    try:
+        import msgspec.json
+    except ImportError:
+        pass
+    else:
+        decode = msgspec.json.Decoder().decode
+
+        def msgspec_loads(data: bytes) -> Any:
+            try:
+                return decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+
+        return msgspec_loads
+
+    return json.loads
+
+
+def json_loads(data: bytes | str) -> Any:
+    """
+    Decodes a JSON document with the decoder in use
+
+    :raises ValueError: If `data` isn't valid JSON
+    """
+
+    global _json_loads
+
+    if _json_loads is None:
+        _json_loads = _default_json_loads()
+
+    return _json_loads(data)
+
+
+def set_json_loads(function: Callable[[bytes], Any] | None) -> None:
+    """
+    Changes the decoder used for every response
+
+    :param function: Takes the body (`bytes`) and returns the decoded object, raising a `ValueError` if it isn't valid JSON.
+    `None` goes back to the default one (orjson, msgspec or json)
+    """
+
+    global _json_loads
+
+    _json_loads = function
@@ -0,0 +1,177 @@
+"""
+Snapshots of the whole fleet: every bus giving service, in a table keyed by its id
+
+``` python
+from itranvias_api.queryitr.fleet import fleet_snapshot
+
+snapshot = fleet_snapshot(positions=True)
+print(f"{len(snapshot)} buses, swept in {snapshot.sweep_time:.2f}s")
+
+vehicle = snapshot.get(1234)
+if vehicle is not None:
+    print(f"Bus 1234 is in line {vehicle.line_id}, after stop {vehicle.last_stop.id}, at {vehicle.location}")
+```
+"""
+
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple
+
+from . import _queryitr_adapter
+from .models import Location, Stop
+from .concurrency import fan_out
+from .lines import _parse_line_buses, _parse_line_maps
+
+
+class FleetVehicle(NamedTuple):
+    """
+    A bus in a `FleetSnapshot`
+    """
+
+    bus_id: int
+    """
+    Id of the bus (the number they have in real life)
+    """
+
+    line_id: int
+    """
+    Id of the line it is giving service to
+    """
+
+    route_id: int
+    """
+    Id of the route of the line it is in (usually 0 outbound/ida, 1 return/vuelta)
+    """
+
+    last_stop: Stop
+    """
+    The last stop the bus was in
+    """
+
+    state: int
+    """
+    Bus state, see `itranvias_api.queryitr.models.Bus.state`
+    """
+
+    route_progress: float
+    """
+    Fraction (0 to 1) of the route already travelled
+    """
+
+    location: Location | None
+    """
+    Real-time position of the bus, only set when the snapshot was taken with `positions`
+    """
+
+    request_date: datetime
+    """
+    The date (server-side) at which the line this bus is in was queried
+    """
+
+
+class FleetSnapshot(dict[int, FleetVehicle]):
+    """
+    Every bus giving service at (about) the same time, a dict of `FleetVehicle`s with keys the bus ids
+    """
+
+    __slots__ = ("taken_at", "sweep_time", "errors")
+
+    def __init__(self):
+        super().__init__()
+
+        self.taken_at: datetime = datetime.now()
+        """
+        The date (client-side) at which the sweep started
+        """
+
+        self.sweep_time: float = None
+        """
+        Time (in seconds) it took to query every line
+        """
+
+        self.errors: dict[int, Exception] = {}
+        """
+        Lines that couldn't be queried, with the exception raised. Their buses are missing from the snapshot
+        """
+
+    def on_line(self, line_id: int) -> list[FleetVehicle]:
+        """
+        The buses giving service to a line
+        """
+
+        return [vehicle for vehicle in self.values() if vehicle.line_id == line_id]
+
+    def __repr__(self) -> str:
+        return f"FleetSnapshot ({len(self)} buses, {len(self.errors)} failed lines)"
+
+
+def fleet_snapshot(
+    line_ids: Iterable[int] = None, positions: bool = False, max_concurrency: int = 8
+) -> FleetSnapshot:
+    """
+    Sweeps every line (in parallel) and merges their buses into a single table
+
+    :param line_ids: Ids of the lines to sweep, all of them (from `itranvias_api.queryitr.lines.get_all_lines`) by default
+
+    :param positions: Wether to also get the buses map of every line (one more request per line) to fill in the `location` of the buses
+
+    :param max_concurrency: Maximum number of requests running at the same time
+
+    :return: The `FleetSnapshot`
+    """
+
+    if line_ids is None:
+        from .lines import get_all_lines
+
+        line_ids = get_all_lines()
+
+    snapshot = FleetSnapshot()
+    start = time.perf_counter()
+
+    for line_id, vehicles in _sweep(line_ids, positions, max_concurrency):
+        if isinstance(vehicles, Exception):
+            snapshot.errors[line_id] = vehicles
+            continue
+
+        for vehicle in vehicles:
+            snapshot[vehicle.bus_id] = vehicle
+
+    snapshot.sweep_time = time.perf_counter() - start
+
+    return snapshot
+
+
+def _sweep(
+    line_ids: Iterable[int], positions: bool, max_concurrency: int
+) -> Iterator[tuple[int, list[FleetVehicle] | Exception]]:
+    def _line_vehicles(line_id: int) -> list[FleetVehicle]:
+        # The adapter is used directly (instead of `get_line_buses`) to keep the `request_date`
+        response = _queryitr_adapter.get(func=2, dato=line_id)
+        routes = _queryitr_adapter.build(2, _parse_line_buses, response.data)
+
+        locations = {}
+        if positions:
+            for route in _parse_line_maps(
+                _queryitr_adapter.get(func=99, dato=line_id, mostrar="B").data
+            ).values():
+                for buses in route.buses.values():
+                    for bus in buses:
+                        locations[bus.id] = bus.location
+
+        return [
+            FleetVehicle(
+                bus_id=bus.id,
+                line_id=line_id,
+                route_id=route_id,
+                last_stop=bus.last_stop,
+                state=bus.state,
+                route_progress=bus.route_progress,
+                location=locations.get(bus.id),
+                request_date=response.request_date,
+            )
+            for route_id, route in routes.items()
+            for buses in route.buses.values()
+            for bus in buses
+        ]
+
+    return fan_out(_line_vehicles, line_ids, max_concurrency)
@@ -0,0 +1,508 @@
+"""
+A caching HTTP gateway: stops, lines, general info and maps as local JSON endpoints, all backed by one shared adapter.
+Responses are cached (see `itranvias_api.queryitr.cache`), concurrent requests for the same data share a single upstream request and
+its encoding, and clients revalidating with `If-None-Match` get a `304`. So N frontends cost about one upstream request per ttl window
+
+``` bash
+itranvias-cli serve --port 8000
+curl localhost:8000/stops/523
+```
+
+Endpoints:
+- `GET /stops/{stop_id}`: Next buses of a stop, see `itranvias_api.queryitr.stops.get_stop_buses`
+- `GET /lines`: All the lines, see `itranvias_api.queryitr.lines.get_all_lines`
+- `GET /lines/{line_id}`: Buses of a line, see `itranvias_api.queryitr.lines.get_line_buses`
+- `GET /lines/{line_id}/maps?show=PRB`: Maps of a line, see `itranvias_api.queryitr.lines.get_line_maps`
+- `GET /info?language=en`: Lines, stops, fares and news, see `itranvias_api.queryitr.info.get_general_info`
+- `GET /events?stops=523,42&lines=1100`: Server-Sent Events stream of snapshots and deltas of stops and lines, see `itranvias_api.queryitr.push`
+- `GET /stats`: Throughput and latency of the gateway, plus cache, coalescing and upstream stats
+- `GET /metrics`: The adapter metrics in the Prometheus text format (when it has `itranvias_api.queryitr.metrics.Metrics`)
+
+The models are encoded as JSON objects with their attributes, and dicts keep their keys (as strings)
+"""
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import weakref
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qsl, urlsplit
+
+from .cache import ResponseCache, request_key
+from .concurrency import SingleFlight
+from .info import _general_info_dato, _parse_general_info
+from .lines import _parse_all_lines, _parse_line_buses, _parse_line_maps
+from .metrics import Histogram, Metrics
+from .models import _Model
+from .push import PushHub
+from .queryitr_adapter import QueryItrAdapter, QueryItrError, QueryItrResponse
+from .resilience import CircuitOpenError
+from .stops import _parse_stop_buses
+
+_logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """
+    What a gateway path maps to: an upstream request and how to build its models
+    """
+
+    __slots__ = ("name", "func", "dato", "extra_params", "parser")
+
+    def __init__(
+        self,
+        name: str,
+        func: int,
+        dato=None,
+        extra_params: dict = None,
+        parser: Callable[[dict], Any] = None,
+    ):
+        self.name: str = name
+        """
+        Name of the endpoint in the stats, e.g. `stops`
+        """
+
+        self.func: int = func
+        """
+        `func` of the upstream request
+        """
+
+        self.dato = dato
+        """
+        `dato` of the upstream request
+        """
+
+        self.extra_params: dict = extra_params or {}
+        """
+        Any other parameters of the upstream request
+        """
+
+        self.parser: Callable[[dict], Any] = parser
+        """
+        Builds the models from the data of the response
+        """
+
+    @property
+    def key(self) -> tuple:
+        return request_key(self.func, self.dato, self.extra_params)
+
+
+class NotFound(LookupError):
+    """
+    Raised by `resolve` for a path without an endpoint
+    """
+
+
+def resolve(path: str, query: dict[str, str]) -> Endpoint:
+    """
+    The `Endpoint` of a path
+
+    :raises NotFound: If there is no such endpoint
+
+    :raises ValueError: If the path or query parameters are invalid (e.g. a stop id which isn't a number)
+    """
+
+    parts = [part for part in path.split("/") if part]
+
+    match parts:
+        case ["stops", stop_id]:
+            return Endpoint("stops", 0, int(stop_id), parser=_parse_stop_buses)
+        case ["lines"]:
+            return Endpoint("lines", 1, parser=_parse_all_lines)
+        case ["lines", line_id]:
+            return Endpoint("line_buses", 2, int(line_id), parser=_parse_line_buses)
+        case ["lines", line_id, "maps"]:
+            show = query.get("show", "PRB").upper()
+            if not show or set(show) - set("PRB"):
+                raise ValueError("show must be made of the letters P, R and B")
+            return Endpoint(
+                "line_maps",
+                99,
+                int(line_id),
+                {"mostrar": show},
+                parser=_parse_line_maps,
+            )
+        case ["info"]:
+            start = datetime(2016, 1, 1)
+            language = query.get("language", "en")
+            return Endpoint(
+                "info",
+                7,
+                _general_info_dato(start, 0, start, language),
+                parser=_parse_general_info,
+            )
+
+    raise NotFound(path)
+
+
+def to_jsonable(value: Any) -> Any:
+    """
+    Converts models (and the dicts, lists and dates holding them) into JSON serializable values
+    """
+
+    if isinstance(value, _Model):
+        return {field: to_jsonable(getattr(value, field)) for field in value.__slots__}
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Lists, tuples and `itranvias_api.queryitr.geometry.CompactPath`s
+    return [to_jsonable(item) for item in value]
+
+
+class _Body:
+    __slots__ = ("content", "etag")
+
+    def __init__(self, content: bytes):
+        self.content: bytes = content
+        self.etag: str = f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+
+
+class Gateway(ThreadingHTTPServer):
+    """
+    The gateway HTTP server
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        adapter: QueryItrAdapter,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        push_interval: float = 15,
+    ):
+        """
+        :param adapter: The adapter every upstream request goes through. If it has no `cache`, a `itranvias_api.queryitr.cache.ResponseCache` is set
+        (without it each downstream request would be an upstream one)
+
+        :param host: Address to listen on
+
+        :param port: Port to listen on, `0` for a free one (see `url`)
+
+        :param push_interval: Seconds between polls of the stops and lines subscribed to through `/events`
+        """
+
+        super().__init__((host, port), _Handler)
+
+        if adapter.cache is None:
+            adapter.cache = ResponseCache()
+
+        self.adapter: QueryItrAdapter = adapter
+        """
+        The adapter every upstream request goes through
+        """
+
+        self.started_at: float = time.monotonic()
+        """
+        When (`time.monotonic`) the gateway was created, for its throughput
+        """
+
+        self.requests: dict[str, int] = {}
+        """
+        Number of requests to each endpoint
+        """
+
+        self.not_modified: int = 0
+        """
+        Number of requests answered with a `304`
+        """
+
+        self.errors: int = 0
+        """
+        Number of requests answered with an error (status 4xx or 5xx)
+        """
+
+        self.internal_errors: int = 0
+        """
+        Number of requests that failed with an unexpected exception (answered with a `502`), e.g. a parser choking on an unexpected upstream payload
+        """
+
+        self.encodings: int = 0
+        """
+        Number of upstream responses encoded, the rest of the `200`s reused an already encoded body
+        """
+
+        self.latency: Histogram = Histogram()
+        """
+        Time (in seconds) taken to answer each request
+        """
+
+        self._bodies: weakref.WeakKeyDictionary[QueryItrResponse, _Body] = (
+            weakref.WeakKeyDictionary()
+        )
+        """
+        Encoded body of each upstream response, alive while the response is (usually, while it is in the cache)
+        """
+
+        self.push: PushHub = PushHub(push_interval, adapter=adapter)
+        """
+        The hub of the `/events` subscriptions
+        """
+
+        self._single_flight: SingleFlight = SingleFlight()
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Base url of the gateway
+        """
+
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "Gateway":
+        """
+        Starts serving in a background thread
+        """
+
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops serving and closes the socket
+        """
+
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> "Gateway":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def body(self, endpoint: Endpoint) -> tuple[_Body, QueryItrResponse]:
+        """
+        The encoded body of an endpoint, from the (usually cached) upstream response
+        """
+
+        response = self.adapter.get(
+            endpoint.func, endpoint.dato, **endpoint.extra_params
+        )
+
+        with self._lock:
+            body = self._bodies.get(response)
+        if body is None:
+            # Concurrent requests that got the same response share its encoding too
+            body = self._single_flight.do(
+                (endpoint.key, id(response)), self._encode, endpoint, response
+            )
+
+        return body, response
+
+    def _encode(self, endpoint: Endpoint, response: QueryItrResponse) -> _Body:
+        with self._lock:
+            body = self._bodies.get(response)
+        if body is not None:
+            return body
+
+        models = self.adapter.build(endpoint.func, endpoint.parser, response.data)
+        body = _Body(
+            json.dumps(
+                to_jsonable(models), ensure_ascii=False, separators=(",", ":")
+            ).encode()
+        )
+
+        with self._lock:
+            self._bodies[response] = body
+            self.encodings += 1
+        return body
+
+    def record(
+        self, endpoint: str, status: int, seconds: float, internal_error: bool = False
+    ) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if status == 304:
+                self.not_modified += 1
+            elif status >= 400:
+                self.errors += 1
+            if internal_error:
+                self.internal_errors += 1
+            self.latency.observe(seconds)
+
+    def stats(self) -> dict:
+        """
+        Throughput and latency of the gateway, plus the stats of the adapter's cache, request coalescing and connection pool.
+        The latency quantiles are `None` until there is a request, and when they are above the last bucket of the histogram
+        """
+
+        with self._lock:
+            total = sum(self.requests.values())
+            uptime = time.monotonic() - self.started_at
+            stats = {
+                "uptime": uptime,
+                "requests": dict(self.requests),
+                "throughput": total / uptime if uptime else 0,
+                "not_modified": self.not_modified,
+                "errors": self.errors,
+                "internal_errors": self.internal_errors,
+                "encodings": self.encodings,
+                "latency": {
+                    "mean": self.latency.sum / total if total else 0,
+                    "p50": _quantile(self.latency, 0.5),
+                    "p90": _quantile(self.latency, 0.9),
+                    "p99": _quantile(self.latency, 0.99),
+                },
+            }
+
+        stats["cache"] = self.adapter.cache.stats()
+        stats["coalesced_requests"] = self.adapter._single_flight.coalesced
+        stats["upstream"] = self.adapter.pool_stats()
+        stats["push"] = {
+            "subscribers": self.push.subscribers(),
+            "polls": self.push.polls,
+            "messages": self.push.messages,
+            "bytes_sent": self.push.bytes_sent,
+            "resyncs": self.push.resyncs,
+        }
+        return stats
+
+
+def _quantile(histogram: Histogram, q: float) -> float | None:
+    # `Histogram.quantile` is `inf` when unknown, which isn't valid JSON
+    if not histogram.count:
+        return None
+    value = histogram.quantile(q)
+    return value if math.isfinite(value) else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: Gateway
+
+    # Keep-alive, so clients polling often don't reconnect every time
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        # Endpoint name in the stats
+        name = url.path.strip("/")
+        internal_error = False
+
+        try:
+            if name == "stats":
+                status = self._send_json(self.server.stats())
+            elif name == "metrics":
+                status = self._send_metrics()
+            elif name == "events":
+                # Recorded as soon as the stream starts, it lasts as long as the client wants
+                self._send_events(dict(parse_qsl(url.query)), start)
+                return
+            else:
+                endpoint = resolve(url.path, dict(parse_qsl(url.query)))
+                name = endpoint.name
+                status = self._send_endpoint(endpoint)
+        except NotFound:
+            name = "not_found"
+            status = self._send_error(404, "Not found")
+        except ValueError as e:
+            name = "bad_request"
+            status = self._send_error(400, str(e))
+        except CircuitOpenError as e:
+            status = self._send_error(
+                503, str(e), {"Retry-After": str(max(1, round(e.retry_after)))}
+            )
+        except QueryItrError as e:
+            status = self._send_error(502, str(e))
+        except OSError as e:  # Connection errors and timeouts
+            status = self._send_error(504, str(e))
+        except Exception:
+            # Most likely an upstream payload the parsers didn't expect, the client still gets an answer
+            _logger.exception("Error answering %s", self.path)
+            internal_error = True
+            status = self._send_error(502, "Unexpected upstream response")
+
+        self.server.record(
+            name, status, time.perf_counter() - start, internal_error=internal_error
+        )
+
+    def _send_events(self, query: dict[str, str], start: float) -> None:
+        def _ids(name: str) -> list[int]:
+            return [int(id) for id in query.get(name, "").split(",") if id]
+
+        stops, lines = _ids("stops"), _ids("lines")
+        if not stops and not lines:
+            raise ValueError("Subscribe to at least one stop or line")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # The stream has no length, it ends when the connection is closed
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self.server.record("events", 200, time.perf_counter() - start)
+
+        messages = self.server.push.subscribe(stops, lines)
+        try:
+            # Reconnect after 5 seconds if the connection drops
+            self.wfile.write(b"retry: 5000\n\n")
+            for message in messages:
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            messages.close()
+
+    def _send_endpoint(self, endpoint: Endpoint) -> int:
+        body, response = self.server.body(endpoint)
+
+        headers = {"ETag": body.etag, "Cache-Control": "no-cache"}
+        if response.stale:
+            headers["X-Stale"] = "1"
+
+        if body.etag in self.headers.get("If-None-Match", ""):
+            self._send(304, b"", headers)
+            return 304
+
+        self._send(200, body.content, headers | {"Content-Type": "application/json"})
+        return 200
+
+    def _send_metrics(self) -> int:
+        metrics = self.server.adapter.metrics
+        if not isinstance(metrics, Metrics):
+            return self._send_error(404, "The adapter has no metrics")
+
+        content = metrics.to_prometheus(self.server.adapter).encode()
+        self._send(200, content, {"Content-Type": "text/plain; version=0.0.4"})
+        return 200
+
+    def _send_json(self, value: Any, status: int = 200, headers: dict = None) -> int:
+        content = json.dumps(value).encode()
+        self._send(
+            status, content, (headers or {}) | {"Content-Type": "application/json"}
+        )
+        return status
+
+    def _send_error(self, status: int, message: str, headers: dict = None) -> int:
+        return self._send_json({"error": message}, status, headers)
+
+    def _send(self, status: int, content: bytes, headers: dict) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        # Quiet by default, see `Gateway.stats` instead
+        pass
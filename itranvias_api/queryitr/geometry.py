@@ -0,0 +1,150 @@
+"""
+Geometry helpers: distances and a compact, array backed, representation of route paths
+
+[NumPy](https://numpy.org) is used when it is installed (`pip install itranvias_api[fast]`), otherwise the standard library `array` module is
+"""
+
+import math
+from array import array
+from typing import Iterator
+
+from .models import Location
+
+EARTH_RADIUS: float = 6371008.8
+"""
+Mean radius of the Earth (in meters)
+"""
+
+_np = None
+
+
+def _numpy():
+    """
+    Returns the numpy module, or `None` if it isn't installed. It is imported on first use because it is slow to import
+    """
+
+    global _np
+
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _np = numpy
+
+    return _np or None
+
+
+def haversine(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """
+    Great-circle distance (in meters) between two points given in degrees
+    """
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1)
+        * math.cos(phi2)
+        * math.sin(math.radians(long2 - long1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class CompactPath:
+    """
+    A route path stored as two contiguous float64 arrays (latitudes and longitudes) instead of one `Location` per point.
+    It can still be iterated and indexed as `Location`s, which are created on the fly
+    """
+
+    __slots__ = ("lats", "longs", "_cumulative_lengths")
+
+    def __init__(self, lats, longs):
+        self.lats = lats
+        """
+        Latitudes of the points, a numpy `ndarray` or an `array('d')`
+        """
+
+        self.longs = longs
+        """
+        Longitudes of the points, a numpy `ndarray` or an `array('d')`
+        """
+
+        self._cumulative_lengths = None
+
+    @classmethod
+    def from_recorrido(cls, recorrido: str) -> "CompactPath":
+        """
+        Parses the `recorrido` string of a `func=99` response in a single pass
+
+        :param recorrido: String in the format `"{lat},{long},0 {lat},{long},0 ..."`
+        """
+
+        # Every point has 3 numbers (the third one is always 0)
+        numbers = ",".join(recorrido.split())
+
+        np = _numpy()
+        if np is not None:
+            values = np.array(numbers.split(",") if numbers else [], dtype=np.float64)
+            values = values.reshape(-1, 3)
+            return cls(
+                np.ascontiguousarray(values[:, 0]), np.ascontiguousarray(values[:, 1])
+            )
+
+        values = array("d", map(float, numbers.split(",")) if numbers else ())
+        return cls(values[0::3], values[1::3])
+
+    @property
+    def cumulative_lengths(self):
+        """
+        Distance (in meters) along the path from its first point to each of the points, so the first one is `0` and the last one the `length` of the path.
+        It is computed once, the first time it is used
+        """
+
+        if self._cumulative_lengths is None:
+            np = _numpy()
+            if np is not None:
+                phi = np.radians(self.lats)
+                lam = np.radians(self.longs)
+                a = (
+                    np.sin(np.diff(phi) / 2) ** 2
+                    + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.diff(lam) / 2) ** 2
+                )
+                segments = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+                self._cumulative_lengths = np.concatenate(([0.0], np.cumsum(segments)))
+            else:
+                lengths = array("d", [0.0] * min(len(self), 1))
+                for i in range(1, len(self)):
+                    lengths.append(
+                        lengths[-1]
+                        + haversine(
+                            self.lats[i - 1],
+                            self.longs[i - 1],
+                            self.lats[i],
+                            self.longs[i],
+                        )
+                    )
+                self._cumulative_lengths = lengths
+
+        return self._cumulative_lengths
+
+    @property
+    def length(self) -> float:
+        """
+        Total length of the path (in meters)
+        """
+
+        return float(self.cumulative_lengths[-1]) if len(self) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def __getitem__(self, index: int) -> Location:
+        return Location(self.lats[index], self.longs[index])
+
+    def __iter__(self) -> Iterator[Location]:
+        for lat, long in zip(self.lats, self.longs):
+            yield Location(lat, long)
+
+    def __repr__(self) -> str:
+        return f"CompactPath ({len(self)} points)"
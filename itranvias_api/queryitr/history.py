@@ -0,0 +1,459 @@
+"""
+Fleet history: a compact, append-only, columnar on-disk format for `itranvias_api.queryitr.fleet` snapshots, and a recorder sampling them at a fixed interval
+
+A history is a directory with a file per column, each one a flat array of fixed-width native values (see `COLUMNS`) and a row per bus per sample.
+Rows are only ever appended, sorted by `timestamp`. Reading maps the files into memory: nothing is parsed or copied until the data is used,
+so opening a whole day is instant, and time ranges are found with a binary search
+
+``` python
+from itranvias_api.queryitr.history import FleetHistory, record_fleet
+
+record_fleet("history/", interval=30, duration=3600)  # an hour, a sample every 30s
+
+with FleetHistory("history/") as history:
+    samples = history.query(start=datetime(2024, 5, 21, 8), end=datetime(2024, 5, 21, 9), line_id=1100)
+    print(samples["bus_id"], samples["route_progress"])
+```
+
+With [NumPy](https://numpy.org) installed (`pip install itranvias_api[fast]`) the columns are `ndarray`s and the filters are vectorized,
+otherwise they are `memoryview`s / `array`s and the filters are plain Python loops
+"""
+
+import bisect
+import json
+import logging
+import math
+import mmap
+import os
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from .fleet import FleetSnapshot, fleet_snapshot
+from .geometry import _numpy
+
+FORMAT_VERSION: int = 1
+
+COLUMNS: dict[str, str] = {
+    "timestamp": "d",  # float64, seconds since the epoch (server-side request date)
+    "bus_id": "i",  # int32
+    "line_id": "i",  # int32
+    "route_id": "h",  # int16
+    "last_stop": "i",  # int32, -1 if unknown
+    "state": "b",  # int8, -1 if unknown (0 means at a stop)
+    "route_progress": "f",  # float32
+    "lat": "f",  # float32 (~0.5 m of precision), NaN if unknown
+    "long": "f",  # float32, NaN if unknown
+}
+"""
+Name of each column -> its `array` / `struct` typecode. A row takes 35 bytes
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+class Sample(NamedTuple):
+    """
+    A row of a `FleetHistory`
+    """
+
+    timestamp: float
+    bus_id: int
+    line_id: int
+    route_id: int
+    last_stop: int
+    state: int
+    route_progress: float
+    lat: float
+    long: float
+
+
+def _row_counts(path: Path) -> dict[str, int]:
+    return {
+        name: (path / f"{name}.col").stat().st_size // array(code).itemsize
+        for name, code in COLUMNS.items()
+    }
+
+
+class FleetHistoryWriter:
+    """
+    Appends rows to a history, creating it if needed
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        :param path: Directory of the history
+        """
+
+        self.path: Path = Path(path)
+        """
+        Directory of the history
+        """
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta["version"] != FORMAT_VERSION or meta["columns"] != COLUMNS:
+                raise ValueError(f"Unsupported history format in {self.path}: {meta}")
+        else:
+            meta_path.write_text(
+                json.dumps({"version": FORMAT_VERSION, "columns": COLUMNS})
+            )
+
+        for name in COLUMNS:
+            (self.path / f"{name}.col").touch()
+
+        # An interrupted append can leave some columns longer than others, cut them to the complete rows
+        counts = _row_counts(self.path)
+        self.rows: int = min(counts.values())
+        """
+        Number of rows in the history
+        """
+
+        for name, code in COLUMNS.items():
+            if counts[name] != self.rows:
+                _logger.warning("Truncating %s to %s rows", name, self.rows)
+                os.truncate(self.path / f"{name}.col", self.rows * array(code).itemsize)
+
+        self.last_timestamp: float = self._last_timestamp()
+        """
+        Timestamp of the last row, `-inf` if there are none
+        """
+
+    def append(self, columns: dict[str, Iterable]) -> int:
+        """
+        Appends rows, given as a sequence of values per column (all of them the same length), sorted by `timestamp`
+
+        :return: The number of rows appended
+        """
+
+        arrays = {name: array(code, columns[name]) for name, code in COLUMNS.items()}
+        count = len(arrays["timestamp"])
+        if any(len(values) != count for values in arrays.values()):
+            raise ValueError("All the columns must have the same length")
+        if not count:
+            return 0
+
+        if arrays["timestamp"][0] < self.last_timestamp:
+            raise ValueError("Rows must be appended in timestamp order")
+
+        for name, values in arrays.items():
+            with open(self.path / f"{name}.col", "ab") as f:
+                values.tofile(f)
+
+        self.rows += count
+        self.last_timestamp = arrays["timestamp"][-1]
+        return count
+
+    def append_snapshot(self, snapshot: FleetSnapshot) -> int:
+        """
+        Appends a row per bus of a snapshot, each one with the date its line was queried.
+        They are sorted by it, and a date before the last row's (the server clock going back) is clamped to it
+
+        :return: The number of rows appended
+        """
+
+        vehicles = sorted(snapshot.values(), key=lambda vehicle: vehicle.request_date)
+        nan = math.nan
+        return self.append(
+            {
+                "timestamp": [
+                    max(vehicle.request_date.timestamp(), self.last_timestamp)
+                    for vehicle in vehicles
+                ],
+                "bus_id": [vehicle.bus_id for vehicle in vehicles],
+                "line_id": [vehicle.line_id for vehicle in vehicles],
+                "route_id": [vehicle.route_id for vehicle in vehicles],
+                "last_stop": [
+                    (
+                        vehicle.last_stop.id
+                        if vehicle.last_stop is not None
+                        and vehicle.last_stop.id is not None
+                        else -1
+                    )
+                    for vehicle in vehicles
+                ],
+                "state": [
+                    vehicle.state if vehicle.state is not None else -1
+                    for vehicle in vehicles
+                ],
+                "route_progress": [
+                    (
+                        vehicle.route_progress
+                        if vehicle.route_progress is not None
+                        else nan
+                    )
+                    for vehicle in vehicles
+                ],
+                "lat": [
+                    vehicle.location.lat if vehicle.location is not None else nan
+                    for vehicle in vehicles
+                ],
+                "long": [
+                    vehicle.location.long if vehicle.location is not None else nan
+                    for vehicle in vehicles
+                ],
+            }
+        )
+
+    def _last_timestamp(self) -> float:
+        if not self.rows:
+            return -math.inf
+
+        with open(self.path / "timestamp.col", "rb") as f:
+            f.seek((self.rows - 1) * 8)
+            return array("d", f.read(8))[0]
+
+
+def record_fleet(
+    path: str | Path,
+    interval: float = 30,
+    duration: float = None,
+    line_ids: Iterable[int] = None,
+    positions: bool = True,
+    max_concurrency: int = 8,
+) -> int:
+    """
+    Takes a `itranvias_api.queryitr.fleet.fleet_snapshot` every `interval` seconds and appends it to a history
+
+    :param path: Directory of the history, it is appended to if it already exists
+
+    :param interval: Seconds between the starts of two samples
+
+    :param duration: Seconds to record for, forever by default
+
+    :param line_ids: Ids of the lines to sample, all of them by default (looked up once)
+
+    :param positions: Wether to also sample the buses maps (one more request per line), for `lat` and `long`
+
+    :param max_concurrency: Maximum number of requests running at the same time
+
+    :return: The number of rows appended
+    """
+
+    writer = FleetHistoryWriter(path)
+
+    if line_ids is None:
+        from .lines import get_all_lines
+
+        line_ids = get_all_lines()
+    line_ids = list(line_ids)
+
+    rows = 0
+    start = time.monotonic()
+    next_sample = start
+    while duration is None or next_sample - start < duration:
+        snapshot = fleet_snapshot(line_ids, positions, max_concurrency)
+        rows += writer.append_snapshot(snapshot)
+        _logger.info(
+            "Recorded %s buses in %.2fs (%s failed lines)",
+            len(snapshot),
+            snapshot.sweep_time,
+            len(snapshot.errors),
+        )
+
+        next_sample += interval
+        time.sleep(max(0, next_sample - time.monotonic()))
+
+    return rows
+
+
+class FleetHistory:
+    """
+    Read-only, memory-mapped, view of a history. It sees the rows there were when it was opened (or last `reload`ed)
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        :param path: Directory of the history
+        """
+
+        self.path: Path = Path(path)
+        """
+        Directory of the history
+        """
+
+        self.columns: dict[str, memoryview] = {}
+        """
+        Name of each column (see `COLUMNS`) -> its values, a numpy `ndarray` or a `memoryview`, both backed by the mapped file (zero-copy)
+        """
+
+        self._maps: list[mmap.mmap] = []
+
+        self.reload()
+
+    def reload(self) -> None:
+        """
+        Maps the files again, to see the rows appended since it was opened
+        """
+
+        self.close()
+
+        meta = json.loads((self.path / "meta.json").read_text())
+        if meta["version"] != FORMAT_VERSION or meta["columns"] != COLUMNS:
+            raise ValueError(f"Unsupported history format in {self.path}: {meta}")
+
+        rows = min(_row_counts(self.path).values())
+        np = _numpy()
+
+        for name, code in COLUMNS.items():
+            size = rows * array(code).itemsize
+            if not size:
+                self.columns[name] = (
+                    np.empty(0, dtype=code) if np is not None else array(code)
+                )
+                continue
+
+            with open(self.path / f"{name}.col", "rb") as f:
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+
+            if np is not None:
+                self.columns[name] = np.frombuffer(mapped, dtype=code, count=rows)
+            else:
+                self.columns[name] = memoryview(mapped).cast(code)
+
+    def close(self) -> None:
+        """
+        Unmaps the files. Columns (or slices of them) still referenced elsewhere keep their file mapped until they are garbage collected
+        """
+
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = {}
+
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._maps = []
+
+    def __enter__(self) -> "FleetHistory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def time_range(
+        self, start: datetime | float = None, end: datetime | float = None
+    ) -> tuple[int, int]:
+        """
+        Indexes of the rows between two dates, found with a binary search
+
+        :param start: Date (or timestamp) of the first row, inclusive. From the start of the history by default
+
+        :param end: Date (or timestamp) of the last row, exclusive. Until the end of the history by default
+
+        :return: `(first, last)`, the rows are `first <= i < last`
+        """
+
+        timestamps = self.columns["timestamp"]
+        np = _numpy()
+        if np is not None and isinstance(timestamps, np.ndarray):
+            first = (
+                np.searchsorted(timestamps, _timestamp(start))
+                if start is not None
+                else 0
+            )
+            last = (
+                np.searchsorted(timestamps, _timestamp(end))
+                if end is not None
+                else len(timestamps)
+            )
+            return int(first), int(max(first, last))
+
+        first = (
+            bisect.bisect_left(timestamps, _timestamp(start))
+            if start is not None
+            else 0
+        )
+        last = (
+            bisect.bisect_left(timestamps, _timestamp(end), first)
+            if end is not None
+            else len(timestamps)
+        )
+        return first, last
+
+    def query(
+        self,
+        start: datetime | float = None,
+        end: datetime | float = None,
+        bus_id: int = None,
+        line_id: int = None,
+    ) -> dict[str, memoryview]:
+        """
+        The rows matching all the given filters
+
+        :param start: Date (or timestamp) of the first row, inclusive
+
+        :param end: Date (or timestamp) of the last row, exclusive
+
+        :param bus_id: Only the rows of this bus
+
+        :param line_id: Only the rows of this line
+
+        :return: Name of each column -> its values in the matching rows. Without `bus_id` nor `line_id` they are zero-copy slices of the mapped columns,
+        otherwise copies (numpy `ndarray`s, or `array`s without numpy)
+        """
+
+        first, last = self.time_range(start, end)
+        columns = {name: column[first:last] for name, column in self.columns.items()}
+
+        filters = [
+            (name, value)
+            for name, value in (("bus_id", bus_id), ("line_id", line_id))
+            if value is not None
+        ]
+        if not filters:
+            return columns
+
+        np = _numpy()
+        if np is not None:
+            mask = np.ones(last - first, dtype=bool)
+            for name, value in filters:
+                mask &= columns[name] == value
+            return {name: column[mask] for name, column in columns.items()}
+
+        indexes = [
+            i
+            for i in range(last - first)
+            if all(columns[name][i] == value for name, value in filters)
+        ]
+        return {
+            name: array(COLUMNS[name], (column[i] for i in indexes))
+            for name, column in columns.items()
+        }
+
+    def samples(
+        self,
+        start: datetime | float = None,
+        end: datetime | float = None,
+        bus_id: int = None,
+        line_id: int = None,
+    ) -> list[Sample]:
+        """
+        `query`, as a list of `Sample`s (which is much slower and bigger, better for small results)
+        """
+
+        columns = self.query(start, end, bus_id, line_id)
+        return [
+            Sample(*map(_item, row))
+            for row in zip(*(columns[name] for name in COLUMNS))
+        ]
+
+
+def _timestamp(date: datetime | float) -> float:
+    return date.timestamp() if isinstance(date, datetime) else float(date)
+
+
+def _item(value) -> int | float:
+    # numpy scalars -> Python numbers
+    return value.item() if hasattr(value, "item") else value
@@ -38,9 +38,33 @@ def get_general_info(
         - `observations`: A list of strings with some observations about the pricing, like transfers and special price for children
     """
 
-    dato = f"{last_request_date.strftime('%Y%m%dT%H%M%S')}_{language}_{last_message_id}_{last_message_date.strftime('%Y%m%dT%H%M%S')}"
+    dato = _general_info_dato(
+        last_request_date, last_message_id, last_message_date, language
+    )
     response = _queryitr_adapter.get(func=7, dato=dato)
-    data = response.data["iTranvias"]
+
+    return _queryitr_adapter.build(7, _parse_general_info, response.data, fix_route_id)
+
+
+def _general_info_dato(
+    last_request_date: datetime,
+    last_message_id: int,
+    last_message_date: datetime,
+    language: str,
+) -> str:
+    """
+    Builds the `dato` parameter of a `func=7` request, see `get_general_info`
+    """
+
+    return f"{last_request_date.strftime('%Y%m%dT%H%M%S')}_{language}_{last_message_id}_{last_message_date.strftime('%Y%m%dT%H%M%S')}"
+
+
+def _parse_general_info(data: dict, fix_route_id: bool = True) -> dict:
+    """
+    Parses the data of a `func=7` response, see `get_general_info`
+    """
+
+    data = data["iTranvias"]
 
     output = {
         "news": [],
@@ -1,5 +1,9 @@
 from . import _queryitr_adapter
 from .models import Stop, Line, Route, Bus, Location
+from .concurrency import fan_out
+from .geometry import CompactPath
+
+from typing import Iterable, Iterator
 
 
 def get_all_lines() -> dict[int, Line]:
@@ -10,7 +14,14 @@ def get_all_lines() -> dict[int, Line]:
     """
 
     response = _queryitr_adapter.get(func=1)
-    data = response.data
+
+    return _queryitr_adapter.build(1, _parse_all_lines, response.data)
+
+
+def _parse_all_lines(data: dict) -> dict[int, Line]:
+    """
+    Parses the data of a `func=1` response, see `get_all_lines`
+    """
 
     lines = {}
     for line in data["lineas"]:
@@ -36,7 +47,31 @@ def get_line_buses(line_id: int) -> dict[int, Route]:
     """
 
     response = _queryitr_adapter.get(func=2, dato=line_id)
-    data = response.data
+
+    return _queryitr_adapter.build(2, _parse_line_buses, response.data)
+
+
+def get_many_line_buses(
+    line_ids: Iterable[int], max_concurrency: int = 8
+) -> Iterator[tuple[int, dict[int, Route] | Exception]]:
+    """
+    Calls `get_line_buses` for many lines in parallel
+
+    :param line_ids: The ids of the lines to consult
+
+    :param max_concurrency: Maximum number of requests running at the same time
+
+    :return: An iterator of `(line_id, routes)` tuples, in completion order, where `routes` is what `get_line_buses` returns for that line,
+    or the exception it raised (so one failure doesn't abort the whole batch)
+    """
+
+    return fan_out(get_line_buses, line_ids, max_concurrency)
+
+
+def _parse_line_buses(data: dict) -> dict[int, Route]:
+    """
+    Parses the data of a `func=2` response, see `get_line_buses`
+    """
 
     routes = {}
     for route in data["paradas"]:
@@ -60,7 +95,9 @@ def get_line_buses(line_id: int) -> dict[int, Route]:
     return routes
 
 
-def get_line_maps(line_id: int, show: str = "PRB") -> dict[int, Route]:
+def get_line_maps(
+    line_id: int, show: str = "PRB", compact_paths: bool = False
+) -> dict[int, Route]:
     """
     Get "maps" for a line. Can show different map types, depending on the letters included in `show`.
 
@@ -71,11 +108,20 @@ def get_line_maps(line_id: int, show: str = "PRB") -> dict[int, Route]:
         - **P**: Stops (Paradas)
         - **R**: Path (Recorrido)
 
+    :param compact_paths: Wether to store each route's `path` as an `itranvias_api.queryitr.geometry.CompactPath` (two float arrays) instead of a list of `Location`s
+
     :return: A dict with keys the route ids (usually 0 outbound/ida, 1 return/vuelta), each containig a route with `buses`, `stops` and `path` set as appropiate
     """
 
     response = _queryitr_adapter.get(func=99, dato=line_id, mostrar=show)
-    data = response.data["mapas"]
+
+    return _queryitr_adapter.build(99, _parse_line_maps, response.data, compact_paths)
+
+
+def _parse_line_maps(data: dict, compact_paths: bool = False) -> dict[int, Route]:
+    """
+    Parses the data of a `func=99` response, see `get_line_maps`
+    """
 
     routes = {}
 
@@ -103,6 +149,10 @@ def get_line_maps(line_id: int, show: str = "PRB") -> dict[int, Route]:
             route_id = int(route["sentido"])
 
             _create_route_if_missing(route_id)
+            if compact_paths:
+                routes[route_id].path = CompactPath.from_recorrido(route["recorrido"])
+                continue
+
             # String is "{lat},{long},0 {lat},{long},0 ..."
             for point in route["recorrido"].split():
                 lat, long, idk = point.split(",")  # Idk what the 0 is for
@@ -114,17 +164,17 @@ def get_line_maps(line_id: int, show: str = "PRB") -> dict[int, Route]:
                 )
 
     def _parse_buses(routes_data: list[dict]) -> None:
-        print(routes_data)
         for route in routes_data:
             route_id = int(route["sentido"])
 
             _create_route_if_missing(route_id)
             for bus in route["buses"]:
-                routes[route_id].buses.append(
+                # The map doesn't say which stop the bus was last in
+                routes[route_id].buses.setdefault(None, []).append(
                     Bus(id=bus["bus"], lat=bus["posx"], long=bus["posy"])
                 )
 
-    for map_dict in data:
+    for map_dict in data["mapas"]:
         for key, function in {
             "paradas": _parse_stops,
             "recorridos": _parse_paths,
@@ -146,12 +196,12 @@ def get_line_stop_map(line_id: int) -> dict[int, Route]:
     return get_line_maps(line_id=line_id, show="P")
 
 
-def get_line_paths(line_id: int) -> dict[int, Route]:
+def get_line_paths(line_id: int, compact_paths: bool = False) -> dict[int, Route]:
     """
     Calls `get_line_maps` but only gets the paths map
     """
 
-    return get_line_maps(line_id=line_id, show="R")
+    return get_line_maps(line_id=line_id, show="R", compact_paths=compact_paths)
 
 
 def get_line_bus_map(line_id: int) -> dict[int, Route]:
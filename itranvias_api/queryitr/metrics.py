@@ -0,0 +1,241 @@
+"""
+Metrics of the adapters: per `func` counters and latency histograms of each phase of a call, with a [Prometheus](https://prometheus.io) text exporter
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.metrics import Metrics
+
+api._queryitr_adapter.metrics = metrics = Metrics()
+
+api.stops.get_stop_buses(523)
+print(metrics.to_prometheus(api._queryitr_adapter))
+```
+
+The phases timed are:
+- `request`: From sending the request to getting the response headers, this includes DNS and connecting when no pooled connection could be reused
+  (see `itranvias_api.queryitr.queryitr_adapter.QueryItrAdapter.pool_stats`)
+- `download`: Reading the body
+- `decode`: Decoding the JSON and parsing the header fields
+- `build`: Building the models from the data
+
+Any object with the same `observe` and `count` methods can be used instead of `Metrics`, e.g. to forward them to another metrics library
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Protocol, TypeVar
+
+V = TypeVar("V")
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+"""
+Upper bounds (in seconds) of the histogram buckets
+"""
+
+
+class MetricsHook(Protocol):
+    """
+    What the adapters call to report metrics
+    """
+
+    def observe(self, func: int, phase: str, seconds: float) -> None:
+        """
+        Reports how long a phase (`request`, `download`, `decode` or `build`) of a call to `func` took
+        """
+
+    def count(self, func: int, name: str, value: int = 1) -> None:
+        """
+        Adds `value` to a counter (`requests`, `errors`, `rate_limited`, `stale` or `bytes`) of `func`
+        """
+
+
+class Histogram:
+    """
+    A cumulative histogram, like Prometheus'
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets: tuple[float, ...] = buckets
+        """
+        Upper bounds of the buckets
+        """
+
+        self.counts: list[int] = [0] * len(buckets)
+        """
+        Number of observations in each bucket (not cumulative), the ones above the last bound are only in `count`
+        """
+
+        self.sum: float = 0
+        """
+        Sum of all the observations
+        """
+
+        self.count: int = 0
+        """
+        Number of observations
+        """
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile (between 0 and 1) as the upper bound of the bucket it falls in, `inf` if it is above the last one
+        """
+
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target and seen:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Thread-safe in-memory `MetricsHook`
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds (in seconds) of the histogram buckets
+        """
+
+        self.buckets: tuple[float, ...] = buckets
+        """
+        Upper bounds (in seconds) of the histogram buckets
+        """
+
+        self.counters: dict[tuple[int, str], int] = {}
+        """
+        `(func, name) -> value`
+        """
+
+        self.histograms: dict[tuple[int, str], Histogram] = {}
+        """
+        `(func, phase) -> Histogram`
+        """
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def observe(self, func: int, phase: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get((func, phase))
+            if histogram is None:
+                histogram = self.histograms[(func, phase)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, func: int, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[(func, name)] = self.counters.get((func, name), 0) + value
+
+    def to_prometheus(self, adapter: Any = None) -> str:
+        """
+        Exports the metrics in the Prometheus text format
+
+        :param adapter: Optional adapter whose cache, pool, coalescing, scheduler and circuit breaker stats are exported too
+        """
+
+        lines = []
+
+        with self._lock:
+            names = sorted({name for _, name in self.counters})
+            for name in names:
+                metric = f"itranvias_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (func, counter), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f'{metric}{{func="{func}"}} {value}')
+
+            if self.histograms:
+                metric = "itranvias_phase_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for (func, phase), histogram in sorted(self.histograms.items()):
+                    labels = f'func="{func}",phase="{phase}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                        )
+                    lines.append(
+                        f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+                    )
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        if adapter is not None:
+            for name, value in _adapter_stats(adapter).items():
+                lines.append(f"# TYPE itranvias_{name} gauge")
+                lines.append(f"itranvias_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _adapter_stats(adapter: Any) -> dict[str, float]:
+    """
+    The stats of the parts of an adapter, flattened into `{name: value}`
+    """
+
+    stats = {}
+
+    if hasattr(adapter, "pool_stats"):
+        for name, value in adapter.pool_stats().items():
+            stats[f"pool_{name}"] = value
+
+    if getattr(adapter, "cache", None) is not None:
+        for name, value in adapter.cache.stats().items():
+            stats[f"cache_{name}"] = value
+
+    stats["coalesced_requests"] = adapter._single_flight.coalesced
+
+    if getattr(adapter, "scheduler", None) is not None:
+        for name, value in adapter.scheduler.stats().items():
+            stats[f"scheduler_{name}"] = value
+
+    if getattr(adapter, "circuit_breaker", None) is not None:
+        stats["circuit_open"] = int(adapter.circuit_breaker.state != "closed")
+        stats["circuit_rejected"] = adapter.circuit_breaker.rejected
+
+    if getattr(adapter, "retry", None) is not None:
+        stats["retries"] = adapter.retry.retries
+
+    return stats
+
+
+def timed_build(
+    metrics: MetricsHook | None, func: int, parser: Callable[..., V], *args
+) -> V:
+    """
+    Calls `parser(*args)`, reporting how long it took as the `build` phase of `func` if there are `metrics`
+    """
+
+    if metrics is None:
+        return parser(*args)
+
+    start = time.perf_counter()
+    result = parser(*args)
+    metrics.observe(func, "build", time.perf_counter() - start)
+    return result
@@ -5,11 +5,37 @@ Here are all the models (classes) used
 from datetime import datetime
 
 
-class Location:
+class _Model:
+    """
+    Base of all the models. They use `__slots__` (no per-instance `__dict__`), compare equal when all their attributes are equal
+    and hash by their `_hash_fields` (usually the id), which equal instances always share
+    """
+
+    __slots__ = ()
+
+    _hash_fields: tuple[str, ...] = ("id",)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        return all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, field) for field in self._hash_fields))
+
+
+class Location(_Model):
     """
     A location (latitude and longitude)
     """
 
+    __slots__ = ("lat", "long")
+
+    _hash_fields = ("lat", "long")
+
     def __init__(self, lat: float, long: float) -> None:
         self.lat: float = float(lat)
         """
@@ -25,16 +51,18 @@ class Location:
         return f"Lat: {self.lat}, Long: {self.long}"
 
 
-class Stop:
+class Stop(_Model):
     """
     A bus stop
     """
 
+    __slots__ = ("id", "name", "location", "connections")
+
     def __init__(
         self,
         id: int = None,
         name: str = None,
-        connections: list["Line"] = [],
+        connections: list["Line"] = None,
         location: Location = None,
         lat: float = None,
         long: float = None,
@@ -56,7 +84,7 @@ class Stop:
         Location of the stop
         """
 
-        self.connections: list["Line"] = connections
+        self.connections: list["Line"] = connections if connections is not None else []
         """
         List of lines which can be taken on the stop
         """
@@ -65,11 +93,21 @@ class Stop:
         return f"ID: {self.id} - Name: {self.name or "?"}"
 
 
-class Bus:
+class Bus(_Model):
     """
     A bus which is giving service to a certain line
     """
 
+    __slots__ = (
+        "id",
+        "time",
+        "distance",
+        "route_progress",
+        "state",
+        "last_stop",
+        "location",
+    )
+
     def __init__(
         self,
         id: int,
@@ -138,11 +176,13 @@ class Bus:
         return f"Bus {self.id}"
 
 
-class Route:
+class Route(_Model):
     """
     A route for a bus line
     """
 
+    __slots__ = ("id", "origin", "destination", "stops", "buses", "path")
+
     def __init__(
         self,
         id: int,
@@ -180,23 +220,26 @@ class Route:
 
         self.buses: dict[int, list[Bus]] = buses if buses is not None else {}
         """
-        Dictionary of buses giving service to this route, with keys their last stop
+        Dictionary of buses giving service to this route, with keys their last stop (`None` when it is unknown, like in the buses map of `get_line_maps`)
         """
 
         self.path: list[Location] = path if path is not None else []
         """
-        List of points in the map forming this route's path
+        List of points in the map forming this route's path.
+        It can also be an `itranvias_api.queryitr.geometry.CompactPath`, which is iterated the same way
         """
 
     def __repr__(self):
         return f"Route {self.id} ({'IDA' if self.id==0 else "VUELTA" if self.id==1 else "?"})"
 
 
-class Line:
+class Line(_Model):
     """
     A bus line
     """
 
+    __slots__ = ("id", "name", "origin", "destination", "color", "routes")
+
     def __init__(
         self,
         id: int,
@@ -241,11 +284,13 @@ class Line:
         return f"Line - ID: {self.id} - Name: {self.name or "?"}"
 
 
-class NewsMessage:
+class NewsMessage(_Model):
     """
     A news message of the *iTranvías* app
     """
 
+    __slots__ = ("id", "date", "version", "title", "text")
+
     def __init__(
         self,
         id: int,
@@ -283,11 +328,15 @@ class NewsMessage:
         return self.title
 
 
-class Fare:
+class Fare(_Model):
     """
     A bus fare
     """
 
+    __slots__ = ("name", "price")
+
+    _hash_fields = ("name", "price")
+
     def __init__(
         self,
         name: str,
@@ -0,0 +1,404 @@
+"""
+Network graph built from the general/"static" info, and a journey planner on top of it
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.network import Network
+
+network = Network.from_general_info(api.info.get_general_info())
+
+journey = network.plan(523, 42, minimize="transfers", realtime=True)
+for leg in journey.legs:
+    print(f"Line {leg.line_id}: {leg.board} -> {leg.alight} ({len(leg.stops) - 1} stops, next bus in {leg.wait} min)")
+```
+"""
+
+from array import array
+
+from .models import Line, Stop
+from .concurrency import fan_out
+
+_UNREACHED = float("inf")
+
+
+class Leg:
+    """
+    A part of a `Journey` done in a single bus
+    """
+
+    __slots__ = ("line_id", "route_id", "stops", "wait")
+
+    def __init__(self, line_id: int, route_id: int, stops: list[int]):
+        self.line_id: int = line_id
+        """
+        Id of the line to take
+        """
+
+        self.route_id: int = route_id
+        """
+        Id of the route of the line (usually 0 outbound/ida, 1 return/vuelta)
+        """
+
+        self.stops: list[int] = stops
+        """
+        Ids of the stops the bus goes through, from the one to board in to the one to get off at
+        """
+
+        self.wait: int = None
+        """
+        Minutes until the next bus of the line arrives at the boarding stop, only set when planning with `realtime`. `None` if there is no bus coming
+        """
+
+    @property
+    def board(self) -> int:
+        """
+        Id of the stop to board the bus in
+        """
+
+        return self.stops[0]
+
+    @property
+    def alight(self) -> int:
+        """
+        Id of the stop to get off the bus at
+        """
+
+        return self.stops[-1]
+
+    def __repr__(self) -> str:
+        return f"Line {self.line_id} ({self.route_id}): {self.board} -> {self.alight}"
+
+
+class Journey:
+    """
+    A way of going from a stop to another one, as a list of `Leg`s
+    """
+
+    __slots__ = ("legs",)
+
+    def __init__(self, legs: list[Leg]):
+        self.legs: list[Leg] = legs
+        """
+        The legs of the journey, in order
+        """
+
+    @property
+    def transfers(self) -> int:
+        """
+        Number of times the bus has to be changed
+        """
+
+        return max(len(self.legs) - 1, 0)
+
+    @property
+    def stops(self) -> int:
+        """
+        Number of stops travelled, adding up all the legs
+        """
+
+        return sum(len(leg.stops) - 1 for leg in self.legs)
+
+    def __repr__(self) -> str:
+        return f"Journey ({self.transfers} transfers, {self.stops} stops): {self.legs}"
+
+
+class Network:
+    """
+    The bus network as a graph of stops, with precomputed indexes to plan journeys in it
+    """
+
+    def __init__(self, lines: dict[int, Line], stops: dict[int, Stop] = None):
+        """
+        :param lines: The lines (with their routes and their stops), like the `lines` of `get_general_info`
+
+        :param stops: The stops, like the `stops` of `get_general_info`. Only used to know about stops no route goes through
+        """
+
+        self.stop_ids: list[int] = []
+        """
+        Ids of all the stops, the position of a stop in this list is its index in the other structures
+        """
+
+        self.stop_index: dict[int, int] = {}
+        """
+        Stop id -> stop index
+        """
+
+        self.routes: list[tuple[int, int]] = []
+        """
+        `(line_id, route_id)` of all the routes, the position of a route in this list is its index in the other structures
+        """
+
+        self.route_stops: list[array] = []
+        """
+        Route index -> (ordered) indexes of its stops
+        """
+
+        self.route_positions: list[dict[int, int]] = []
+        """
+        Route index -> `{stop index: position in the route}` (the first position if the route goes through the stop more than once)
+        """
+
+        self.stop_routes: list[list[tuple[int, int]]] = []
+        """
+        Stop index -> `(route index, position)` of every time a route goes through the stop
+        """
+
+        self.stop_lines: dict[int, set[int]] = {}
+        """
+        Stop id -> ids of the lines going through it
+        """
+
+        self.line_stops: dict[int, set[int]] = {}
+        """
+        Line id -> ids of the stops it goes through
+        """
+
+        for stop_id in stops or ():
+            self._add_stop(stop_id)
+
+        for line in lines.values():
+            for route in line.routes.values():
+                route_index = len(self.routes)
+                self.routes.append((line.id, route.id))
+
+                indexes = array("l", (self._add_stop(stop.id) for stop in route.stops))
+                self.route_stops.append(indexes)
+                positions = {}
+                for position, stop in enumerate(indexes):
+                    positions.setdefault(stop, position)
+                    self.stop_routes[stop].append((route_index, position))
+                self.route_positions.append(positions)
+
+                for stop in route.stops:
+                    self.stop_lines.setdefault(stop.id, set()).add(line.id)
+                    self.line_stops.setdefault(line.id, set()).add(stop.id)
+
+        # Adjacency in CSR form: the stops reachable without intermediate stops from stop `i`
+        # are `adjacency_targets[adjacency_offsets[i]:adjacency_offsets[i + 1]]`
+        neighbours = [set() for _ in self.stop_ids]
+        for indexes in self.route_stops:
+            for origin, destination in zip(indexes, indexes[1:]):
+                neighbours[origin].add(destination)
+
+        self.adjacency_offsets: array = array("l", [0])
+        """
+        Offsets of each stop's neighbours in `adjacency_targets`
+        """
+
+        self.adjacency_targets: array = array("l")
+        """
+        Indexes of the neighbours of all the stops, one after another
+        """
+
+        for stop_neighbours in neighbours:
+            self.adjacency_targets.extend(sorted(stop_neighbours))
+            self.adjacency_offsets.append(len(self.adjacency_targets))
+
+    @classmethod
+    def from_general_info(cls, general_info: dict) -> "Network":
+        """
+        Builds the network from the output of `itranvias_api.queryitr.info.get_general_info`
+        """
+
+        return cls(general_info["lines"], general_info["stops"])
+
+    def neighbours(self, stop_id: int) -> list[int]:
+        """
+        Ids of the stops reachable from a stop without going through any other
+        """
+
+        i = self.stop_index[stop_id]
+        return [
+            self.stop_ids[j]
+            for j in self.adjacency_targets[
+                self.adjacency_offsets[i] : self.adjacency_offsets[i + 1]
+            ]
+        ]
+
+    def plan(
+        self,
+        origin: int,
+        destination: int,
+        minimize: str = "transfers",
+        max_transfers: int = 4,
+        realtime: bool = False,
+    ) -> Journey | None:
+        """
+        Find a journey between two stops
+
+        :param origin: Id of the stop to start at
+
+        :param destination: Id of the stop to get to
+
+        :param minimize: What to optimize for, either:
+            - `transfers`: The fewest bus changes, and then the fewest stops
+            - `stops`: The fewest stops, and then the fewest bus changes
+
+        :param max_transfers: Maximum number of bus changes to consider
+
+        :param realtime: Wether to fill in the `wait` of each leg with `itranvias_api.queryitr.stops.get_stop_buses` (one request per leg)
+
+        :return: The best `Journey`, or `None` if the destination can't be reached
+        """
+
+        if minimize not in ("transfers", "stops"):
+            raise ValueError(f"Can't minimize {minimize!r}, only transfers or stops")
+
+        if origin == destination:
+            return Journey([])
+
+        target = self.stop_index[destination]
+        labels, parents = self._rounds(
+            self.stop_index[origin],
+            max_transfers,
+            target if minimize == "transfers" else None,
+        )
+
+        best_round = None
+        for k in range(1, len(labels)):
+            if labels[k][target] == _UNREACHED:
+                continue
+            if best_round is None or labels[k][target] < labels[best_round][target]:
+                best_round = k
+            if minimize == "transfers":
+                break
+
+        if best_round is None:
+            return None
+
+        journey = self._journey(parents, best_round, target)
+        if realtime:
+            self._fill_waits(journey)
+
+        return journey
+
+    def all_pairs(
+        self, origins: list[int] = None, max_transfers: int = 4
+    ) -> dict[int, dict[int, tuple[int, int]]]:
+        """
+        Precomputes the best journeys from many stops to every other stop
+
+        :param origins: Ids of the stops to start at, all of them by default
+
+        :param max_transfers: Maximum number of bus changes to consider
+
+        :return: `{origin: {destination: (transfers, stops)}}` for every reachable destination, with the fewest transfers (and then the fewest stops)
+        """
+
+        table = {}
+        for origin in self.stop_ids if origins is None else origins:
+            labels, _ = self._rounds(self.stop_index[origin], max_transfers)
+            reachable = {}
+            for k in range(1, len(labels)):
+                for stop, stops_count in enumerate(labels[k]):
+                    if (
+                        stops_count != _UNREACHED
+                        and self.stop_ids[stop] not in reachable
+                    ):
+                        reachable[self.stop_ids[stop]] = (k - 1, int(stops_count))
+            reachable.pop(origin, None)
+            table[origin] = reachable
+
+        return table
+
+    def _add_stop(self, stop_id: int) -> int:
+        index = self.stop_index.get(stop_id)
+        if index is None:
+            index = self.stop_index[stop_id] = len(self.stop_ids)
+            self.stop_ids.append(stop_id)
+            self.stop_routes.append([])
+        return index
+
+    def _rounds(
+        self, origin: int, max_transfers: int, target: int = None
+    ) -> tuple[list[list[float]], list[dict[int, tuple[int, int, int]]]]:
+        """
+        Round based search (like RAPTOR, without times): `labels[k][stop]` is the fewest stops needed to reach `stop` with at most `k` buses,
+        and `parents[k][stop]` the `(route, board position, alight position)` of the last bus when it was improved in round `k`.
+        If a `target` is given, it stops after the first round reaching it
+        """
+
+        labels = [[_UNREACHED] * len(self.stop_ids)]
+        labels[0][origin] = 0
+        parents = [{}]
+        marked = {origin}
+
+        for _ in range(max_transfers + 1):
+            previous = labels[-1]
+            current = previous[:]
+            improved = {}
+
+            # Earliest position of a marked stop in each route going through them
+            routes = {}
+            for stop in marked:
+                for route, position in self.stop_routes[stop]:
+                    if position < routes.get(route, len(self.route_stops[route])):
+                        routes[route] = position
+
+            for route, start in routes.items():
+                stops = self.route_stops[route]
+                # Cost of reaching a later stop is `board_value + its position`
+                board_value = _UNREACHED
+                board_position = None
+                for position in range(start, len(stops)):
+                    stop = stops[position]
+                    if board_value + position < current[stop]:
+                        current[stop] = board_value + position
+                        improved[stop] = (route, board_position, position)
+                    if previous[stop] - position < board_value:
+                        board_value = previous[stop] - position
+                        board_position = position
+
+            labels.append(current)
+            parents.append(improved)
+            marked = set(improved)
+            if not marked or (target is not None and current[target] != _UNREACHED):
+                break
+
+        return labels, parents
+
+    def _journey(self, parents: list[dict], k: int, stop: int) -> Journey:
+        legs = []
+        while k > 0:
+            parent = parents[k].get(stop)
+            if parent is None:
+                # Reached with fewer buses, look at the previous round
+                k -= 1
+                continue
+
+            route, board_position, alight_position = parent
+            line_id, route_id = self.routes[route]
+            indexes = self.route_stops[route][board_position : alight_position + 1]
+            legs.append(Leg(line_id, route_id, [self.stop_ids[i] for i in indexes]))
+
+            stop = indexes[0]
+            k -= 1
+
+        legs.reverse()
+        return Journey(legs)
+
+    @staticmethod
+    def _fill_waits(journey: Journey) -> None:
+        from . import stops
+
+        legs = {leg.board: leg for leg in journey.legs}
+        for stop_id, buses in fan_out(stops.get_stop_buses, list(legs)):
+            if isinstance(buses, Exception):
+                continue
+
+            for leg in journey.legs:
+                if leg.board != stop_id:
+                    continue
+                times = [
+                    _minutes(bus.time) for bus in buses.get(leg.line_id, []) if bus.time
+                ]
+                leg.wait = min(times) if times else None
+
+
+def _minutes(time: str) -> int:
+    """
+    Converts a `Bus.time` (e.g. `"5"` or `"<1"`) to an int
+    """
+
+    return 0 if str(time).startswith("<") else int(time)
@@ -0,0 +1,323 @@
+"""
+Push fan-out of real-time updates as [Server-Sent Events](https://html.spec.whatwg.org/multipage/server-sent-events.html), with delta encoding.
+
+Each subscribed stop or line is polled once per interval however many subscribers it has (like `itranvias_api.queryitr.subscriptions`).
+Its buses are kept as compact rows keyed by `Bus.id`, and every poll only pushes the rows that changed (and the ids of the buses that are gone).
+Each message is encoded once and the same bytes are written to every subscriber. A subscriber joining late first gets a snapshot of every row.
+
+The gateway serves them at `GET /events?stops=523,42&lines=1100` (see `itranvias_api.queryitr.gateway`). In a browser:
+
+``` javascript
+const boards = {};
+const source = new EventSource("/events?stops=523");
+source.addEventListener("snapshot", (e) => {
+  const { target, id, buses } = JSON.parse(e.data);
+  boards[`${target}:${id}`] = buses;
+});
+source.addEventListener("delta", (e) => {
+  const { target, id, set, del } = JSON.parse(e.data);
+  const buses = boards[`${target}:${id}`];
+  Object.assign(buses, set);
+  del.forEach((busId) => delete buses[busId]);
+});
+```
+
+The rows are lists with the fields in `STOP_FIELDS` (for stops) or `LINE_FIELDS` (for lines)
+"""
+
+import json
+import logging
+import queue
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from .models import Bus, Route
+from .subscriptions import SubscriptionHub, _keys, _Target
+
+if TYPE_CHECKING:
+    from .queryitr_adapter import QueryItrAdapter
+
+STOP_FIELDS: tuple[str, ...] = ("line_id", "time", "distance", "state")
+"""
+Fields of the rows of a stop's buses, see `itranvias_api.queryitr.stops.get_stop_buses`
+"""
+
+LINE_FIELDS: tuple[str, ...] = ("route_id", "last_stop", "state", "route_progress")
+"""
+Fields of the rows of a line's buses, see `itranvias_api.queryitr.lines.get_line_buses`. `last_stop` is the stop id
+"""
+
+KEEPALIVE: bytes = b": keepalive\n\n"
+"""
+SSE comment sent when there was nothing to push for a while, so idle connections aren't dropped by proxies (and dead ones are noticed)
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+class _Subscriber(queue.Queue):
+    """
+    The bounded queue of messages of a subscriber, and the targets it is subscribed to (to resync it if it falls behind)
+    """
+
+    def __init__(self, keys: list[tuple[str, int]], max_pending: int):
+        # Room for a snapshot of every target on top of the pending messages, so a resync always fits
+        super().__init__(max_pending + len(keys))
+        self.keys: list[tuple[str, int]] = keys
+
+
+def stop_rows(buses: dict[int, list[Bus]]) -> dict[int, list]:
+    """
+    The compact rows of a `itranvias_api.queryitr.stops.get_stop_buses` result, by bus id
+    """
+
+    return {
+        bus.id: [line_id, bus.time, bus.distance, bus.state]
+        for line_id, line_buses in buses.items()
+        for bus in line_buses
+    }
+
+
+def line_rows(routes: dict[int, Route]) -> dict[int, list]:
+    """
+    The compact rows of a `itranvias_api.queryitr.lines.get_line_buses` result, by bus id
+    """
+
+    return {
+        bus.id: [
+            route_id,
+            bus.last_stop.id if bus.last_stop is not None else None,
+            bus.state,
+            bus.route_progress,
+        ]
+        for route_id, route in routes.items()
+        for buses in route.buses.values()
+        for bus in buses
+    }
+
+
+def delta(
+    previous: dict[int, list], current: dict[int, list]
+) -> tuple[dict[int, list], list[int]]:
+    """
+    Compares two sets of rows
+
+    :return: `(set, deleted)`: the rows that are new or changed, and the ids of the buses that are gone. Both empty if nothing changed
+    """
+
+    changed = {
+        bus_id: row for bus_id, row in current.items() if previous.get(bus_id) != row
+    }
+    deleted = [bus_id for bus_id in previous if bus_id not in current]
+    return changed, deleted
+
+
+def sse_message(event: str, data: dict) -> bytes:
+    """
+    Encodes an SSE message
+    """
+
+    return (
+        f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+    )
+
+
+class PushHub(SubscriptionHub):
+    """
+    A `itranvias_api.queryitr.subscriptions.SubscriptionHub` whose subscribers get SSE encoded snapshots and deltas instead of `ChangeEvent`s
+    """
+
+    def __init__(
+        self,
+        interval: float = 15,
+        max_concurrency: int = 8,
+        adapter: "QueryItrAdapter" = None,
+        max_pending: int = 64,
+    ):
+        """
+        :param interval: Seconds between polls of the targets
+
+        :param max_concurrency: Maximum number of requests running at the same time in a poll
+
+        :param adapter: Adapter to poll with, the module-level one by default
+
+        :param max_pending: Maximum number of messages waiting to be sent to a subscriber. One that falls further behind (e.g. a stalled client)
+        has its pending messages dropped and gets a fresh snapshot of each of its targets instead, so it resyncs without memory growing
+        """
+
+        super().__init__(interval, max_concurrency)
+
+        self.adapter: "QueryItrAdapter" = adapter
+        """
+        Adapter to poll with, the module-level one when `None`
+        """
+
+        self.messages: int = 0
+        """
+        Number of messages encoded, each one is sent to every subscriber of its target
+        """
+
+        self.bytes_sent: int = 0
+        """
+        Total size (in bytes) of the messages sent to all the subscribers, keepalives excluded
+        """
+
+        self.max_pending: int = max_pending
+        """
+        Maximum number of messages waiting to be sent to a subscriber before it is resynced
+        """
+
+        self.resyncs: int = 0
+        """
+        Number of times a subscriber fell more than `max_pending` messages behind and was sent snapshots instead
+        """
+
+        self._snapshots: dict[tuple[str, int], bytes] = {}
+        """
+        Encoded snapshot of each target, until its next change
+        """
+
+    def subscribe(
+        self,
+        stops: Iterable[int] = (),
+        lines: Iterable[int] = (),
+        keepalive: float = 15,
+    ) -> Iterator[bytes]:
+        """
+        Subscribe to stops and lines. The subscription ends when the generator is closed (or garbage collected)
+
+        :param stops: Ids of the stops to watch
+
+        :param lines: Ids of the lines to watch
+
+        :param keepalive: Seconds without messages after which a `KEEPALIVE` is yielded
+
+        :return: A generator of SSE messages, ready to be written to the client: a `snapshot` of each target
+        (as soon as it has been polled) and then a `delta` every time it changes
+        """
+
+        keys = _keys(stops, lines)
+        subscriber = _Subscriber(keys, self.max_pending)
+        self._add(keys, subscriber)
+        self._ensure_polling()
+        try:
+            while True:
+                try:
+                    yield subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield KEEPALIVE
+        finally:
+            self._remove(keys, subscriber)
+
+    def subscribers(self) -> int:
+        """
+        Number of subscriptions to all the targets (a subscriber to 2 stops counts twice)
+        """
+
+        with self._lock:
+            return sum(len(target.subscribers) for target in self._targets.values())
+
+    def _add(self, keys: list[tuple[str, int]], subscriber) -> None:
+        with self._lock:
+            for key in keys:
+                target = self._targets.setdefault(key, _Target())
+                target.subscribers.append(subscriber)
+                if target.state is not None:
+                    self._send([subscriber], self._snapshot(key, target))
+
+    def _remove(self, keys: list[tuple[str, int]], subscriber) -> None:
+        super()._remove(keys, subscriber)
+        with self._lock:
+            for key in keys:
+                if key not in self._targets:
+                    self._snapshots.pop(key, None)
+
+    def _fetch(self, key: tuple[str, int]) -> dict:
+        if self.adapter is None:
+            return super()._fetch(key)
+
+        from .lines import _parse_line_buses
+        from .stops import _parse_stop_buses
+
+        target, target_id = key
+        func, parser = (
+            (0, _parse_stop_buses) if target == "stop" else (2, _parse_line_buses)
+        )
+        return self.adapter.build(
+            func, parser, self.adapter.get(func=func, dato=target_id).data
+        )
+
+    def _update(self, key: tuple[str, int], result: dict | Exception) -> None:
+        self.polls += 1
+        if isinstance(result, Exception):
+            # Keep the previous state, the next poll will tell what changed
+            _logger.warning("Polling %s %s failed: %s", *key, result)
+            return
+
+        rows = stop_rows(result) if key[0] == "stop" else line_rows(result)
+
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:  # Unsubscribed during the poll
+                return
+
+            if target.state is None:
+                # Whoever subscribed before the first poll is waiting for the snapshot
+                target.state = rows
+                self._send(target.subscribers, self._snapshot(key, target))
+                return
+
+            changed, deleted = delta(target.state, rows)
+            if not changed and not deleted:
+                return
+
+            target.state = rows
+            self._snapshots.pop(key, None)
+            message = sse_message(
+                "delta",
+                {"target": key[0], "id": key[1], "set": changed, "del": deleted},
+            )
+            self.messages += 1
+            self._send(target.subscribers, message)
+
+    def _snapshot(self, key: tuple[str, int], target: _Target) -> bytes:
+        """
+        The encoded snapshot of a target, encoded only once per change however many late joiners ask for it. Must be called holding the lock
+        """
+
+        message = self._snapshots.get(key)
+        if message is None:
+            message = self._snapshots[key] = sse_message(
+                "snapshot", {"target": key[0], "id": key[1], "buses": target.state}
+            )
+            self.messages += 1
+        return message
+
+    def _send(self, subscribers: list[_Subscriber], message: bytes) -> None:
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._resync(subscriber)
+            else:
+                self.bytes_sent += len(message)
+
+    def _resync(self, subscriber: _Subscriber) -> None:
+        """
+        Replaces the pending messages of a subscriber with a snapshot of each of its targets. Must be called holding the lock
+        """
+
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+
+        for key in subscriber.keys:
+            target = self._targets.get(key)
+            if target is not None and target.state is not None:
+                message = self._snapshot(key, target)
+                subscriber.put_nowait(message)
+                self.bytes_sent += len(message)
+
+        self.resyncs += 1
+        _logger.info("Subscriber to %s fell behind, resynced", subscriber.keys)
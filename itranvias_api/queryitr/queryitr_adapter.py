@@ -1,7 +1,32 @@
-import requests
+import copy
 import random
+import threading
+import time
 from datetime import datetime
 import logging
+from typing import TYPE_CHECKING, Callable, TypeVar
+
+from .cache import ResponseCache, request_key
+from .concurrency import SingleFlight
+from .scheduler import RateBudgetScheduler
+from .resilience import CircuitBreaker, RetryPolicy, is_transient
+from .metrics import MetricsHook, timed_build
+from .decoding import json_loads
+from .transport import SESSION_TRANSPORT, Transport
+
+if TYPE_CHECKING:
+    # requests is only imported when the first request is made, see `QueryItrAdapter._get_session`
+    import requests
+    import requests.adapters
+
+V = TypeVar("V")
+
+_HEADER_FIELDS: frozenset[str] = frozenset(
+    ("resultado", "fecha_peticion", "peticion", "tama\u00f1o", "Origen")
+)
+"""
+Fields of every response which `QueryItrResponse` parses into its own attributes instead of leaving them in `data`
+"""
 
 
 class QueryItrResponse:
@@ -9,20 +34,20 @@ class QueryItrResponse:
     A class representing a response from `/queryitr_v3.php`
     """
 
-    def __init__(self, response: requests.Response, full_data: dict = None):
-        self.response: requests.Response = response
+    def __init__(self, response: "requests.Response", full_data: dict = None):
+        self.response: "requests.Response" = response
         """
-        The `requests.Response` object of the request
+        The `requests.Response` object of the request (an `aiohttp.ClientResponse` when it comes from `AsyncQueryItrAdapter`)
         """
 
         try:
-            self.full_data: dict = full_data or response.json()
+            self.full_data: dict = (
+                full_data if full_data is not None else json_loads(response.content)
+            )
             """
-            The full JSON response from the API as a dictionary
+            The full JSON response from the API as a dictionary. It isn't modified by the parsing
             """
-        except (
-            requests.exceptions.JSONDecodeError
-        ):  # When we hit rate limit for example
+        except ValueError:  # When we hit rate limit for example
             self.full_data = {}
 
         # The following attributes are set by self.parse()
@@ -31,10 +56,6 @@ class QueryItrResponse:
         """
         Usually `OK` or `ERROR`
         """
-        self.request_date: datetime = None
-        """
-        The date (server-side) at which the petition was received
-        """
 
         self.internal_endpoint: str = None
         """
@@ -56,24 +77,42 @@ class QueryItrResponse:
         Remaining JSON data that has not been parsed into other attributes
         """
 
+        self.stale: bool = False
+        """
+        Wether this is an old response served because the request failed, see `QueryItrAdapter.stale_on_error`
+        """
+
+        self._request_date: datetime | str = None
+
         self.parse()
 
     def parse(self):
-        if self.full_data == {}:
+        if not self.full_data:
             return
 
-        # We copy the dict so we don't modify the original
         data = self.full_data
 
-        self.result = data.pop("resultado")
-        self.request_date = datetime.strptime(
-            data.pop("fecha_peticion"), "%Y%m%d%H%M%S"
-        )
-        self.internal_endpoint = data.pop("peticion")
-        self.size = data.pop("tama\u00f1o")
-        self.origin = data.pop("Origen")
+        self.result = data.get("resultado")
+        # Parsed when (if) `request_date` is used
+        self._request_date = data.get("fecha_peticion")
+        self.internal_endpoint = data.get("peticion")
+        self.size = data.get("tama\u00f1o")
+        self.origin = data.get("Origen")
+
+        self.data: dict = {
+            key: value for key, value in data.items() if key not in _HEADER_FIELDS
+        }
+
+    @property
+    def request_date(self) -> datetime:
+        """
+        The date (server-side) at which the petition was received
+        """
+
+        if isinstance(self._request_date, str):
+            self._request_date = datetime.strptime(self._request_date, "%Y%m%d%H%M%S")
 
-        self.data: dict = data
+        return self._request_date
 
     def __repr__(self) -> dict:
         return self.data
@@ -84,7 +123,7 @@ class QueryItrError(Exception):
     Exception used for succesful connections to the server but that for some reason didn't work
     """
 
-    def __init__(self, response: requests.Response, full_data: dict = None):
+    def __init__(self, response: "requests.Response", full_data: dict = None):
         self.app_response: QueryItrResponse = QueryItrResponse(response, full_data)
         """
         The `QueryItrResponse` object for the failed request
@@ -100,8 +139,19 @@ class QueryItrError(Exception):
         The error message given by the app
         """
 
+        # aiohttp responses (see `AsyncQueryItrAdapter`) call it `status`
+        self.status_code: int = getattr(response, "status_code", None) or getattr(
+            response, "status", None
+        )
+        """
+        The HTTP status code of the response
+        """
+
+        if not self.app_response.full_data:
+            self.message = "Response is not valid JSON"
+
         super().__init__(
-            f"HTTP --> {self.app_response.response.status_code}: {self.app_response.response.reason} || App --> {self.id or "?"}: {self.message or "?"}"
+            f"HTTP --> {self.status_code or "?"}: {response.reason} || App --> {self.id or "?"}: {self.message or "?"}"
         )
 
 
@@ -111,7 +161,23 @@ class QueryItrAdapter:
     """
 
     def __init__(
-        self, url: str, logger: logging.Logger = None, bypass_rate_limit: bool = False
+        self,
+        url: str,
+        logger: logging.Logger = None,
+        bypass_rate_limit: bool = False,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: float | tuple[float, float] = (5, 30),
+        accept_encoding: str = "gzip, deflate",
+        cache: ResponseCache = None,
+        coalesce_requests: bool = True,
+        scheduler: RateBudgetScheduler = None,
+        retry: RetryPolicy = None,
+        circuit_breaker: CircuitBreaker = None,
+        stale_on_error: bool = False,
+        metrics: MetricsHook = None,
+        transport: Transport = None,
     ):
         self.url: str = url
         """
@@ -130,10 +196,173 @@ class QueryItrAdapter:
         This is disabled by default. Not that it can also be temporarily enabled when calling `QueryItrAdapter.get`
         """
 
+        self.timeout: float | tuple[float, float] = timeout
+        """
+        Timeout (in seconds) for each request, either a single number or a `(connect, read)` tuple, as accepted by `requests`
+        """
+
+        self.cache: ResponseCache = cache
+        """
+        Optional `itranvias_api.queryitr.cache.ResponseCache` for the responses. Disabled (`None`) by default
+        """
+
+        self.coalesce_requests: bool = coalesce_requests
+        """
+        Wether concurrent calls asking for the same `(func, dato, extra_params)` should share a single request (and its response)
+        """
+
+        self._single_flight: SingleFlight = SingleFlight()
+
+        self.scheduler: RateBudgetScheduler = scheduler
+        """
+        Optional `itranvias_api.queryitr.scheduler.RateBudgetScheduler` every request has to go through, to keep under a request budget.
+        Disabled (`None`) by default
+        """
+
+        self.retry: RetryPolicy = retry
+        """
+        Optional `itranvias_api.queryitr.resilience.RetryPolicy` for failed requests (see `itranvias_api.queryitr.resilience.is_transient`).
+        Disabled (`None`) by default
+        """
+
+        self.circuit_breaker: CircuitBreaker = circuit_breaker
+        """
+        Optional `itranvias_api.queryitr.resilience.CircuitBreaker`, to fail fast while the server is unhealthy. Disabled (`None`) by default
+        """
+
+        self.stale_on_error: bool = stale_on_error
+        """
+        Wether to return the last response in the `cache` for the same request (even if expired, marked as `stale`) when a request fails
+        """
+
+        self.metrics: MetricsHook = metrics
+        """
+        Optional `itranvias_api.queryitr.metrics.MetricsHook` (like `itranvias_api.queryitr.metrics.Metrics`) the calls report their counters and timings to.
+        Disabled (`None`) by default
+        """
+
+        self.transport: Transport = transport or SESSION_TRANSPORT
+        """
+        What the requests are sent through, see `itranvias_api.queryitr.transport`. The adapter's own `requests` session by default,
+        but the responses can also be recorded (`itranvias_api.queryitr.transport.RecordingTransport`) and replayed (`itranvias_api.queryitr.transport.ReplayTransport`)
+        """
+
+        self.pool_connections: int = pool_connections
+        """
+        Number of per-host connection pools kept
+        """
+
+        self.pool_maxsize: int = pool_maxsize
+        """
+        Maximum number of connections kept open for each host
+        """
+
+        self.pool_block: bool = pool_block
+        """
+        Wether to wait for a free connection instead of opening a throwaway one when a host's pool is exhausted
+        """
+
+        self.accept_encoding: str = accept_encoding
+        """
+        Value of the `Accept-Encoding` header sent with every request
+        """
+
+        self._http_adapter: "requests.adapters.HTTPAdapter" = None
+        """
+        The transport adapter holding the keep-alive connection pools, created along with `_session`
+        """
+
+        self._session: "requests.Session" = None
+        """
+        Persistent session, so connections (and TLS handshakes) are reused between calls. It is created by `_get_session` on the first request.
+        It is only used for GET requests with per-request headers, so it can be shared between threads
+        """
+
+        self._closed_pools_stats: dict[str, int] = {"requests": 0, "connections": 0}
+        self._stats_lock: threading.Lock = threading.Lock()
+
+    def _get_session(self) -> "requests.Session":
+        """
+        Returns the session of this adapter, creating it (and importing `requests`) the first time
+        """
+
+        if self._session is not None:
+            return self._session
+
+        with self._stats_lock:
+            if self._session is None:
+                import requests
+                import requests.adapters
+
+                self._http_adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                )
+                session = requests.Session()
+                session.mount("https://", self._http_adapter)
+                session.mount("http://", self._http_adapter)
+                session.headers["Accept-Encoding"] = self.accept_encoding
+                self._session = session
+
+        return self._session
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        Get statistics about the connection pool of this adapter
+
+        :return: A dict with 3 keys:
+        - `requests`: The number of requests sent through the pool
+        - `connections_opened`: How many of them needed to open a new connection
+        - `connections_reused`: How many of them reused an already open (keep-alive) connection
+        """
+
+        with self._stats_lock:
+            requests_count = self._closed_pools_stats["requests"]
+            connections_count = self._closed_pools_stats["connections"]
+            pools = (
+                self._http_adapter.poolmanager.pools
+                if self._http_adapter is not None
+                else {}
+            )
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+
+        return {
+            "requests": requests_count,
+            "connections_opened": connections_count,
+            "connections_reused": max(requests_count - connections_count, 0),
+        }
+
+    def close(self) -> None:
+        """
+        Close all the pooled connections of this adapter. It can still be used afterwards, new connections will be opened as needed
+        """
+
+        stats = self.pool_stats()
+        with self._stats_lock:
+            self._closed_pools_stats = {
+                "requests": stats["requests"],
+                "connections": stats["connections_opened"],
+            }
+            if self._session is not None:
+                self._session.close()
+
+    def __enter__(self) -> "QueryItrAdapter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def get(
         self,
         func: int,
         dato=None,
+        priority: float = 0,
+        timeout: float | tuple[float, float] = None,
         **extra_params,
     ) -> QueryItrResponse:
         """
@@ -141,9 +370,141 @@ class QueryItrAdapter:
 
         :param func: The number of the function to call the endpoint with. `0` is for example the stop info
         :param dato: The main parameter of a function, any other **extra parameters can be passed as keyword arguments**
+        :param priority: Urgency of the request when there is a `scheduler` and requests have to wait, lower goes first
+        :param timeout: Timeout for this call instead of the adapter's `timeout`
         :param bypass_rate_limit: Wether to temporarily enable the rate limit bypass
         """
 
+        key = request_key(func, dato, extra_params)
+        cached = self.cache is not None and bool(self.cache.ttl_for(key))
+
+        if cached:
+            response = self.cache.get(key)
+            if response is not None:
+                return response
+
+        try:
+            response = self._fetch(key, func, dato, extra_params, priority, timeout)
+        except BaseException as e:
+            if cached:
+                self.cache.release(key)
+            stale = self._stale_response(key, e)
+            if stale is None:
+                raise
+            return stale
+
+        if cached:
+            self.cache.put(key, response)
+        return response
+
+    def build(self, func: int, parser: Callable[..., V], *args) -> V:
+        """
+        Builds the models of a response of `func` with `parser(*args)`, timing it as the `build` phase if there are `metrics`
+        """
+
+        return timed_build(self.metrics, func, parser, *args)
+
+    def _fetch(
+        self,
+        key: tuple,
+        func: int,
+        dato,
+        extra_params: dict,
+        priority: float = 0,
+        timeout: float | tuple[float, float] = None,
+    ) -> QueryItrResponse:
+        """
+        Calls `_call`, sharing the call with any concurrent one for the same `key` if `coalesce_requests` is enabled
+        """
+
+        if self.coalesce_requests:
+            return self._single_flight.do(
+                key, self._call, func, dato, extra_params, priority, timeout
+            )
+
+        return self._call(func, dato, extra_params, priority, timeout)
+
+    def _call(
+        self,
+        func: int,
+        dato,
+        extra_params: dict,
+        priority: float = 0,
+        timeout: float | tuple[float, float] = None,
+    ) -> QueryItrResponse:
+        """
+        Calls `_request` through the `circuit_breaker`, retrying according to `retry`
+        """
+
+        delays = self.retry.delays() if self.retry is not None else iter(())
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+
+            try:
+                response = self._request(func, dato, extra_params, priority, timeout)
+            except Exception as e:
+                transient = is_transient(e)
+                if self.circuit_breaker is not None:
+                    if transient:
+                        self.circuit_breaker.record_failure()
+                    else:  # The server answered, it is healthy
+                        self.circuit_breaker.record_success()
+
+                delay = next(delays, None) if transient else None
+                if delay is None:
+                    raise
+
+                self._logger.warning(
+                    "Retrying func=%s, dato=%s in %.2fs after: %s", func, dato, delay, e
+                )
+                time.sleep(delay)
+                continue
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return response
+
+    def _stale_response(
+        self, key: tuple, error: BaseException
+    ) -> QueryItrResponse | None:
+        """
+        The last cached response for `key` marked as `stale`, if `stale_on_error` is enabled and there is one
+        """
+
+        if (
+            not self.stale_on_error
+            or self.cache is None
+            or not isinstance(error, Exception)
+        ):
+            return None
+
+        response = self.cache.get_stale(key)
+        if response is None:
+            return None
+
+        self._logger.warning("Serving a stale response for %s after: %s", key, error)
+        if self.metrics is not None:
+            self.metrics.count(key[0], "stale")
+        response = copy.copy(response)
+        response.stale = True
+        return response
+
+    def _request(
+        self,
+        func: int,
+        dato,
+        extra_params: dict,
+        priority: float = 0,
+        timeout: float | tuple[float, float] = None,
+    ) -> QueryItrResponse:
+        """
+        Sends the request to `/queryitr_v3.php`, see `get`
+        """
+
+        if self.scheduler is not None:
+            self.scheduler.acquire(priority)
+
         if self.bypass_rate_limit:
             # The server accepts this header from anyone, not just the proxy (found & already reported by @delthia)
             headers = {"X-Forwarded-For": self._random_private_ip()}
@@ -151,38 +512,79 @@ class QueryItrAdapter:
             headers = {}
 
         ep_params = {"func": func, "dato": dato} | extra_params
-
-        def _escape_dict(data: dict) -> str:
-            return str(data).replace("{", "{{").replace("}", "}}")
-
-        # Log line to show before doing the request
-        log_line_pre = f"method=GET, url={
-            self.url}, params={_escape_dict(ep_params)}"
-        # Log line to show how the request went
-        log_line_post = ", ".join(
-            (log_line_pre, "success={}, status_code={}, message={}")
-        )
+        metrics = self.metrics
 
         # The actual request is made here
-        self._logger.debug(msg=log_line_pre)
-        response = requests.request(
-            method="GET", url=self.url, headers=headers, params=ep_params
-        )
+        self._logger.debug("method=GET, url=%s, params=%s", self.url, ep_params)
+        start = time.perf_counter()
+        try:
+            response = self.transport.get(
+                self,
+                ep_params,
+                headers,
+                timeout if timeout is not None else self.timeout,
+            )
+            headers_time = time.perf_counter()
+            content = response.content
+        except Exception:
+            if metrics is not None:
+                metrics.count(func, "requests")
+                metrics.count(func, "errors")
+            raise
+
+        downloaded_time = time.perf_counter()
+        app_response = QueryItrResponse(response)
+        decoded_time = time.perf_counter()
 
         is_success = 299 >= response.status_code >= 200  # 200 to 299 is OK
-        log_line = log_line_post.format(
-            is_success, response.status_code, response.reason
+        # A rate limited request gets a 200 without JSON
+        is_valid = is_success and bool(app_response.full_data)
+        is_rate_limited = response.status_code == 429 or (is_success and not is_valid)
+
+        if metrics is not None:
+            metrics.count(func, "requests")
+            metrics.count(
+                func,
+                "bytes",
+                app_response.size if app_response.size is not None else len(content),
+            )
+            metrics.observe(func, "request", headers_time - start)
+            metrics.observe(func, "download", downloaded_time - headers_time)
+            metrics.observe(func, "decode", decoded_time - downloaded_time)
+            if not is_valid:
+                metrics.count(func, "errors")
+            if is_rate_limited:
+                metrics.count(func, "rate_limited")
+
+        if self.scheduler is not None:
+            if is_rate_limited:
+                self.scheduler.on_rate_limited()
+            elif is_valid:
+                self.scheduler.on_success()
+
+        log_args = (
+            self.url,
+            ep_params,
+            is_valid,
+            response.status_code,
+            response.reason,
         )
 
-        if is_success:
-            self._logger.debug(msg=log_line)
-            # Filter the json data by the given key
-            return QueryItrResponse(response)
+        if is_valid:
+            self._logger.debug(
+                "method=GET, url=%s, params=%s, success=%s, status_code=%s, message=%s",
+                *log_args,
+            )
+            return app_response
 
-        self._logger.error(msg=log_line)
-        raise QueryItrError(response)
+        self._logger.error(
+            "method=GET, url=%s, params=%s, success=%s, status_code=%s, message=%s",
+            *log_args,
+        )
+        raise QueryItrError(response, app_response.full_data)
 
-    def _random_private_ip(self) -> str:
+    @staticmethod
+    def _random_private_ip() -> str:
         """
         Generates a random IPv4 address in one of these ranges: 10.0.0.0/8, 172.16.0.0/12 or 192.168.0.0/16
         """
@@ -0,0 +1,196 @@
+"""
+Retries with backoff and a circuit breaker, to keep latency bounded when the server misbehaves
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.cache import ResponseCache
+from itranvias_api.queryitr.resilience import CircuitBreaker, RetryPolicy
+
+adapter = api._queryitr_adapter
+adapter.retry = RetryPolicy(attempts=3)
+adapter.circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+# While the server is failing, serve the last good response (marked as `stale`)
+adapter.cache = ResponseCache()
+adapter.stale_on_error = True
+```
+"""
+
+import random
+import threading
+import time
+from typing import Iterator
+
+CLOSED = "closed"
+"""
+Circuit state: requests go through
+"""
+
+OPEN = "open"
+"""
+Circuit state: requests fail fast with `CircuitOpenError`
+"""
+
+HALF_OPEN = "half_open"
+"""
+Circuit state: a single trial request goes through to check if the server is back
+"""
+
+
+class CircuitOpenError(Exception):
+    """
+    Exception raised instead of making a request while the circuit is open
+    """
+
+    def __init__(self, retry_after: float):
+        self.retry_after: float = retry_after
+        """
+        Seconds until a trial request will be let through
+        """
+
+        super().__init__(f"Circuit open, retrying in {retry_after:.1f}s")
+
+
+def is_transient(exception: BaseException) -> bool:
+    """
+    Wether a failed request is worth retrying (and counts against the server's health): connection errors and timeouts,
+    rate limits, server errors (5xx) and 200 responses without valid JSON. Any other client error (4xx) is permanent, even without JSON (like an HTML 404)
+    """
+
+    from .queryitr_adapter import QueryItrError
+
+    if isinstance(exception, QueryItrError):
+        status_code = exception.status_code
+        if status_code == 429 or (isinstance(status_code, int) and status_code >= 500):
+            return True
+        if isinstance(status_code, int) and 400 <= status_code < 500:
+            return False
+        return not exception.app_response.full_data
+
+    # requests' exceptions are `OSError`s
+    return isinstance(exception, (OSError, TimeoutError))
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff ("full jitter"): the n-th retry waits a random time between 0 and `min(max_delay, base_delay * 2**n)`.
+    Every call to the server is a GET, so all of them can be retried safely
+    """
+
+    def __init__(
+        self, attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5
+    ):
+        """
+        :param attempts: Maximum number of tries of each call, counting the first one
+
+        :param base_delay: Maximum delay (in seconds) before the first retry
+
+        :param max_delay: Maximum delay (in seconds) before any retry
+        """
+
+        self.attempts: int = attempts
+        """
+        Maximum number of tries of each call, counting the first one
+        """
+
+        self.base_delay: float = base_delay
+        """
+        Maximum delay (in seconds) before the first retry
+        """
+
+        self.max_delay: float = max_delay
+        """
+        Maximum delay (in seconds) before any retry
+        """
+
+        self.retries: int = 0
+        """
+        Number of retries made
+        """
+
+    def delays(self) -> Iterator[float]:
+        """
+        The delays (in seconds) to wait before each retry of a call
+        """
+
+        for retry in range(self.attempts - 1):
+            self.retries += 1
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after `failure_threshold` consecutive transient failures (see `is_transient`), failing fast with `CircuitOpenError`.
+    After `reset_timeout` seconds a single trial request is let through: the circuit closes again if it works, and stays open otherwise
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        :param failure_threshold: Consecutive failures that open the circuit
+
+        :param reset_timeout: Seconds the circuit stays open before trying again
+        """
+
+        self.failure_threshold: int = failure_threshold
+        """
+        Consecutive failures that open the circuit
+        """
+
+        self.reset_timeout: float = reset_timeout
+        """
+        Seconds the circuit stays open before trying again
+        """
+
+        self.state: str = CLOSED
+        """
+        `CLOSED`, `OPEN` or `HALF_OPEN`
+        """
+
+        self.rejected: int = 0
+        """
+        Number of calls that failed fast because the circuit was open
+        """
+
+        self._failures: int = 0
+        self._opened_at: float = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Checks whether a call can be made
+
+        :raises CircuitOpenError: If the circuit is open (or half open and already trying a request)
+        """
+
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if retry_after <= 0:
+                # Also when a trial call never reported back
+                self.state = HALF_OPEN
+                self._opened_at = time.monotonic()
+                return
+
+            self.rejected += 1
+            raise CircuitOpenError(max(retry_after, 0))
+
+    def record_success(self) -> None:
+        """
+        Tells the breaker a call worked, closing the circuit
+        """
+
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        """
+        Tells the breaker a call failed, opening the circuit if it was the trial call or there have been too many failures in a row
+        """
+
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,195 @@
+"""
+Client-side request budget: a token bucket which keeps the requests of an adapter under a rate, serving the most urgent ones first when there are
+more requests than budget, and slowing down by itself when the server rate limits us
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.scheduler import RateBudgetScheduler
+
+api._queryitr_adapter.scheduler = RateBudgetScheduler(rate=2, burst=4)
+
+# Stops with a bus about to arrive are refreshed before the ones with nothing nearby
+priorities = {stop_id: api.scheduler.stop_priority(buses) for stop_id, buses in last_boards.items()}
+for stop_id, buses in api.stops.get_many_stop_buses(priorities, priorities=priorities):
+    ...
+```
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from .models import Bus
+
+NO_BUSES_PRIORITY: float = float("inf")
+"""
+Priority of a stop with no buses coming, the least urgent
+"""
+
+
+def stop_priority(buses: dict[int, list[Bus]]) -> float:
+    """
+    Priority (lower is more urgent) for refreshing a stop, from its last `itranvias_api.queryitr.stops.get_stop_buses` result: the minutes until its next bus
+
+    :return: The minutes until the next bus arrives (`0` if it is less than one), or `NO_BUSES_PRIORITY` if there are no buses coming
+    """
+
+    times = [
+        0 if str(bus.time).startswith("<") else int(bus.time)
+        for line_buses in buses.values()
+        for bus in line_buses
+        if bus.time is not None
+    ]
+    return min(times) if times else NO_BUSES_PRIORITY
+
+
+class RateBudgetScheduler:
+    """
+    A token bucket shared by every request of an adapter. Requests wait for a token, and the waiting ones are served by priority (lower first),
+    then in arrival order.
+
+    The rate is adapted like TCP congestion control (AIMD): it is cut by `backoff` every time a rate limit is detected, and grows back by `recovery`
+    requests/s with every successful request, up to the configured `max_rate`
+    """
+
+    def __init__(
+        self,
+        rate: float = 2,
+        burst: int = 4,
+        min_rate: float = 0.1,
+        backoff: float = 0.5,
+        recovery: float = 0.05,
+    ):
+        """
+        :param rate: Maximum (and initial) sustained rate, in requests per second
+
+        :param burst: Maximum number of requests that can be sent at once after being idle (size of the bucket)
+
+        :param min_rate: The rate is never cut below this
+
+        :param backoff: Factor the rate is multiplied by when a rate limit is detected
+
+        :param recovery: Requests/s the rate grows with every successful request, until it is back at `rate`
+        """
+
+        self.max_rate: float = rate
+        """
+        Maximum sustained rate, in requests per second
+        """
+
+        self.rate: float = rate
+        """
+        Current sustained rate, in requests per second
+        """
+
+        self.burst: int = burst
+        """
+        Size of the bucket
+        """
+
+        self.min_rate: float = min_rate
+        """
+        Minimum rate, in requests per second
+        """
+
+        self.backoff: float = backoff
+        """
+        Factor the rate is multiplied by when a rate limit is detected
+        """
+
+        self.recovery: float = recovery
+        """
+        Requests/s the rate grows with every successful request
+        """
+
+        self.rate_limited: int = 0
+        """
+        Number of rate limits detected
+        """
+
+        self.waited: float = 0
+        """
+        Total time (in seconds) requests have spent waiting for a token
+        """
+
+        self._tokens: float = burst
+        self._updated: float = time.monotonic()
+        self._queue: list[tuple[float, int]] = []
+        self._counter = itertools.count()
+        self._condition: threading.Condition = threading.Condition()
+
+    def acquire(self, priority: float = 0) -> None:
+        """
+        Blocks until the request can be sent
+
+        :param priority: Urgency of the request, lower goes first
+        """
+
+        start = time.monotonic()
+        with self._condition:
+            entry = (priority, next(self._counter))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._queue[0] != entry:
+                        # Woken up when the ones before take their token (or give up)
+                        self._condition.wait()
+                    elif self._tokens >= 1:
+                        heapq.heappop(self._queue)
+                        self._tokens -= 1
+                        break
+                    else:
+                        self._condition.wait((1 - self._tokens) / self.rate)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                raise
+            finally:
+                self._condition.notify_all()
+
+            self.waited += time.monotonic() - start
+
+    def on_success(self) -> None:
+        """
+        Tells the scheduler a request went through, growing the rate back towards `max_rate`
+        """
+
+        with self._condition:
+            self._refill()
+            self.rate = min(self.rate + self.recovery, self.max_rate)
+
+    def on_rate_limited(self) -> None:
+        """
+        Tells the scheduler a request was rate limited, cutting the rate and emptying the bucket
+        """
+
+        with self._condition:
+            self._refill()
+            self.rate_limited += 1
+            self.rate = max(self.rate * self.backoff, self.min_rate)
+            self._tokens = 0
+
+    def stats(self) -> dict[str, float]:
+        """
+        Get statistics about the scheduler
+
+        :return: A dict with the current `rate`, the `tokens` available, the number of `queued` requests, the `rate_limited` count
+        and the total time `waited` by requests
+        """
+
+        with self._condition:
+            self._refill()
+            return {
+                "rate": self.rate,
+                "tokens": self._tokens,
+                "queued": len(self._queue),
+                "rate_limited": self.rate_limited,
+                "waited": self.waited,
+            }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+        self._updated = now
@@ -0,0 +1,203 @@
+"""
+Spatial index over the stops, to find the ones near a point
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.spatial import StopIndex
+
+index = StopIndex.from_general_info(api.info.get_general_info())
+
+for nearby in index.nearest(43.3623, -8.4115, k=3):
+    print(nearby.stop.name, f"{nearby.distance:.0f}m", nearby.lines)
+```
+"""
+
+import math
+from typing import Iterable, NamedTuple
+
+from .geometry import EARTH_RADIUS, haversine
+from .models import Line, Stop
+
+
+class NearbyStop(NamedTuple):
+    """
+    A stop found by a `StopIndex` query
+    """
+
+    stop: Stop
+    """
+    The stop
+    """
+
+    distance: float
+    """
+    Distance (in meters) from the queried point to the stop
+    """
+
+    lines: list[Line]
+    """
+    Lines which can be taken on the stop (its `connections`)
+    """
+
+
+class StopIndex:
+    """
+    A uniform grid over the stops' locations, answering nearest-k and within-radius queries without scanning every stop
+    """
+
+    def __init__(self, stops: Iterable[Stop] | dict[int, Stop], cell_size: float = 250):
+        """
+        :param stops: The stops to index, as an iterable or a dict like the `stops` of `get_general_info`. Stops without a `location` are skipped
+
+        :param cell_size: Side (in meters) of the grid cells
+        """
+
+        if isinstance(stops, dict):
+            stops = stops.values()
+
+        self.stops: list[Stop] = [stop for stop in stops if stop.location is not None]
+        """
+        The indexed stops
+        """
+
+        self.cell_size: float = cell_size
+        """
+        Side (in meters) of the grid cells
+        """
+
+        self._lats: list[float] = [stop.location.lat for stop in self.stops]
+        self._longs: list[float] = [stop.location.long for stop in self.stops]
+
+        # Equirectangular projection around the stops, precise enough at city scale
+        self._cos_lat: float = math.cos(
+            math.radians(sum(self._lats) / len(self._lats) if self._lats else 0)
+        )
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for i, (lat, long) in enumerate(zip(self._lats, self._longs)):
+            self._cells.setdefault(self._cell(lat, long), []).append(i)
+
+        xs, ys = zip(*self._cells) if self._cells else ((0,), (0,))
+        self._bounds: tuple[int, int, int, int] = (min(xs), max(xs), min(ys), max(ys))
+
+    @classmethod
+    def from_general_info(
+        cls, general_info: dict, cell_size: float = 250
+    ) -> "StopIndex":
+        """
+        Builds the index from the output of `itranvias_api.queryitr.info.get_general_info`
+        """
+
+        return cls(general_info["stops"], cell_size)
+
+    def nearest(self, lat: float, long: float, k: int = 1) -> list[NearbyStop]:
+        """
+        Find the `k` stops nearest to a point
+
+        :return: A list of at most `k` `NearbyStop`s, nearest first
+        """
+
+        if k <= 0 or not self.stops:
+            return []
+
+        cx, cy = self._cell(lat, long)
+        min_x, max_x, min_y, max_y = self._bounds
+        max_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy)
+        # Far from the city the rings before the one reaching the grid are empty, skip them
+        min_ring = max(min_x - cx, cx - max_x, min_y - cy, cy - max_y, 0)
+
+        found = {}
+        for ring in range(min_ring, max_ring + 1):
+            for i in self._ring(cx, cy, ring):
+                found[i] = haversine(lat, long, self._lats[i], self._longs[i])
+
+            # Any stop not seen yet is at least `ring` cells away
+            if len(found) >= k:
+                best = sorted(found.items(), key=lambda item: item[1])[:k]
+                if best[-1][1] <= ring * self.cell_size:
+                    break
+        else:
+            best = sorted(found.items(), key=lambda item: item[1])[:k]
+
+        return [self._result(i, distance) for i, distance in best]
+
+    def within(self, lat: float, long: float, radius: float) -> list[NearbyStop]:
+        """
+        Find the stops within a distance of a point
+
+        :param radius: The distance (in meters)
+
+        :return: A list of `NearbyStop`s, nearest first
+        """
+
+        cx, cy = self._cell(lat, long)
+        reach = math.ceil(radius / self.cell_size)
+
+        results = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                for i in self._cells.get((x, y), ()):
+                    distance = haversine(lat, long, self._lats[i], self._longs[i])
+                    if distance <= radius:
+                        results.append((i, distance))
+
+        results.sort(key=lambda item: item[1])
+        return [self._result(i, distance) for i, distance in results]
+
+    def nearest_many(
+        self, points: Iterable[tuple[float, float]], k: int = 1
+    ) -> list[list[NearbyStop]]:
+        """
+        `nearest` for many `(lat, long)` points at once
+
+        :return: A list with the result of `nearest` for each point, in the same order
+        """
+
+        return [self.nearest(lat, long, k) for lat, long in points]
+
+    def within_many(
+        self, points: Iterable[tuple[float, float]], radius: float
+    ) -> list[list[NearbyStop]]:
+        """
+        `within` for many `(lat, long)` points at once
+
+        :return: A list with the result of `within` for each point, in the same order
+        """
+
+        return [self.within(lat, long, radius) for lat, long in points]
+
+    def __len__(self) -> int:
+        return len(self.stops)
+
+    def _cell(self, lat: float, long: float) -> tuple[int, int]:
+        meters_per_degree = EARTH_RADIUS * math.pi / 180
+        return (
+            math.floor(long * meters_per_degree * self._cos_lat / self.cell_size),
+            math.floor(lat * meters_per_degree / self.cell_size),
+        )
+
+    def _ring(self, cx: int, cy: int, ring: int) -> Iterable[int]:
+        """
+        Stops in the cells exactly `ring` cells away (Chebyshev distance) from `(cx, cy)`.
+        Only the cells within the grid's bounds are looked at, so a ring costs at most the grid's perimeter however big it is
+        """
+
+        if ring == 0:
+            yield from self._cells.get((cx, cy), ())
+            return
+
+        min_x, max_x, min_y, max_y = self._bounds
+        xs = range(max(cx - ring, min_x), min(cx + ring, max_x) + 1)
+        ys = range(max(cy - ring + 1, min_y), min(cy + ring - 1, max_y) + 1)
+
+        for y in (cy - ring, cy + ring):
+            if min_y <= y <= max_y:
+                for x in xs:
+                    yield from self._cells.get((x, y), ())
+        for x in (cx - ring, cx + ring):
+            if min_x <= x <= max_x:
+                for y in ys:
+                    yield from self._cells.get((x, y), ())
+
+    def _result(self, i: int, distance: float) -> NearbyStop:
+        stop = self.stops[i]
+        return NearbyStop(stop, distance, stop.connections)
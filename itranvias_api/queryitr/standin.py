@@ -0,0 +1,319 @@
+"""
+A local stand-in for `/queryitr_v3.php`, to load-test pollers at realistic concurrency (or run anything with no network) without hammering the real server.
+It answers from recordings (see `itranvias_api.queryitr.transport`) or with `itranvias_api.queryitr.synthetic` responses,
+with configurable latency, server errors and a rate limit that behaves like the real one (a `200` without JSON)
+
+``` bash
+python -m itranvias_api.queryitr.standin --port 8080 --latency 0.08 --jitter 0.04 --error-rate 0.01 --rate-limit 20
+```
+
+Or from Python, e.g. in a test:
+
+``` python
+from itranvias_api.queryitr.queryitr_adapter import QueryItrAdapter
+from itranvias_api.queryitr.standin import StandInServer
+
+with StandInServer(latency=0.05) as server:
+    adapter = QueryItrAdapter(server.url)
+    adapter.get(func=0, dato=523)
+```
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from .synthetic import SyntheticNetwork
+from .transport import MissingRecordingError, ReplayTransport
+
+RATE_LIMITED_BODY: bytes = (
+    b"<html><head><title>iTranvias</title></head>"
+    b"<body>Demasiadas peticiones, espere unos segundos</body></html>"
+)
+"""
+What a rate limited request gets. Like the real server, it is sent with a `200` status
+"""
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    An HTTP server answering `GET /queryitr_v3.php` requests
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        recordings: str | Path = None,
+        seed: int = 0,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        rate_limit: float = None,
+        burst: int = None,
+    ):
+        """
+        :param host: Address to listen on
+
+        :param port: Port to listen on, a free one by default (see `url`)
+
+        :param recordings: Directory of recordings to replay (see `itranvias_api.queryitr.transport.ReplayTransport`, they are looped).
+        Requests without a recording get a synthetic response. Everything is synthetic by default
+
+        :param seed: Seed of the synthetic network and of the random latencies and errors
+
+        :param latency: Seconds every response is delayed
+
+        :param jitter: Maximum extra seconds (uniformly random) every response is delayed
+
+        :param error_rate: Fraction (0 to 1) of the requests that fail with a `500`
+
+        :param rate_limit: Maximum requests per second (per client address) before they start being rate limited, unlimited by default
+
+        :param burst: Number of requests a client can make at once before `rate_limit` applies, `rate_limit` (at least 1) by default
+        """
+
+        super().__init__((host, port), _Handler)
+
+        self.replay: ReplayTransport | None = (
+            ReplayTransport(recordings, loop=True) if recordings is not None else None
+        )
+        """
+        The recordings replayed, if any
+        """
+
+        self.network: SyntheticNetwork = SyntheticNetwork(seed)
+        """
+        The synthetic network answering what isn't recorded
+        """
+
+        self.latency: float = latency
+        """
+        Seconds every response is delayed
+        """
+
+        self.jitter: float = jitter
+        """
+        Maximum extra seconds (uniformly random) every response is delayed
+        """
+
+        self.error_rate: float = error_rate
+        """
+        Fraction (0 to 1) of the requests that fail with a `500`
+        """
+
+        self.rate_limit: float | None = rate_limit
+        """
+        Maximum requests per second per client address, `None` for unlimited
+        """
+
+        self.burst: float = burst or max(rate_limit or 0, 1)
+        """
+        Number of requests a client can make at once before `rate_limit` applies
+        """
+
+        self.stats: dict[str, int] = {
+            "requests": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "replayed": 0,
+            "synthetic": 0,
+        }
+        """
+        Counters of the requests received and how they were answered
+        """
+
+        self._random: random.Random = random.Random(seed)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        """
+        Client address -> `(tokens, last refill)` of its rate limit
+        """
+
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Url of the stand-in `/queryitr_v3.php`, to pass to an adapter
+        """
+
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/queryitr_v3.php"
+
+    def start(self) -> "StandInServer":
+        """
+        Starts serving in a background thread
+        """
+
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops serving and closes the socket
+        """
+
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def answer(self, client: str, params: dict) -> tuple[int, str, bytes]:
+        """
+        What a request gets
+
+        :param client: Address of the client, for the rate limit
+
+        :param params: The query parameters of the request
+
+        :return: `(status, reason, body)`
+        """
+
+        # Only the counters, the rate limit and the random draws need the lock, so concurrent requests are answered in parallel
+        with self._lock:
+            self.stats["requests"] += 1
+
+            if not self._take_token(client):
+                self.stats["rate_limited"] += 1
+                return 200, "OK", RATE_LIMITED_BODY
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, "Internal Server Error", b""
+
+            delay = self.latency + self._random.uniform(0, self.jitter)
+
+        # `ReplayTransport` has its own lock
+        answer = self._replayed(params)
+        replayed = answer is not None
+        if not replayed:
+            try:
+                body = self.network.response(params)
+            except (TypeError, ValueError):
+                body = {"resultado": "ERROR", "error": "Invalid parameters"}
+            answer = 200, "OK", json.dumps(body, ensure_ascii=False).encode()
+
+        with self._lock:
+            self.stats["replayed" if replayed else "synthetic"] += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return answer
+
+    def _replayed(self, params: dict) -> tuple[int, str, bytes] | None:
+        if self.replay is None:
+            return None
+
+        try:
+            response = self.replay.next_response(params)
+        except MissingRecordingError:
+            return None
+
+        return response.status_code, response.reason, response.content
+
+    def _take_token(self, client: str) -> bool:
+        if self.rate_limit is None:
+            return True
+
+        now = time.monotonic()
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate_limit)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return False
+
+        self._buckets[client] = (tokens - 1, now)
+        return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if not url.path.endswith("/queryitr_v3.php"):
+            self.send_error(404)
+            return
+
+        status, reason, body = self.server.answer(
+            self.client_address[0], dict(parse_qsl(url.query))
+        )
+
+        self.send_response(status, reason)
+        content_type = "application/json" if body.startswith(b"{") else "text/html"
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Quiet by default, a load test would flood the terminal
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--recordings", metavar="DIR", help="directory of recordings to replay"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds every response is delayed"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="maximum extra random delay"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="fraction of requests that get a 500",
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, help="maximum requests per second per client"
+    )
+    parser.add_argument("--burst", type=int)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        args.host,
+        args.port,
+        recordings=args.recordings,
+        seed=args.seed,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+    )
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,58 @@
 from . import _queryitr_adapter
 from .models import Stop, Line, Bus
+from .concurrency import fan_out
 
+from typing import Iterable, Iterator
 
-def get_stop_buses(stop_id: int) -> dict[int, list[Bus]]:
+
+def get_stop_buses(stop_id: int, priority: float = 0) -> dict[int, list[Bus]]:
     """
     Fetch information about a stop, including real-time info about buses
 
     :param stop_id: The id of the stop to consult
 
+    :param priority: Urgency of the request if the adapter has a `scheduler`, lower goes first. See `itranvias_api.queryitr.scheduler.stop_priority`
+
     :return: A dictionary with keys the line ids that go trough that stop, each having a list of `Bus`es
     """
 
-    response = _queryitr_adapter.get(func=0, dato=stop_id)
-    data = response.data
+    response = _queryitr_adapter.get(func=0, dato=stop_id, priority=priority)
+
+    return _queryitr_adapter.build(0, _parse_stop_buses, response.data)
+
+
+def get_many_stop_buses(
+    stop_ids: Iterable[int],
+    max_concurrency: int = 8,
+    priorities: dict[int, float] = None,
+) -> Iterator[tuple[int, dict[int, list[Bus]] | Exception]]:
+    """
+    Calls `get_stop_buses` for many stops in parallel
+
+    :param stop_ids: The ids of the stops to consult
+
+    :param max_concurrency: Maximum number of requests running at the same time
+
+    :param priorities: Priority of each stop (`0` when missing), the most urgent stops are requested first
+
+    :return: An iterator of `(stop_id, buses)` tuples, in completion order, where `buses` is what `get_stop_buses` returns for that stop,
+    or the exception it raised (so one failure doesn't abort the whole batch)
+    """
+
+    if priorities is None:
+        return fan_out(get_stop_buses, stop_ids, max_concurrency)
+
+    return fan_out(
+        lambda stop_id: get_stop_buses(stop_id, priorities.get(stop_id, 0)),
+        sorted(stop_ids, key=lambda stop_id: priorities.get(stop_id, 0)),
+        max_concurrency,
+    )
+
+
+def _parse_stop_buses(data: dict) -> dict[int, list[Bus]]:
+    """
+    Parses the data of a `func=0` response, see `get_stop_buses`
+    """
 
     lines = {}
     for line in data["buses"].get("lineas", []):
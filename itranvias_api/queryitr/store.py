@@ -0,0 +1,497 @@
+"""
+Persistent, incremental store of the general/"static" info (lines, stops, fares and news) returned by `itranvias_api.queryitr.info.get_general_info`
+
+It keeps the last snapshot in a [SQLite](https://sqlite.org) database, so only what changed since the last refresh is downloaded:
+
+``` python
+from itranvias_api.queryitr.store import StaticDataStore
+
+store = StaticDataStore("itranvias.sqlite")
+store.refresh()  # The first time downloads everything, later only the deltas
+
+print(store.get_stop(523).name)
+print(store.get_lines_for_stop(523))
+```
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from . import info
+from .models import Line, Route, Stop, NewsMessage, Fare
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS stops (id INTEGER PRIMARY KEY, name TEXT, lat REAL, long REAL);
+CREATE TABLE IF NOT EXISTS stop_connections (
+    stop_id INTEGER, line_id INTEGER, PRIMARY KEY (stop_id, line_id)
+);
+CREATE INDEX IF NOT EXISTS stop_connections_line ON stop_connections (line_id);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY, name TEXT, origin TEXT, destination TEXT, color TEXT
+);
+CREATE TABLE IF NOT EXISTS routes (
+    line_id INTEGER, route_id INTEGER, origin TEXT, destination TEXT,
+    PRIMARY KEY (line_id, route_id)
+);
+CREATE TABLE IF NOT EXISTS route_stops (
+    line_id INTEGER, route_id INTEGER, position INTEGER, stop_id INTEGER,
+    PRIMARY KEY (line_id, route_id, position)
+);
+CREATE INDEX IF NOT EXISTS route_stops_stop ON route_stops (stop_id);
+CREATE TABLE IF NOT EXISTS fares (position INTEGER PRIMARY KEY, name TEXT, price REAL);
+CREATE TABLE IF NOT EXISTS observations (position INTEGER PRIMARY KEY, text TEXT);
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY, date TEXT, version TEXT, title TEXT, text TEXT
+);
+"""
+
+_FIRST_DATE = datetime(2016, 1, 1)
+"""
+Date used when nothing has been downloaded yet, same as the defaults of `get_general_info`
+"""
+
+
+class StaticDataStore:
+    """
+    A SQLite backed store of the general/"static" info, refreshed incrementally from `get_general_info`.
+    It can be shared between threads
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike = ":memory:",
+        language: str = "en",
+    ):
+        self.path: str | os.PathLike = path
+        """
+        Path of the SQLite database, `:memory:` (the default) keeps it in memory only
+        """
+
+        self.language: str = language
+        """
+        The language to receive the information in. If it doesn't match the one of the stored data, the next refresh downloads everything again
+        """
+
+        self._lock: threading.RLock = threading.RLock()
+        self._db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    @property
+    def last_update(self) -> datetime | None:
+        """
+        The last time the data (not including news) was updated on the server, as of the last refresh. `None` if the store is empty
+        """
+
+        return self._get_date("last_update")
+
+    @property
+    def last_refresh(self) -> datetime | None:
+        """
+        The (local) time of the last successful refresh. `None` if it was never refreshed
+        """
+
+        return self._get_date("last_refresh")
+
+    def refresh(self) -> dict:
+        """
+        Asks the server for the changes since the last refresh and merges them into the store
+
+        :return: What `get_general_info` returned, i.e. only the changes (`last_update` is `None` if there weren't any)
+        """
+
+        with self._lock:
+            if self._get_meta("language") != self.language:
+                self.clear()
+
+            last_message_id, last_message_date = self._db.execute(
+                "SELECT MAX(id), MAX(date) FROM news"
+            ).fetchone()
+            delta = info.get_general_info(
+                last_request_date=self.last_update or _FIRST_DATE,
+                last_message_id=last_message_id or 0,
+                last_message_date=(
+                    datetime.fromisoformat(last_message_date)
+                    if last_message_date
+                    else _FIRST_DATE
+                ),
+                language=self.language,
+            )
+
+            self.merge(delta)
+            with self._db:
+                self._set_meta("language", self.language)
+                self._set_meta("last_refresh", datetime.now().isoformat())
+
+        return delta
+
+    def merge(self, general_info: dict) -> None:
+        """
+        Merges the output of `get_general_info` into the store. Stops, lines and news replace the stored ones with the same id
+
+        :param general_info: A dict as returned by `itranvias_api.queryitr.info.get_general_info`
+        """
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO news VALUES (?, ?, ?, ?, ?)",
+                (
+                    (m.id, m.date.isoformat(), m.version, m.title, m.text)
+                    for m in general_info["news"]
+                ),
+            )
+
+            if general_info["last_update"] is None:
+                return
+
+            for stop in general_info["stops"].values():
+                self._db.execute(
+                    "INSERT OR REPLACE INTO stops VALUES (?, ?, ?, ?)",
+                    (
+                        stop.id,
+                        stop.name,
+                        stop.location.lat if stop.location else None,
+                        stop.location.long if stop.location else None,
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM stop_connections WHERE stop_id = ?", (stop.id,)
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO stop_connections VALUES (?, ?)",
+                    ((stop.id, line.id) for line in stop.connections),
+                )
+
+            for line in general_info["lines"].values():
+                self._db.execute(
+                    "INSERT OR REPLACE INTO lines VALUES (?, ?, ?, ?, ?)",
+                    (
+                        line.id,
+                        line.name,
+                        line.origin.name if line.origin else None,
+                        line.destination.name if line.destination else None,
+                        line.color,
+                    ),
+                )
+                self._db.execute("DELETE FROM routes WHERE line_id = ?", (line.id,))
+                self._db.execute(
+                    "DELETE FROM route_stops WHERE line_id = ?", (line.id,)
+                )
+                for route in line.routes.values():
+                    self._db.execute(
+                        "INSERT INTO routes VALUES (?, ?, ?, ?)",
+                        (
+                            line.id,
+                            route.id,
+                            route.origin.name if route.origin else None,
+                            route.destination.name if route.destination else None,
+                        ),
+                    )
+                    self._db.executemany(
+                        "INSERT INTO route_stops VALUES (?, ?, ?, ?)",
+                        (
+                            (line.id, route.id, position, stop.id)
+                            for position, stop in enumerate(route.stops)
+                        ),
+                    )
+
+            if general_info["prices"]["fares"]:
+                self._db.execute("DELETE FROM fares")
+                self._db.executemany(
+                    "INSERT INTO fares VALUES (?, ?, ?)",
+                    (
+                        (position, fare.name, fare.price)
+                        for position, fare in enumerate(general_info["prices"]["fares"])
+                    ),
+                )
+            observations = general_info["prices"]["observations"]
+            if isinstance(observations, str):
+                # A single observation, not to be stored a character per row
+                observations = [observations]
+            if observations:
+                self._db.execute("DELETE FROM observations")
+                self._db.executemany(
+                    "INSERT INTO observations VALUES (?, ?)", enumerate(observations)
+                )
+
+            self._set_meta("last_update", general_info["last_update"].isoformat())
+
+    def clear(self) -> None:
+        """
+        Removes all the stored data
+        """
+
+        with self._lock, self._db:
+            for table in (
+                "meta",
+                "stops",
+                "stop_connections",
+                "lines",
+                "routes",
+                "route_stops",
+                "fares",
+                "observations",
+                "news",
+            ):
+                self._db.execute(f"DELETE FROM {table}")
+
+    def close(self) -> None:
+        """
+        Closes the database
+        """
+
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "StaticDataStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_stop(self, stop_id: int) -> Stop | None:
+        """
+        Get a stop (`id`, `name`, `location` and `connections`)
+
+        :param stop_id: The id of the stop
+
+        :return: The `Stop`, or `None` if it isn't in the store
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, name, lat, long FROM stops WHERE id = ?", (stop_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            return self._build_stop(row, self._stop_connections(stop_id))
+
+    def get_stops(self) -> dict[int, Stop]:
+        """
+        Get all the stops
+
+        :return: A dict of `Stop`s with keys the stop ids, like the `stops` of `get_general_info`
+        """
+
+        with self._lock:
+            connections = {}
+            for stop_id, line_id in self._db.execute(
+                "SELECT stop_id, line_id FROM stop_connections"
+            ):
+                connections.setdefault(stop_id, []).append(Line(id=line_id))
+
+            return {
+                row[0]: self._build_stop(row, connections.get(row[0], []))
+                for row in self._db.execute("SELECT id, name, lat, long FROM stops")
+            }
+
+    def get_line(self, line_id: int) -> Line | None:
+        """
+        Get a line, with all of its routes
+
+        :param line_id: The id of the line
+
+        :return: The `Line`, or `None` if it isn't in the store
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, name, origin, destination, color FROM lines WHERE id = ?",
+                (line_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            return self._build_line(row)
+
+    def get_lines(self) -> dict[int, Line]:
+        """
+        Get all the lines
+
+        :return: A dict of `Line`s with keys the line ids, like the `lines` of `get_general_info`
+        """
+
+        with self._lock:
+            return {
+                row[0]: self._build_line(row)
+                for row in self._db.execute(
+                    "SELECT id, name, origin, destination, color FROM lines"
+                ).fetchall()
+            }
+
+    def get_route(self, line_id: int, route_id: int) -> Route | None:
+        """
+        Get a route of a line, with its (ordered) stops
+
+        :param line_id: The id of the line
+
+        :param route_id: The id of the route (usually 0 outbound/ida, 1 return/vuelta)
+
+        :return: The `Route`, or `None` if it isn't in the store
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT route_id, origin, destination FROM routes WHERE line_id = ? AND route_id = ?",
+                (line_id, route_id),
+            ).fetchone()
+            if row is None:
+                return None
+
+            return self._build_route(line_id, row)
+
+    def get_lines_for_stop(self, stop_id: int) -> list[Line]:
+        """
+        Get the lines which can be taken on a stop
+
+        :param stop_id: The id of the stop
+
+        :return: A list of `Line`s (only with their `id`, `name` and `color`)
+        """
+
+        with self._lock:
+            return [
+                Line(id=line_id, name=name, color=color)
+                for line_id, name, color in self._db.execute(
+                    "SELECT c.line_id, l.name, l.color FROM stop_connections c"
+                    " LEFT JOIN lines l ON l.id = c.line_id WHERE c.stop_id = ?"
+                    " ORDER BY c.line_id",
+                    (stop_id,),
+                )
+            ]
+
+    def get_routes_for_stop(self, stop_id: int) -> list[tuple[int, int, int]]:
+        """
+        Get the routes going through a stop
+
+        :param stop_id: The id of the stop
+
+        :return: A list of `(line_id, route_id, position)` tuples, where `position` is the index of the stop in the route's stops
+        """
+
+        with self._lock:
+            return self._db.execute(
+                "SELECT line_id, route_id, position FROM route_stops WHERE stop_id = ?"
+                " ORDER BY line_id, route_id, position",
+                (stop_id,),
+            ).fetchall()
+
+    def get_news(self) -> list[NewsMessage]:
+        """
+        Get all the stored news messages, oldest first
+        """
+
+        with self._lock:
+            return [
+                NewsMessage(
+                    id=message_id,
+                    date=datetime.fromisoformat(date),
+                    version=version,
+                    title=title,
+                    text=text,
+                )
+                for message_id, date, version, title, text in self._db.execute(
+                    "SELECT id, date, version, title, text FROM news ORDER BY date, id"
+                )
+            ]
+
+    def get_prices(self) -> dict:
+        """
+        :return: A dict with two keys, like the `prices` of `get_general_info`:
+        - `fares`: A list of `itranvias_api.queryitr.models.Fare`s
+        - `observations`: A list of strings with some observations about the pricing
+        """
+
+        with self._lock:
+            return {
+                "fares": [
+                    Fare(name=name, price=price)
+                    for name, price in self._db.execute(
+                        "SELECT name, price FROM fares ORDER BY position"
+                    )
+                ],
+                "observations": [
+                    text
+                    for (text,) in self._db.execute(
+                        "SELECT text FROM observations ORDER BY position"
+                    )
+                ],
+            }
+
+    def as_general_info(self) -> dict:
+        """
+        :return: The whole store, in the same format `get_general_info` uses
+        """
+
+        with self._lock:
+            return {
+                "news": self.get_news(),
+                "last_update": self.last_update,
+                "lines": self.get_lines(),
+                "stops": self.get_stops(),
+                "prices": self.get_prices(),
+            }
+
+    def _stop_connections(self, stop_id: int) -> list[Line]:
+        return [
+            Line(id=line_id)
+            for (line_id,) in self._db.execute(
+                "SELECT line_id FROM stop_connections WHERE stop_id = ? ORDER BY line_id",
+                (stop_id,),
+            )
+        ]
+
+    @staticmethod
+    def _build_stop(row: tuple, connections: list[Line]) -> Stop:
+        stop_id, name, lat, long = row
+        return Stop(id=stop_id, name=name, lat=lat, long=long, connections=connections)
+
+    def _build_route(self, line_id: int, row: tuple) -> Route:
+        route_id, origin, destination = row
+        return Route(
+            id=route_id,
+            origin=Stop(name=origin),
+            destination=Stop(name=destination),
+            stops=[
+                Stop(id=stop_id)
+                for (stop_id,) in self._db.execute(
+                    "SELECT stop_id FROM route_stops WHERE line_id = ? AND route_id = ? ORDER BY position",
+                    (line_id, route_id),
+                )
+            ],
+        )
+
+    def _build_line(self, row: tuple) -> Line:
+        line_id, name, origin, destination, color = row
+        return Line(
+            id=line_id,
+            name=name,
+            origin=Stop(name=origin),
+            destination=Stop(name=destination),
+            color=color,
+            routes={
+                route_row[0]: self._build_route(line_id, route_row)
+                for route_row in self._db.execute(
+                    "SELECT route_id, origin, destination FROM routes WHERE line_id = ? ORDER BY route_id",
+                    (line_id,),
+                ).fetchall()
+            },
+        )
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def _get_date(self, key: str) -> datetime | None:
+        with self._lock:
+            value = self._get_meta(key)
+        return datetime.fromisoformat(value) if value else None
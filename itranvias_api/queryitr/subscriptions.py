@@ -0,0 +1,371 @@
+"""
+Change streams for stops and lines: subscribe to them and get an event every time a bus appears, changes its ETA, reaches a stop or leaves
+
+The events are computed by diffing successive `itranvias_api.queryitr.stops.get_stop_buses` / `itranvias_api.queryitr.lines.get_line_buses` results
+(keyed by `Bus.id`), so unchanged data produces no events. Every stop or line is polled once per interval no matter how many subscribers it has
+
+``` python
+from itranvias_api.queryitr.subscriptions import subscribe
+
+for event in subscribe(stops=[523], lines=[1100]):
+    print(event.kind, event.target, event.target_id, event.bus)
+```
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, NamedTuple
+
+from .models import Bus, Route
+from .concurrency import fan_out
+
+APPEARED = "appeared"
+"""
+A bus that wasn't there before: it is now coming to the stop, or giving service in the line
+"""
+
+ETA_CHANGED = "eta_changed"
+"""
+The time, distance or state of a bus coming to the stop changed
+"""
+
+REACHED_STOP = "reached_stop"
+"""
+The bus reached the stop (for stops), or a new stop of the line (for lines, its `last_stop` changed or it stopped)
+"""
+
+LEFT = "left"
+"""
+The bus is no longer coming to the stop without having reached it (for stops), or no longer giving service in the line (for lines)
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+class ChangeEvent(NamedTuple):
+    """
+    A change in a stop or a line
+    """
+
+    kind: str
+    """
+    What happened, one of `APPEARED`, `ETA_CHANGED`, `REACHED_STOP` or `LEFT`
+    """
+
+    target: str
+    """
+    What changed, `stop` or `line`
+    """
+
+    target_id: int
+    """
+    Id of the stop or line that changed
+    """
+
+    line_id: int
+    """
+    Id of the line of the bus
+    """
+
+    route_id: int | None
+    """
+    Id of the route of the bus, only known for lines
+    """
+
+    bus: Bus
+    """
+    The bus, as it is now (as it last was for `LEFT` and stops' `REACHED_STOP`)
+    """
+
+    previous: Bus | None
+    """
+    The bus as it was in the previous poll, `None` for `APPEARED`
+    """
+
+
+def _arriving(bus: Bus) -> bool:
+    """
+    Wether the bus was less than a minute away from the stop
+    """
+
+    return str(bus.time).startswith("<") or str(bus.time) == "0"
+
+
+def diff_stop_buses(
+    stop_id: int,
+    previous: dict[int, list[Bus]],
+    current: dict[int, list[Bus]],
+) -> list[ChangeEvent]:
+    """
+    Compares two results of `itranvias_api.queryitr.stops.get_stop_buses` for the same stop
+
+    :return: The events that happened between them, empty if nothing changed
+    """
+
+    before = {
+        bus.id: (line_id, bus) for line_id, buses in previous.items() for bus in buses
+    }
+    now = {
+        bus.id: (line_id, bus) for line_id, buses in current.items() for bus in buses
+    }
+
+    events = []
+    for bus_id, (line_id, bus) in now.items():
+        old = before.get(bus_id)
+        if old is None:
+            events.append(
+                ChangeEvent(APPEARED, "stop", stop_id, line_id, None, bus, None)
+            )
+        elif (bus.time, bus.distance, bus.state) != (
+            old[1].time,
+            old[1].distance,
+            old[1].state,
+        ):
+            events.append(
+                ChangeEvent(ETA_CHANGED, "stop", stop_id, line_id, None, bus, old[1])
+            )
+
+    for bus_id, (line_id, bus) in before.items():
+        if bus_id not in now:
+            kind = REACHED_STOP if _arriving(bus) else LEFT
+            events.append(ChangeEvent(kind, "stop", stop_id, line_id, None, bus, bus))
+
+    return events
+
+
+def diff_line_buses(
+    line_id: int, previous: dict[int, Route], current: dict[int, Route]
+) -> list[ChangeEvent]:
+    """
+    Compares two results of `itranvias_api.queryitr.lines.get_line_buses` for the same line
+
+    :return: The events that happened between them, empty if nothing changed
+    """
+
+    def _by_id(routes: dict[int, Route]) -> dict[int, tuple[int, Bus]]:
+        return {
+            bus.id: (route_id, bus)
+            for route_id, route in routes.items()
+            for buses in route.buses.values()
+            for bus in buses
+        }
+
+    before = _by_id(previous)
+    now = _by_id(current)
+
+    events = []
+    for bus_id, (route_id, bus) in now.items():
+        old = before.get(bus_id)
+        if old is None:
+            events.append(
+                ChangeEvent(APPEARED, "line", line_id, line_id, route_id, bus, None)
+            )
+        elif (
+            route_id != old[0]
+            or bus.last_stop != old[1].last_stop
+            or (bus.at_stop and not old[1].at_stop)
+        ):
+            events.append(
+                ChangeEvent(
+                    REACHED_STOP, "line", line_id, line_id, route_id, bus, old[1]
+                )
+            )
+
+    for bus_id, (route_id, bus) in before.items():
+        if bus_id not in now:
+            events.append(
+                ChangeEvent(LEFT, "line", line_id, line_id, route_id, bus, bus)
+            )
+
+    return events
+
+
+def _diff(key: tuple[str, int], previous: dict, current: dict) -> list[ChangeEvent]:
+    target, target_id = key
+    if target == "stop":
+        return diff_stop_buses(target_id, previous, current)
+    return diff_line_buses(target_id, previous, current)
+
+
+def _keys(stops: Iterable[int], lines: Iterable[int]) -> list[tuple[str, int]]:
+    return [("stop", stop_id) for stop_id in stops] + [
+        ("line", line_id) for line_id in lines
+    ]
+
+
+class _Target:
+    """
+    A polled stop or line: its last result and the queues of its subscribers
+    """
+
+    __slots__ = ("state", "subscribers")
+
+    def __init__(self):
+        self.state: dict = None
+        self.subscribers: list = []
+
+
+class _Hub:
+    """
+    What the blocking and the async hubs share: the targets, their subscribers and the diffing
+    """
+
+    def __init__(self, interval: float = 15, max_concurrency: int = 8):
+        self.interval: float = interval
+        """
+        Seconds between polls of the targets
+        """
+
+        self.max_concurrency: int = max_concurrency
+        """
+        Maximum number of requests running at the same time in a poll
+        """
+
+        self.polls: int = 0
+        """
+        Number of requests made, one per target per interval however many subscribers it has
+        """
+
+        self._targets: dict[tuple[str, int], _Target] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _add(self, keys: list[tuple[str, int]], subscriber) -> None:
+        """
+        Registers a subscriber queue, which gets the current state of targets that are already being polled as `APPEARED` events
+        """
+
+        with self._lock:
+            for key in keys:
+                target = self._targets.setdefault(key, _Target())
+                target.subscribers.append(subscriber)
+                if target.state is not None:
+                    for event in _diff(key, {}, target.state):
+                        subscriber.put_nowait(event)
+
+    def _remove(self, keys: list[tuple[str, int]], subscriber) -> None:
+        with self._lock:
+            for key in keys:
+                target = self._targets.get(key)
+                if target is None:
+                    continue
+                target.subscribers.remove(subscriber)
+                if not target.subscribers:
+                    # Nobody is listening, stop polling it
+                    del self._targets[key]
+
+    def _active_keys(self) -> list[tuple[str, int]]:
+        with self._lock:
+            return list(self._targets)
+
+    def _update(self, key: tuple[str, int], result: dict | Exception) -> None:
+        """
+        Diffs a new result of a target against the previous one and sends the events to its subscribers
+        """
+
+        self.polls += 1
+        if isinstance(result, Exception):
+            # Keep the previous state, the next poll will tell what changed
+            _logger.warning("Polling %s %s failed: %s", *key, result)
+            return
+
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:  # Unsubscribed during the poll
+                return
+
+            events = _diff(key, target.state or {}, result)
+            target.state = result
+            for subscriber in target.subscribers:
+                for event in events:
+                    subscriber.put_nowait(event)
+
+
+class SubscriptionHub(_Hub):
+    """
+    Polls the subscribed stops and lines from a background thread, sharing every poll between all their subscribers
+    """
+
+    def __init__(self, interval: float = 15, max_concurrency: int = 8):
+        """
+        :param interval: Seconds between polls of the targets
+
+        :param max_concurrency: Maximum number of requests running at the same time in a poll
+        """
+
+        super().__init__(interval, max_concurrency)
+        self._thread: threading.Thread = None
+
+    def subscribe(
+        self, stops: Iterable[int] = (), lines: Iterable[int] = ()
+    ) -> Iterator[ChangeEvent]:
+        """
+        Subscribe to changes in stops and lines. The subscription ends when the generator is closed (or garbage collected)
+
+        :param stops: Ids of the stops to watch
+
+        :param lines: Ids of the lines to watch
+
+        :return: A generator of `ChangeEvent`s, which blocks until there is a new one
+        """
+
+        keys = _keys(stops, lines)
+        subscriber = queue.SimpleQueue()
+        self._add(keys, subscriber)
+        self._ensure_polling()
+        try:
+            while True:
+                yield subscriber.get()
+        finally:
+            self._remove(keys, subscriber)
+
+    def _ensure_polling(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._poll_loop, name="itranvias-subscriptions", daemon=True
+                )
+                self._thread.start()
+
+    def _fetch(self, key: tuple[str, int]) -> dict:
+        from . import lines, stops
+
+        target, target_id = key
+        if target == "stop":
+            return stops.get_stop_buses(target_id)
+        return lines.get_line_buses(target_id)
+
+    def _poll_loop(self) -> None:
+        while True:
+            keys = self._active_keys()
+            if not keys:
+                with self._lock:
+                    # Checked again holding the lock so a new subscriber doesn't find a dying thread
+                    if not self._targets:
+                        self._thread = None
+                        return
+                continue
+
+            for key, result in fan_out(self._fetch, keys, self.max_concurrency):
+                self._update(key, result)
+
+            time.sleep(self.interval)
+
+
+_default_hub: SubscriptionHub = None
+
+
+def subscribe(
+    stops: Iterable[int] = (), lines: Iterable[int] = ()
+) -> Iterator[ChangeEvent]:
+    """
+    `SubscriptionHub.subscribe` on a hub shared by the whole program, polling every 15 seconds
+    """
+
+    global _default_hub
+
+    if _default_hub is None:
+        _default_hub = SubscriptionHub()
+
+    return _default_hub.subscribe(stops, lines)
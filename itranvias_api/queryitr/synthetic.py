@@ -0,0 +1,324 @@
+"""
+Synthetic `/queryitr_v3.php` responses: a made up network (stops scattered around A Coruña and lines going through them) answering every `func`
+with bodies of the same shape and about the same size as the real ones.
+
+It is what `itranvias_api.queryitr.standin` serves when it has no recordings, and what the offline benchmarks are run on
+
+``` python
+from itranvias_api.queryitr.synthetic import SyntheticNetwork
+
+network = SyntheticNetwork(seed=0)
+body = network.response({"func": 0, "dato": 523})
+```
+"""
+
+import json
+import random
+
+
+def _header(func: int) -> dict:
+    return {
+        "resultado": "OK",
+        "fecha_peticion": "20240521123456",
+        "peticion": f"func={func}",
+        "tamaño": 0,  # Filled in by `SyntheticNetwork.response`
+        "Origen": "Web_Beta",
+    }
+
+
+class SyntheticNetwork:
+    """
+    A made up network. Its stops, lines and routes are fixed by the `seed`, the buses are random on every call
+    """
+
+    def __init__(self, seed: int = 0, n_stops: int = 1100, n_lines: int = 24):
+        """
+        :param seed: Seed of the random generator, the same seed gives the same network (and the same sequence of responses)
+
+        :param n_stops: Number of stops, their ids go from 1 to `n_stops`
+
+        :param n_lines: Number of lines, their ids are 100, 200, 300...
+        """
+
+        self.random: random.Random = random.Random(seed)
+        """
+        The random generator used for everything
+        """
+
+        self.stops: dict[int, tuple[float, float]] = {
+            stop_id: self._location() for stop_id in range(1, n_stops + 1)
+        }
+        """
+        Stop id -> `(lat, long)`
+        """
+
+        self.lines: list[int] = [100 * i for i in range(1, n_lines + 1)]
+        """
+        Ids of the lines
+        """
+
+        self.routes: dict[int, dict[int, list[int]]] = {
+            line_id: {
+                route_id: self.random.sample(
+                    sorted(self.stops), self.random.randint(25, 45)
+                )
+                for route_id in (0, 1)
+            }
+            for line_id in self.lines
+        }
+        """
+        Line id -> route id -> ids of its stops
+        """
+
+    def response(self, params: dict) -> dict:
+        """
+        Body of the response to a request, with its `tamaño` (size in bytes, as encoded by the stand-in) set like the real server does
+
+        :param params: The query parameters of the request (`func`, `dato`, `mostrar`...), as strings or numbers
+        """
+
+        func = int(params.get("func", -1))
+        dato = params.get("dato")
+
+        if func == 0:
+            body = self.stop_buses(int(dato))
+        elif func == 1:
+            body = self.all_lines()
+        elif func == 2:
+            body = self.line_buses(int(dato))
+        elif func == 7:
+            body = self.general_info()
+        elif func == 99:
+            body = self.line_maps(int(dato), params.get("mostrar", "PRB"))
+        else:
+            body = _header(func) | {"resultado": "ERROR", "error": "Unknown func"}
+
+        # The size counts its own digits, a second pass settles it
+        for _ in range(2):
+            body["tamaño"] = len(json.dumps(body, ensure_ascii=False).encode())
+        return body
+
+    def stop_buses(self, stop_id: int) -> dict:
+        """
+        `func=0` response
+        """
+
+        r = self.random
+        return _header(0) | {
+            "buses": {
+                "parada": stop_id,
+                "lineas": [
+                    {
+                        "linea": line_id,
+                        "buses": [
+                            {
+                                "bus": self._bus_id(),
+                                "tiempo": r.choice(["<1", *map(str, range(1, 40))]),
+                                "distancia": r.randint(0, 8000),
+                                "estado": r.choice((0, 1)),
+                                "ult_parada": r.choice(list(self.stops)),
+                            }
+                            for _ in range(r.randint(1, 3))
+                        ],
+                    }
+                    for line_id in r.sample(self.lines, min(5, len(self.lines)))
+                ],
+            }
+        }
+
+    def all_lines(self) -> dict:
+        """
+        `func=1` response
+        """
+
+        return _header(1) | {
+            "lineas": [
+                {
+                    "id": str(line_id),
+                    "nom_comer": str(line_id // 100),
+                    "color_linea": self._color(),
+                    "orig_linea": f"Origin {line_id}",
+                    "dest_linea": f"Destination {line_id}",
+                }
+                for line_id in self.lines
+            ]
+        }
+
+    def line_buses(self, line_id: int) -> dict:
+        """
+        `func=2` response
+        """
+
+        r = self.random
+        return _header(2) | {
+            "paradas": [
+                {
+                    "sentido": route_id,
+                    "paradas": [
+                        {
+                            "parada": stop_id,
+                            "buses": [
+                                {
+                                    "bus": self._bus_id(),
+                                    "estado": r.choice((0, 1)),
+                                    "distancia": round(r.random(), 3),
+                                }
+                            ]
+                            * (r.random() < 0.15),
+                        }
+                        for stop_id in stops
+                    ],
+                }
+                for route_id, stops in self.routes.get(line_id, {}).items()
+            ]
+        }
+
+    def general_info(self) -> dict:
+        """
+        `func=7` response, with the full catalogue
+        """
+
+        stop_lines = {}
+        for line_id, routes in self.routes.items():
+            for stops in routes.values():
+                for stop_id in stops:
+                    stop_lines.setdefault(stop_id, set()).add(line_id)
+
+        return _header(7) | {
+            "iTranvias": {
+                "novedades": [
+                    {
+                        "id": i,
+                        "fecha": "20240501T000000",
+                        "version": 1,
+                        "titulo": f"News {i}",
+                        "texto": "Lorem ipsum dolor sit amet. " * 20,
+                    }
+                    for i in range(10)
+                ],
+                "actualizacion": {
+                    "fecha": "20240521T000000",
+                    "paradas": [
+                        {
+                            "id": stop_id,
+                            "nombre": f"Stop {stop_id}",
+                            "posx": lat,
+                            "posy": long,
+                            "enlaces": sorted(stop_lines.get(stop_id, ())),
+                        }
+                        for stop_id, (lat, long) in self.stops.items()
+                    ],
+                    "lineas": [
+                        {
+                            "id": line_id,
+                            "lin_comer": str(line_id // 100),
+                            "nombre_orig": f"Origin {line_id}",
+                            "nombre_dest": f"Destination {line_id}",
+                            "color": self._color(),
+                            "rutas": [
+                                {
+                                    "ruta": line_id * 100 + route_id,
+                                    "nombre_orig": f"Origin {line_id}",
+                                    "nombre_dest": f"Destination {line_id}",
+                                    "paradas": stops,
+                                }
+                                for route_id, stops in routes.items()
+                            ],
+                        }
+                        for line_id, routes in self.routes.items()
+                    ],
+                    "precios": {
+                        "tarifas": [
+                            {"tarifa": name, "precio": price}
+                            for name, price in (
+                                ("Ordinaria", 1.3),
+                                ("Tarjeta Millennium", 0.85),
+                                ("Transbordo", 0),
+                            )
+                        ],
+                        "observaciones": [
+                            "Transbordo gratuito en los 45 minutos siguientes.",
+                            "Menores de 4 años viajan gratis.",
+                        ],
+                    },
+                },
+            }
+        }
+
+    def line_maps(self, line_id: int, show: str = "PRB") -> dict:
+        """
+        `func=99` response, with the maps in `show` (see `itranvias_api.queryitr.lines.get_line_maps`)
+        """
+
+        maps = []
+        routes = self.routes.get(line_id, {})
+
+        if "P" in show:
+            maps.append(
+                {
+                    "paradas": [
+                        {
+                            "sentido": route_id,
+                            "paradas": [
+                                {
+                                    "id": stop_id,
+                                    "parada": f"Stop {stop_id}",
+                                    "posx": self.stops[stop_id][0],
+                                    "posy": self.stops[stop_id][1],
+                                }
+                                for stop_id in stops
+                            ],
+                        }
+                        for route_id, stops in routes.items()
+                    ]
+                }
+            )
+
+        if "R" in show:
+            maps.append(
+                {
+                    "recorridos": [
+                        {
+                            "sentido": route_id,
+                            "recorrido": " ".join(
+                                "{},{},0".format(*self._location()) for _ in range(1500)
+                            ),
+                        }
+                        for route_id in routes
+                    ]
+                }
+            )
+
+        if "B" in show:
+            maps.append(
+                {
+                    "buses": [
+                        {
+                            "sentido": route_id,
+                            "buses": [
+                                {
+                                    "bus": self._bus_id(),
+                                    "posx": location[0],
+                                    "posy": location[1],
+                                }
+                                for location in (self._location() for _ in range(4))
+                            ],
+                        }
+                        for route_id in routes
+                    ]
+                }
+            )
+
+        return _header(99) | {"mapas": maps}
+
+    def _location(self) -> tuple[float, float]:
+        return (
+            round(43.33 + self.random.random() * 0.06, 6),
+            round(-8.46 + self.random.random() * 0.1, 6),
+        )
+
+    def _bus_id(self) -> int:
+        return self.random.randint(3000, 4000)
+
+    def _color(self) -> str:
+        return f"{self.random.randrange(0x1000000):06x}"
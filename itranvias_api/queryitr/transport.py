@@ -0,0 +1,276 @@
+"""
+Transports: what `itranvias_api.queryitr.queryitr_adapter.QueryItrAdapter` actually sends its requests through.
+By default it is the adapter's own `requests` session, but the responses can also be recorded to disk and replayed later, deterministically and with no network
+
+``` python
+import itranvias_api.queryitr as api
+from itranvias_api.queryitr.transport import RecordingTransport, ReplayTransport
+
+# Record the real responses...
+api._queryitr_adapter.transport = RecordingTransport("recordings/")
+api.stops.get_stop_buses(523)
+
+# ...and replay them
+api._queryitr_adapter.transport = ReplayTransport("recordings/")
+api.stops.get_stop_buses(523)
+```
+
+Recordings are directories with a JSON file per request (`func=0&dato=523.json`), holding the list of its responses in the order they were received.
+They can also be served over HTTP by `itranvias_api.queryitr.standin`
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol
+
+if TYPE_CHECKING:
+    import requests
+
+    from .queryitr_adapter import QueryItrAdapter
+
+
+class Transport(Protocol):
+    """
+    Sends a request of an adapter
+    """
+
+    def get(
+        self,
+        adapter: "QueryItrAdapter",
+        params: dict,
+        headers: dict,
+        timeout: float | tuple[float, float],
+    ) -> "requests.Response | RecordedResponse":
+        """
+        Sends a GET request to `adapter.url`
+
+        :return: The response, anything with the `status_code`, `reason` and `content` of a `requests.Response`.
+        Reading `content` is timed as the download phase (see `itranvias_api.queryitr.metrics`)
+        """
+
+
+class SessionTransport:
+    """
+    The default transport: the adapter's persistent `requests` session
+    """
+
+    def get(
+        self,
+        adapter: "QueryItrAdapter",
+        params: dict,
+        headers: dict,
+        timeout: float | tuple[float, float],
+    ) -> "requests.Response":
+        # Streamed so the body is downloaded (and timed) separately from the headers
+        return adapter._get_session().get(
+            url=adapter.url,
+            headers=headers,
+            params=params,
+            timeout=timeout,
+            stream=True,
+        )
+
+
+class RecordedResponse:
+    """
+    A response read from a recording
+    """
+
+    __slots__ = ("status_code", "reason", "content")
+
+    def __init__(self, status_code: int, reason: str, content: bytes):
+        self.status_code: int = status_code
+        self.reason: str = reason
+        self.content: bytes = content
+
+    @classmethod
+    def from_entry(cls, entry: dict) -> "RecordedResponse":
+        if "body_base64" in entry:
+            content = base64.b64decode(entry["body_base64"])
+        else:
+            content = entry["body"].encode()
+        return cls(entry["status"], entry["reason"], content)
+
+    def to_entry(self) -> dict:
+        entry = {"status": self.status_code, "reason": self.reason}
+        try:
+            entry["body"] = self.content.decode()
+        except UnicodeDecodeError:
+            entry["body_base64"] = base64.b64encode(self.content).decode()
+        return entry
+
+    def __repr__(self) -> str:
+        return f"RecordedResponse ({self.status_code} {self.reason}, {len(self.content)} bytes)"
+
+
+class MissingRecordingError(LookupError):
+    """
+    Raised by `ReplayTransport` for a request that wasn't recorded
+    """
+
+    def __init__(self, params: dict, path: Path):
+        self.params: dict = params
+        """
+        The parameters of the request
+        """
+
+        self.path: Path = path
+        """
+        The file where the recording should be
+        """
+
+        super().__init__(f"No recording for {params} (expected at {path})")
+
+
+def recording_name(params: dict) -> str:
+    """
+    Name of the file of the recordings of a request, from its parameters (the ones that are `None` aren't sent, so they are ignored)
+    """
+
+    query = "&".join(
+        f"{key}={value}" for key, value in sorted(params.items()) if value is not None
+    )
+    name = re.sub(r"[^\w.=&-]", "_", query)
+    if len(name) > 150:
+        name = f"{name[:100]}_{hashlib.sha1(query.encode()).hexdigest()}"
+    return f"{name}.json"
+
+
+def load_recording(path: Path) -> list[RecordedResponse]:
+    """
+    The responses in a recording file
+    """
+
+    with open(path, encoding="utf-8") as f:
+        return [RecordedResponse.from_entry(entry) for entry in json.load(f)]
+
+
+SESSION_TRANSPORT: SessionTransport = SessionTransport()
+"""
+Shared `SessionTransport`, it has no state of its own
+"""
+
+
+class RecordingTransport:
+    """
+    Sends the requests through another transport, appending every response (whatever its status) to its recording
+    """
+
+    def __init__(self, path: str | Path, transport: Transport = SESSION_TRANSPORT):
+        """
+        :param path: Directory of the recordings, created if needed. Existing recordings are appended to
+
+        :param transport: The transport that actually sends the requests
+        """
+
+        self.path: Path = Path(path)
+        """
+        Directory of the recordings
+        """
+
+        self.transport: Transport = transport
+        """
+        The transport that actually sends the requests
+        """
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(
+        self,
+        adapter: "QueryItrAdapter",
+        params: dict,
+        headers: dict,
+        timeout: float | tuple[float, float],
+    ) -> Any:
+        response = self.transport.get(adapter, params, headers, timeout)
+        entry = RecordedResponse(
+            response.status_code, response.reason, response.content
+        ).to_entry()
+
+        path = self.path / recording_name(params)
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            entries = []
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            entries.append(entry)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+
+        return response
+
+
+class ReplayTransport:
+    """
+    Answers the requests from recordings, without any network.
+    Each request gets its recorded responses in order, then keeps getting the last one (or starts over, with `loop`)
+    """
+
+    def __init__(self, path: str | Path, loop: bool = False):
+        """
+        :param path: Directory of the recordings
+
+        :param loop: Wether to start over when the responses of a request run out, instead of repeating the last one
+        """
+
+        self.path: Path = Path(path)
+        """
+        Directory of the recordings
+        """
+
+        self.loop: bool = loop
+        """
+        Wether to start over when the responses of a request run out, instead of repeating the last one
+        """
+
+        self._recordings: dict[str, list[RecordedResponse]] = {}
+        self._positions: dict[str, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(
+        self,
+        adapter: "QueryItrAdapter",
+        params: dict,
+        headers: dict,
+        timeout: float | tuple[float, float],
+    ) -> RecordedResponse:
+        return self.next_response(params)
+
+    def next_response(self, params: dict) -> RecordedResponse:
+        """
+        The next recorded response to a request
+
+        :raises MissingRecordingError: If the request wasn't recorded
+        """
+
+        name = recording_name(params)
+        with self._lock:
+            responses = self._recordings.get(name)
+            if responses is None:
+                path = self.path / name
+                if not path.exists():
+                    raise MissingRecordingError(params, path)
+                responses = self._recordings[name] = load_recording(path)
+
+            if not responses:
+                raise MissingRecordingError(params, self.path / name)
+
+            position = self._positions.get(name, 0)
+            if position >= len(responses):
+                position = 0 if self.loop else len(responses) - 1
+            self._positions[name] = position + 1
+
+        return responses[position]
+
+    def rewind(self) -> None:
+        """
+        Starts replaying every request from its first response again
+        """
+
+        with self._lock:
+            self._positions.clear()